@@ -5,12 +5,29 @@ from fastapi import Depends, Header, HTTPException, status
 from app.core.config import settings
 
 
-def require_api_key(authorization: str | None = Header(default=None)) -> None:
+def _bearer_token(authorization: str | None) -> str:
     if authorization is None or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing API key")
-    token = authorization.removeprefix("Bearer ").strip()
-    if token != settings.api_key:
+    return authorization.removeprefix("Bearer ").strip()
+
+
+def is_admin(authorization: str | None) -> bool:
+    if not settings.admin_api_key or authorization is None:
+        return False
+    return authorization.removeprefix("Bearer ").strip() == settings.admin_api_key
+
+
+def require_api_key(authorization: str | None = Header(default=None)) -> None:
+    token = _bearer_token(authorization)
+    if token != settings.api_key and not is_admin(authorization):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid API key")
 
 
+def require_admin_key(authorization: str | None = Header(default=None)) -> None:
+    _bearer_token(authorization)
+    if not is_admin(authorization):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin key required")
+
+
 ApiKeyDep = Depends(require_api_key)
+AdminKeyDep = Depends(require_admin_key)
@@ -2,7 +2,11 @@ from __future__ import annotations
 
 from typing import Literal
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+X264Preset = Literal[
+    "ultrafast", "superfast", "veryfast", "faster", "fast", "medium", "slow", "slower", "veryslow"
+]
 
 
 class RenderRequest(BaseModel):
@@ -14,16 +18,31 @@ class RenderRequest(BaseModel):
     distance_m: float | None = None
     num_steps: int | None = None
     num_repeats: int | None = None
+    resolution_scale: float | None = Field(None, gt=0, le=1)
+    hls_crf: int | None = Field(None, ge=0, le=51)
+    hls_preset: X264Preset | None = None
+    hls_height: int | None = Field(None, ge=16, le=4320, multiple_of=2)
 
 
 class PredictResponse(BaseModel):
     task_id: str
     file_id: str
+    cached: bool = False
 
 
 class RenderResponse(BaseModel):
     task_id: str
     file_id: str
+    render_key: str
+    cached: bool = False
+
+
+class RenderVariantResponse(BaseModel):
+    render_key: str
+    params: dict[str, str | float | int]
+    size_bytes: int
+    created_at: str
+    last_access_at: str
 
 
 class TaskResponse(BaseModel):
@@ -32,6 +51,10 @@ class TaskResponse(BaseModel):
     status: str
     error: str | None
     file_id: str
+    queue_wait_ms: float | None = None
+    inference_mode: str | None = None
+    created_at: str
+    updated_at: str
 
 
 class FileResponse(BaseModel):
@@ -41,3 +64,15 @@ class FileResponse(BaseModel):
     gaussians_path: str | None
     render_path: str | None
     render_depth_path: str | None
+    created_at: str
+    updated_at: str
+
+
+class TaskPage(BaseModel):
+    items: list[TaskResponse]
+    next_cursor: str | None
+
+
+class FilePage(BaseModel):
+    items: list[FileResponse]
+    next_cursor: str | None
@@ -1,22 +1,82 @@
+import asyncio
+import base64
+import io
+import json
+import re
+import time
 import uuid
+from concurrent.futures import Future
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import Any, Callable, Iterator, Literal
 
-from fastapi import APIRouter, File, HTTPException, Request, UploadFile
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from PIL import Image
 
-from app.api.deps import ApiKeyDep
+from app.api.deps import AdminKeyDep, ApiKeyDep, is_admin
 from app.api.models import FileResponse as FileInfo
-from app.api.models import PredictResponse, RenderRequest, RenderResponse, TaskResponse
+from app.api.models import (
+    FilePage,
+    PredictResponse,
+    RenderRequest,
+    RenderResponse,
+    RenderVariantResponse,
+    TaskPage,
+    TaskResponse,
+)
+from app.core import metrics
 from app.core.config import settings
 from app.db.repo import Repository
+from app.db.schema import (
+    ARTIFACT_GAUSSIANS,
+    ARTIFACT_ORIGINAL,
+    ARTIFACT_SPLAT,
+    RenderRecord,
+    TaskRecord,
+    profile_artifact,
+    render_artifact,
+)
+from app.services import profiling
+from app.services.dedup import PredictCache, content_hasher
+from app.services.encoder import HLS_INIT, HLS_PLAYLIST
+from app.services.lod import (
+    iter_ply_tier,
+    iter_splat_tier,
+    ply_vertex_count,
+    select_tier,
+    splat_vertex_count,
+    tier_counts,
+)
 from app.services.predictor import PredictService
+from app.services.render_cache import RenderCache
 from app.services.renderer import RenderParams, RenderService
+from app.services.retention import ArtifactRetention
+from app.services.splat import ensure_splat
 from app.storage import files as storage_files
 from app.storage import paths as storage_paths
+from app.tasks import jobs
+from app.tasks.admission import AdmissionController, AdmissionRejected, Ticket
+from app.tasks.events import TERMINAL_STATUSES, EventBus, task_event
+from app.tasks.jobs import JobWorker, TaskWatcher
 from app.tasks.runner import TaskRunner
 
 router = APIRouter(prefix="/v1")
 
+_SSE_HEARTBEAT_SECONDS = 15.0
+
+_MAX_PAGE_SIZE = 500
+
+# Names in a render's HLS directory; anything else is not served from it.
+_RENDER_KEY = re.compile(r"[0-9a-f]{16}")
+_HLS_NAME = re.compile(rf"{re.escape(HLS_PLAYLIST)}|{re.escape(HLS_INIT)}|seg_\d+\.m4s")
+_HLS_MEDIA_TYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".mp4": "video/mp4",
+    ".m4s": "video/iso.segment",
+}
+
 
 def _file_response(record) -> FileInfo:
     return FileInfo(
@@ -26,14 +86,183 @@ def _file_response(record) -> FileInfo:
         gaussians_path=record.gaussians_path,
         render_path=record.render_path,
         render_depth_path=record.render_depth_path,
+        created_at=record.created_at,
+        updated_at=record.updated_at,
+    )
+
+
+def _task_response(task: TaskRecord) -> TaskResponse:
+    return TaskResponse(
+        task_id=task.task_id,
+        task_type=task.task_type,
+        status=task.status,
+        error=task.error,
+        file_id=task.file_id,
+        queue_wait_ms=task.queue_wait_ms,
+        inference_mode=task.inference_mode,
+        created_at=task.created_at,
+        updated_at=task.updated_at,
     )
 
 
+def _encode_cursor(created_at: str, key: str) -> str:
+    raw = json.dumps([created_at, key], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str | None) -> tuple[str, str] | None:
+    if cursor is None:
+        return None
+    try:
+        value = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        value = None
+    if not (isinstance(value, list) and len(value) == 2 and all(isinstance(v, str) for v in value)):
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    return value[0], value[1]
+
+
+def _utc(value: datetime | None) -> str | None:
+    """Normalize a query datetime to the stored ``created_at`` format; naive means UTC."""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat()
+
+
 def _ensure_exists(path: str) -> None:
     if not Path(path).exists():
         raise HTTPException(status_code=404, detail="file not found")
 
 
+def _download(
+    path: str | Path,
+    artifact: str,
+    media_type: str | None = None,
+    headers: dict[str, str] | None = None,
+) -> FileResponse:
+    try:
+        metrics.DOWNLOAD_BYTES.labels(artifact).inc(Path(path).stat().st_size)
+    except OSError:
+        raise HTTPException(status_code=404, detail="file not found")
+    return FileResponse(path, media_type=media_type, headers=headers)
+
+
+def _tiered_download(
+    path: Path,
+    artifact: str,
+    counts: list[int],
+    lod: int | None,
+    tier: Callable[[Path, int], Iterator[bytes]],
+    media_type: str | None = None,
+):
+    """Serve LOD tier ``lod`` of a gaussians file; ``counts`` lists the
+    gaussians in each tier, coarsest first, and is sent as ``X-LOD-Tiers``."""
+    headers = {"X-LOD-Tiers": ",".join(str(count) for count in counts)}
+    count = select_tier(counts, lod)
+    if count == counts[-1]:
+        return _download(path, artifact, media_type, headers)
+
+    def chunks() -> Iterator[bytes]:
+        for chunk in tier(path, count):
+            metrics.DOWNLOAD_BYTES.labels(artifact).inc(len(chunk))
+            yield chunk
+
+    return StreamingResponse(chunks(), media_type=media_type, headers=headers)
+
+
+def _ply_tiers(path: Path) -> list[int]:
+    total, importance_sorted = ply_vertex_count(path)
+    return tier_counts(total, settings.gaussians_lod_tiers, importance_sorted)
+
+
+def _touch(request: Request, file_id: str, name: str) -> None:
+    retention: ArtifactRetention = request.app.state.retention
+    retention.touch(file_id, name)
+
+
+def _profile_dir(request: Request, profile: bool, file_id: str, task_id: str) -> Path | None:
+    if not profile:
+        return None
+    if not is_admin(request.headers.get("authorization")):
+        raise HTTPException(status_code=403, detail="Profiling requires the admin key")
+    return storage_paths.profile_dir(settings.data_dir, file_id, task_id)
+
+
+def _admit(request: Request, task_type: str) -> Ticket:
+    admission: AdmissionController = request.app.state.admission
+    try:
+        return admission.admit(task_type, request.headers.get("authorization"))
+    except AdmissionRejected as exc:
+        raise HTTPException(
+            status_code=429, detail=str(exc), headers={"Retry-After": str(int(exc.retry_after))}
+        )
+
+
+def _follower_lease(request: Request) -> dict[str, Any]:
+    """A coalesced follower is settled by this process, which holds its lease."""
+    watcher: TaskWatcher = request.app.state.watcher
+    return {"lease_owner": watcher.owner, "lease_seconds": watcher.lease_seconds}
+
+
+def _leader_error(exc: BaseException) -> Exception:
+    """What followers see when their leader's job could not be enqueued; the
+    in-flight entry is failed so that later duplicates start afresh."""
+    return exc if isinstance(exc, Exception) else RuntimeError("job was not enqueued")
+
+
+def _enqueue(
+    request: Request, task: TaskRecord, ticket: Ticket, on_done: Callable[[TaskRecord], None]
+) -> None:
+    """Follow a queued job until a worker, here or elsewhere, finishes it."""
+    watcher: TaskWatcher = request.app.state.watcher
+    job_worker: JobWorker | None = request.app.state.job_worker
+
+    def _on_done(done: TaskRecord) -> None:
+        ticket.release(jobs.service_seconds(done))
+        on_done(done)
+
+    watcher.watch(task, on_start=lambda _: ticket.start(), on_done=_on_done)
+    if job_worker is not None:
+        job_worker.wake()
+
+
+def _link_gaussians(retention: ArtifactRetention, file_id: str, source: Path) -> Path:
+    target = storage_paths.gaussians_path(settings.data_dir, file_id)
+    storage_files.link_or_copy(source, target)
+    retention.record(file_id, ARTIFACT_GAUSSIANS, target)
+    return target
+
+
+def _set_current_render(repo: Repository, record: RenderRecord) -> None:
+    repo.update_file_outputs(
+        record.file_id,
+        render_path=record.render_path,
+        render_depth_path=record.render_depth_path,
+    )
+
+
+def _complete_render(
+    repo: Repository, events: EventBus, task_id: str, record: RenderRecord
+) -> None:
+    task = repo.complete_task(
+        task_id,
+        record.file_id,
+        render_path=record.render_path,
+        render_depth_path=record.render_depth_path,
+    )
+    events.publish_task(task, result=jobs.render_result(record))
+
+
+def _get_variant(repo: Repository, file_id: str, render_key: str) -> RenderRecord:
+    record = repo.get_render(file_id, render_key)
+    if record is None:
+        raise HTTPException(status_code=404, detail="render not found")
+    repo.touch_render(file_id, render_key)
+    return record
+
+
 def _services(request: Request) -> tuple[Repository, TaskRunner, PredictService, RenderService]:
     repo: Repository = request.app.state.repo
     runner: TaskRunner = request.app.state.runner
@@ -42,36 +271,159 @@ def _services(request: Request) -> tuple[Repository, TaskRunner, PredictService,
     return repo, runner, predict, render
 
 
-@router.post("/predict", response_model=PredictResponse, dependencies=[ApiKeyDep])
-async def predict(request: Request, upload: UploadFile = File(...)):
-    repo, runner, service, _ = _services(request)
-    content = await upload.read()
-    if len(content) > settings.max_upload_mb * 1024 * 1024:
+# The body is parsed by hand, so the form is described here instead.
+_UPLOAD_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["upload"],
+                    "properties": {"upload": {"type": "string", "format": "binary"}},
+                }
+            }
+        },
+    }
+}
+
+
+@router.post(
+    "/predict",
+    response_model=PredictResponse,
+    dependencies=[ApiKeyDep],
+    openapi_extra=_UPLOAD_BODY,
+)
+async def predict(request: Request, profile: bool = False):
+    _, _, service, _ = _services(request)
+    max_bytes = settings.max_upload_mb * 1024 * 1024
+    content_length = int(request.headers.get("content-length") or 0)
+    if content_length > max_bytes + storage_files.MULTIPART_OVERHEAD_BYTES:
         raise HTTPException(status_code=400, detail="File too large")
-
-    filename = upload.filename or "upload.bin"
+    try:
+        # Hashed once at startup; a request arriving first waits off the loop.
+        model_id: str | None = await run_in_threadpool(lambda: service.model_id)
+    except FileNotFoundError as exc:
+        if settings.embedded_worker:
+            raise HTTPException(status_code=503, detail=str(exc))
+        # Only the workers have the weights. Without MODEL_ID the model cannot
+        # be identified here, so uploads run uncached.
+        model_id = None
+
+    # Admitted before anything is read or stored, so a shed upload leaves nothing behind.
+    ticket = _admit(request, "predict")
+    try:
+        return await _accept_predict(request, ticket, model_id, profile)
+    except BaseException:
+        ticket.release()
+        raise
+
+
+async def _accept_predict(
+    request: Request, ticket: Ticket, model_id: str | None, profile: bool
+) -> PredictResponse:
+    """Store the upload and answer from the cache, a running duplicate or a
+    new job; ``ticket`` is released unless the job holds it."""
+    repo, _, service, _ = _services(request)
+    cache: PredictCache = request.app.state.predict_cache
+    events: EventBus = request.app.state.events
+    retention: ArtifactRetention = request.app.state.retention
+    max_bytes = settings.max_upload_mb * 1024 * 1024
     file_id = uuid.uuid4().hex
     task_id = uuid.uuid4().hex
-    input_path = storage_files.persist_upload(settings.data_dir, file_id, filename, content)
+    profile_dir = _profile_dir(request, profile, file_id, task_id)
+    digest = content_hasher(model_id) if model_id is not None else None
+    try:
+        input_path, filename, size = await storage_files.stream_upload(
+            settings.data_dir,
+            file_id,
+            request.headers.get("content-type"),
+            request.stream(),
+            max_bytes,
+            digest,
+        )
+    except storage_files.UploadTooLarge:
+        raise HTTPException(status_code=400, detail="File too large")
+    except storage_files.InvalidUpload as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    metrics.UPLOAD_BYTES.labels().inc(size)
+    key = digest.hexdigest() if digest is not None else None
     repo.create_file(file_id=file_id, original_name=filename, original_path=str(input_path))
-    repo.create_task(task_id=task_id, task_type="predict", file_id=file_id)
+    retention.record(file_id, ARTIFACT_ORIGINAL, input_path)
+
+    # Profiled uploads, and all uploads when the model is unknown here, always
+    # run and stay out of the cache.
+    cached_path = None if profile_dir or key is None else cache.lookup(key)
+    if cached_path is not None:
+        gaussians_path = _link_gaussians(retention, file_id, cached_path)
+        repo.update_file_outputs(file_id, gaussians_path=str(gaussians_path))
+        task = repo.create_task(
+            task_id=task_id,
+            task_type="predict",
+            file_id=file_id,
+            status="completed",
+            inference_mode=service.inference_mode,
+        )
+        events.publish_task(task, result={"gaussians_path": str(gaussians_path)})
+        ticket.release()
+        return PredictResponse(task_id=task_id, file_id=file_id, cached=True)
+
+    uncached = profile_dir or key is None
+    leader_future, is_leader = (None, False) if uncached else cache.join(key)
+    if leader_future is not None and not is_leader:
+        ticket.release()
+        task = repo.create_task(
+            task_id=task_id,
+            task_type="predict",
+            file_id=file_id,
+            inference_mode=service.inference_mode,
+            **_follower_lease(request),
+        )
+
+        def _on_leader_done(done: Future) -> None:
+            try:
+                gaussians_path = _link_gaussians(retention, file_id, done.result())
+                completed = repo.complete_task(task_id, file_id, gaussians_path=str(gaussians_path))
+                events.publish_task(completed, result={"gaussians_path": str(gaussians_path)})
+            except Exception as exc:
+                events.publish_task(repo.update_task(task_id, "failed", str(exc)))
+
+        leader_future.add_done_callback(_on_leader_done)
+        return PredictResponse(task_id=task_id, file_id=file_id)
+
+    def _on_done(done: TaskRecord) -> None:
+        # Profiled runs have no followers. An embedded worker has already
+        # settled them; resolving again is a no-op.
+        if not is_leader:
+            return
+        if done.status == "completed":
+            cache.resolve(key, storage_paths.gaussians_path(settings.data_dir, file_id))
+        else:
+            cache.fail(key, RuntimeError(done.error or "predict failed"))
 
-    def _run_predict():
-        try:
-            repo.update_task(task_id, "running")
-            result = service.run(file_id=file_id, input_path=input_path, device_request=None)
-            repo.update_file_outputs(file_id, gaussians_path=str(result.gaussians_path))
-            repo.update_task(task_id, "completed")
-        except Exception as exc:
-            repo.update_task(task_id, "failed", str(exc))
-
-    runner.submit(task_id, _run_predict)
+    try:
+        task = repo.create_task(
+            task_id=task_id,
+            task_type="predict",
+            file_id=file_id,
+            inference_mode=service.inference_mode,
+            payload=jobs.predict_payload(
+                input_path, key if is_leader else None, model_id, profile_dir
+            ),
+        )
+        _enqueue(request, task, ticket, _on_done)
+    except BaseException as exc:
+        if is_leader:
+            cache.fail(key, _leader_error(exc))
+        raise
     return PredictResponse(task_id=task_id, file_id=file_id)
 
 
 @router.post("/render", response_model=RenderResponse, dependencies=[ApiKeyDep])
-async def render(request: Request, payload: RenderRequest):
-    repo, runner, _, service = _services(request)
+async def render(request: Request, payload: RenderRequest, profile: bool = False):
+    repo, _, _, service = _services(request)
+    cache: RenderCache = request.app.state.render_cache
+    events: EventBus = request.app.state.events
     try:
         record = repo.get_file(payload.file_id)
     except KeyError:
@@ -81,34 +433,104 @@ async def render(request: Request, payload: RenderRequest):
     if not Path(gaussians_path).exists() or record.gaussians_path is None:
         raise HTTPException(status_code=400, detail="gaussians not found")
 
-    task_id = uuid.uuid4().hex
-    repo.create_task(task_id=task_id, task_type="render", file_id=payload.file_id)
-
-    params = RenderParams(
-        trajectory_type=payload.trajectory_type,
-        lookat_mode=payload.lookat_mode,
-        max_disparity=payload.max_disparity,
-        max_zoom=payload.max_zoom,
-        distance_m=payload.distance_m,
-        num_steps=payload.num_steps,
-        num_repeats=payload.num_repeats,
+    params = service.normalize(
+        RenderParams(
+            trajectory_type=payload.trajectory_type,
+            lookat_mode=payload.lookat_mode,
+            max_disparity=payload.max_disparity,
+            max_zoom=payload.max_zoom,
+            distance_m=payload.distance_m,
+            num_steps=payload.num_steps,
+            num_repeats=payload.num_repeats,
+            resolution_scale=payload.resolution_scale,
+            hls_crf=payload.hls_crf,
+            hls_preset=payload.hls_preset,
+            hls_height=payload.hls_height,
+        )
     )
+    render_key = params.key()
+    task_id = uuid.uuid4().hex
+    profile_dir = _profile_dir(request, profile, payload.file_id, task_id)
+
+    cached = None if profile_dir else cache.lookup(payload.file_id, render_key)
+    if cached is not None:
+        _set_current_render(repo, cached)
+        task = repo.create_task(
+            task_id=task_id, task_type="render", file_id=payload.file_id, status="completed"
+        )
+        events.publish_task(task, result=jobs.render_result(cached))
+        return RenderResponse(
+            task_id=task_id, file_id=payload.file_id, render_key=render_key, cached=True
+        )
+
+    ticket = _admit(request, "render")
+    leader_future, is_leader = cache.join(payload.file_id, render_key)
+    if not is_leader:
+        ticket.release()
+        if profile_dir:
+            raise HTTPException(status_code=409, detail="render already in progress")
+        task = repo.create_task(
+            task_id=task_id,
+            task_type="render",
+            file_id=payload.file_id,
+            **_follower_lease(request),
+        )
+
+        def _on_leader_done(done: Future) -> None:
+            try:
+                _complete_render(repo, events, task_id, done.result())
+            except Exception as exc:
+                events.publish_task(repo.update_task(task_id, "failed", str(exc)))
+
+        leader_future.add_done_callback(_on_leader_done)
+        return RenderResponse(task_id=task_id, file_id=payload.file_id, render_key=render_key)
+
+    def _on_done(done: TaskRecord) -> None:
+        record = repo.get_render(payload.file_id, render_key)
+        if done.status == "completed" and record is not None:
+            cache.resolve(record)
+        else:
+            cache.fail(payload.file_id, render_key, RuntimeError(done.error or "render failed"))
 
-    def _run_render():
-        try:
-            repo.update_task(task_id, "running")
-            result = service.run(file_id=payload.file_id, params=params)
-            repo.update_file_outputs(
-                payload.file_id,
-                render_path=str(result.render_path),
-                render_depth_path=str(result.render_depth_path),
-            )
-            repo.update_task(task_id, "completed")
-        except Exception as exc:
-            repo.update_task(task_id, "failed", str(exc))
-
-    runner.submit(task_id, _run_render, gpu=True)
-    return RenderResponse(task_id=task_id, file_id=payload.file_id)
+    try:
+        task = repo.create_task(
+            task_id=task_id,
+            task_type="render",
+            file_id=payload.file_id,
+            payload=jobs.render_payload(params, profile_dir),
+        )
+        _enqueue(request, task, ticket, _on_done)
+    except BaseException as exc:
+        cache.fail(payload.file_id, render_key, _leader_error(exc))
+        ticket.release()
+        raise
+    return RenderResponse(task_id=task_id, file_id=payload.file_id, render_key=render_key)
+
+
+@router.get("/tasks", response_model=TaskPage, dependencies=[ApiKeyDep])
+async def list_tasks(
+    request: Request,
+    status: Literal["queued", "running", "completed", "failed"] | None = None,
+    task_type: Literal["predict", "render"] | None = None,
+    created_after: datetime | None = None,
+    created_before: datetime | None = None,
+    cursor: str | None = None,
+    limit: int = Query(50, ge=1, le=_MAX_PAGE_SIZE),
+):
+    repo, _, _, _ = _services(request)
+    tasks = repo.page_tasks(
+        limit + 1,
+        status=status,
+        task_type=task_type,
+        created_after=_utc(created_after),
+        created_before=_utc(created_before),
+        after=_decode_cursor(cursor),
+    )
+    next_cursor = None
+    if len(tasks) > limit:
+        tasks = tasks[:limit]
+        next_cursor = _encode_cursor(tasks[-1].created_at, tasks[-1].task_id)
+    return TaskPage(items=[_task_response(task) for task in tasks], next_cursor=next_cursor)
 
 
 @router.get("/tasks/{task_id}", response_model=TaskResponse, dependencies=[ApiKeyDep])
@@ -118,15 +540,120 @@ async def get_task(request: Request, task_id: str):
         task = repo.get_task(task_id)
     except KeyError:
         raise HTTPException(status_code=404, detail="task not found")
-    return TaskResponse(
-        task_id=task.task_id,
-        task_type=task.task_type,
-        status=task.status,
-        error=task.error,
-        file_id=task.file_id,
+    return _task_response(task)
+
+
+@router.get("/tasks/{task_id}/profile", dependencies=[AdminKeyDep])
+async def get_task_profile(
+    request: Request, task_id: str, artifact: Literal["trace", "stacks", "ops"] = "trace"
+):
+    repo, _, _, _ = _services(request)
+    try:
+        task = repo.get_task(task_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="task not found")
+    directory = storage_paths.profile_dir(settings.data_dir, task.file_id, task_id)
+    path = profiling.artifact_path(directory, artifact)
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="profile not found")
+    _touch(request, task.file_id, profile_artifact(task_id))
+    return _download(path, "profile", media_type=profiling.ARTIFACTS[artifact][1])
+
+
+def _sse(event: dict) -> str:
+    return f"data: {json.dumps(event)}\n\n"
+
+
+@router.get("/tasks/{task_id}/events", dependencies=[ApiKeyDep])
+async def task_events(request: Request, task_id: str):
+    repo, _, _, _ = _services(request)
+    events: EventBus = request.app.state.events
+    queue = events.subscribe(task_id)
+    try:
+        task = repo.get_task(task_id)
+    except KeyError:
+        events.unsubscribe(task_id, queue)
+        raise HTTPException(status_code=404, detail="task not found")
+
+    async def stream():
+        try:
+            current = events.last(task_id)
+            if current is None or (
+                task.status in TERMINAL_STATUSES and current["status"] not in TERMINAL_STATUSES
+            ):
+                current = task_event(task)
+            yield _sse(current)
+            if current["status"] in TERMINAL_STATUSES:
+                return
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=_SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # Catch transitions not published in this process.
+                    latest = repo.get_task(task_id)
+                    if latest.status in TERMINAL_STATUSES:
+                        yield _sse(task_event(latest))
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _sse(event)
+                if event["status"] in TERMINAL_STATUSES:
+                    return
+        finally:
+            events.unsubscribe(task_id, queue)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
+@router.get("/stats", dependencies=[ApiKeyDep])
+async def get_stats(request: Request):
+    repo, runner, _, _ = _services(request)
+    cpu_pool = request.app.state.cpu_pool
+    job_worker: JobWorker | None = request.app.state.job_worker
+    return {
+        "runner": runner.stats(),
+        "db": repo.stats(),
+        "batching": request.app.state.batcher.stats(),
+        "pipeline": request.app.state.predict_service.pipeline_stats(),
+        "cpu_pool": cpu_pool.stats() if cpu_pool is not None else None,
+        "predict_cache": request.app.state.predict_cache.stats(),
+        "render_cache": request.app.state.render_cache.stats(),
+        "gaussian_cache": request.app.state.gaussian_cache.stats(),
+        "admission": request.app.state.admission.stats(),
+        "retention": request.app.state.retention.stats(),
+        "jobs": {
+            **repo.count_jobs(),
+            "worker": job_worker.stats() if job_worker is not None else None,
+        },
+    }
+
+
+@router.get("/files", response_model=FilePage, dependencies=[ApiKeyDep])
+async def list_files(
+    request: Request,
+    created_after: datetime | None = None,
+    created_before: datetime | None = None,
+    cursor: str | None = None,
+    limit: int = Query(50, ge=1, le=_MAX_PAGE_SIZE),
+):
+    repo, _, _, _ = _services(request)
+    files = repo.page_files(
+        limit + 1,
+        created_after=_utc(created_after),
+        created_before=_utc(created_before),
+        after=_decode_cursor(cursor),
+    )
+    next_cursor = None
+    if len(files) > limit:
+        files = files[:limit]
+        next_cursor = _encode_cursor(files[-1].created_at, files[-1].file_id)
+    return FilePage(items=[_file_response(record) for record in files], next_cursor=next_cursor)
+
+
 @router.get("/files/{file_id}", response_model=FileInfo, dependencies=[ApiKeyDep])
 async def get_file(request: Request, file_id: str):
     repo, _, _, _ = _services(request)
@@ -145,11 +672,12 @@ async def get_original(request: Request, file_id: str):
     except KeyError:
         raise HTTPException(status_code=404, detail="file not found")
     _ensure_exists(record.original_path)
-    return FileResponse(record.original_path)
+    _touch(request, file_id, ARTIFACT_ORIGINAL)
+    return _download(record.original_path, "original")
 
 
 @router.get("/files/{file_id}/gaussians", dependencies=[ApiKeyDep])
-async def get_gaussians(request: Request, file_id: str):
+async def get_gaussians(request: Request, file_id: str, lod: int | None = Query(None, ge=0)):
     repo, _, _, _ = _services(request)
     try:
         record = repo.get_file(file_id)
@@ -158,7 +686,99 @@ async def get_gaussians(request: Request, file_id: str):
     if record.gaussians_path is None:
         raise HTTPException(status_code=404, detail="gaussians not ready")
     _ensure_exists(record.gaussians_path)
-    return FileResponse(record.gaussians_path)
+    _touch(request, file_id, ARTIFACT_GAUSSIANS)
+    path = Path(record.gaussians_path)
+    counts = await run_in_threadpool(_ply_tiers, path)
+    return _tiered_download(
+        path, "gaussians", counts, lod, iter_ply_tier, media_type="application/octet-stream"
+    )
+
+
+@router.get("/files/{file_id}/gaussians.splat", dependencies=[ApiKeyDep])
+async def get_gaussians_splat(
+    request: Request, file_id: str, lod: int | None = Query(None, ge=0)
+):
+    repo, _, _, _ = _services(request)
+    try:
+        record = repo.get_file(file_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="file not found")
+    if record.gaussians_path is None:
+        raise HTTPException(status_code=404, detail="gaussians not ready")
+    _ensure_exists(record.gaussians_path)
+    splat_path = storage_paths.splat_path(settings.data_dir, file_id)
+    converted = not splat_path.exists()
+    await run_in_threadpool(ensure_splat, Path(record.gaussians_path), splat_path)
+    if converted:
+        retention: ArtifactRetention = request.app.state.retention
+        await run_in_threadpool(retention.record, file_id, ARTIFACT_SPLAT, splat_path)
+    # The splat is rebuilt from the gaussians, so keep both.
+    _touch(request, file_id, ARTIFACT_SPLAT)
+    _touch(request, file_id, ARTIFACT_GAUSSIANS)
+    # Splats keep the PLY's order, so they are tiered when it is sorted.
+    _, importance_sorted = await run_in_threadpool(ply_vertex_count, Path(record.gaussians_path))
+    total = await run_in_threadpool(splat_vertex_count, splat_path)
+    counts = tier_counts(total, settings.gaussians_lod_tiers, importance_sorted)
+    return _tiered_download(
+        splat_path, "splat", counts, lod, iter_splat_tier, media_type="application/octet-stream"
+    )
+
+
+def _snapshot(
+    service: RenderService,
+    file_id: str,
+    yaw: float,
+    pitch: float,
+    width: int,
+    height: int | None,
+    image_format: str,
+    quality: int,
+) -> tuple[bytes, float, float]:
+    started = time.perf_counter()
+    pixels = service.snapshot(file_id, yaw, pitch, width, height)
+    rendered = time.perf_counter()
+    buffer = io.BytesIO()
+    if image_format == "png":
+        Image.fromarray(pixels).save(buffer, format="PNG", compress_level=1)
+    else:
+        Image.fromarray(pixels).save(buffer, format="JPEG", quality=quality)
+    encoded = time.perf_counter()
+    metrics.STAGE_SECONDS.labels("snapshot", "render").observe(rendered - started)
+    metrics.STAGE_SECONDS.labels("snapshot", "encode").observe(encoded - rendered)
+    return buffer.getvalue(), rendered - started, encoded - rendered
+
+
+@router.get("/files/{file_id}/snapshot", dependencies=[ApiKeyDep])
+async def get_snapshot(
+    request: Request,
+    file_id: str,
+    yaw: float = Query(0.0, ge=-180, le=180),
+    pitch: float = Query(0.0, ge=-89, le=89),
+    w: int = Query(512, ge=16, le=2048),
+    h: int | None = Query(None, ge=16, le=2048),
+    image_format: Literal["jpeg", "png"] = Query("jpeg", alias="format"),
+    quality: int = Query(85, ge=1, le=100),
+):
+    repo, _, _, render = _services(request)
+    try:
+        record = repo.get_file(file_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="file not found")
+    if record.gaussians_path is None:
+        raise HTTPException(status_code=404, detail="gaussians not ready")
+    _ensure_exists(record.gaussians_path)
+    _touch(request, file_id, ARTIFACT_GAUSSIANS)
+    try:
+        body, render_seconds, encode_seconds = await run_in_threadpool(
+            _snapshot, render, file_id, yaw, pitch, w, h, image_format, quality
+        )
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="file not found")
+    except RuntimeError as exc:
+        raise HTTPException(status_code=503, detail=str(exc))
+    metrics.DOWNLOAD_BYTES.labels("snapshot").inc(len(body))
+    timing = f"render;dur={render_seconds * 1000:.1f}, encode;dur={encode_seconds * 1000:.1f}"
+    return Response(body, media_type=f"image/{image_format}", headers={"Server-Timing": timing})
 
 
 @router.get("/files/{file_id}/render", dependencies=[ApiKeyDep])
@@ -171,7 +791,58 @@ async def get_render(request: Request, file_id: str):
     if record.render_path is None:
         raise HTTPException(status_code=404, detail="render not ready")
     _ensure_exists(record.render_path)
-    return FileResponse(record.render_path)
+    # The current render is one of the file's variants.
+    _touch(request, file_id, render_artifact(Path(record.render_path).parent.name))
+    return _download(record.render_path, "render")
+
+
+def _latest_playlist(file_id: str) -> str | None:
+    """Key of the variant whose HLS playlist was written last."""
+    playlists = storage_paths.renders_dir(settings.data_dir, file_id).glob(f"*/hls/{HLS_PLAYLIST}")
+    newest = max(playlists, key=lambda path: path.stat().st_mtime_ns, default=None)
+    return newest.parent.parent.name if newest is not None else None
+
+
+def _rewrite_playlist(text: str, prefix: str) -> str:
+    """Point the playlist's relative segment URIs at ``prefix``."""
+    lines = []
+    for line in text.splitlines():
+        if line.startswith("#EXT-X-MAP:"):
+            line = line.replace('URI="', f'URI="{prefix}', 1)
+        elif line and not line.startswith("#"):
+            line = prefix + line
+        lines.append(line)
+    return "\n".join(lines) + "\n"
+
+
+@router.get("/files/{file_id}/render/playlist.m3u8", dependencies=[ApiKeyDep])
+async def get_render_playlist(request: Request, file_id: str, render_key: str | None = None):
+    repo, _, _, _ = _services(request)
+    try:
+        record = repo.get_file(file_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="file not found")
+    if render_key is None:
+        if record.render_path is not None:
+            render_key = Path(record.render_path).parent.name
+        else:
+            # The first render of the file may still be in progress.
+            render_key = await run_in_threadpool(_latest_playlist, file_id)
+    if render_key is None or not _RENDER_KEY.fullmatch(render_key):
+        raise HTTPException(status_code=404, detail="playlist not ready")
+    path = (
+        storage_paths.render_variant_hls_dir(settings.data_dir, file_id, render_key) / HLS_PLAYLIST
+    )
+    try:
+        text = await run_in_threadpool(path.read_text)
+    except OSError:
+        raise HTTPException(status_code=404, detail="playlist not ready")
+    _touch(request, file_id, render_artifact(render_key))
+    return Response(
+        _rewrite_playlist(text, f"../renders/{render_key}/hls/"),
+        media_type=_HLS_MEDIA_TYPES[".m3u8"],
+        headers={"Cache-Control": "no-cache"},
+    )
 
 
 @router.get("/files/{file_id}/render-depth", dependencies=[ApiKeyDep])
@@ -184,4 +855,63 @@ async def get_render_depth(request: Request, file_id: str):
     if record.render_depth_path is None:
         raise HTTPException(status_code=404, detail="render depth not ready")
     _ensure_exists(record.render_depth_path)
-    return FileResponse(record.render_depth_path)
+    _touch(request, file_id, render_artifact(Path(record.render_depth_path).parent.name))
+    return _download(record.render_depth_path, "render_depth")
+
+
+@router.get(
+    "/files/{file_id}/renders",
+    response_model=list[RenderVariantResponse],
+    dependencies=[ApiKeyDep],
+)
+async def list_renders(request: Request, file_id: str):
+    repo, _, _, _ = _services(request)
+    try:
+        repo.get_file(file_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="file not found")
+    return [
+        RenderVariantResponse(
+            render_key=record.render_key,
+            params=json.loads(record.params),
+            size_bytes=record.size_bytes,
+            created_at=record.created_at,
+            last_access_at=record.last_access_at,
+        )
+        for record in repo.list_renders(file_id)
+    ]
+
+
+@router.get("/files/{file_id}/renders/{render_key}", dependencies=[ApiKeyDep])
+async def get_render_variant(request: Request, file_id: str, render_key: str):
+    repo, _, _, _ = _services(request)
+    record = _get_variant(repo, file_id, render_key)
+    _ensure_exists(record.render_path)
+    _touch(request, file_id, render_artifact(render_key))
+    return _download(record.render_path, "render")
+
+
+@router.get("/files/{file_id}/renders/{render_key}/depth", dependencies=[ApiKeyDep])
+async def get_render_variant_depth(request: Request, file_id: str, render_key: str):
+    repo, _, _, _ = _services(request)
+    record = _get_variant(repo, file_id, render_key)
+    _ensure_exists(record.render_depth_path)
+    _touch(request, file_id, render_artifact(render_key))
+    return _download(record.render_depth_path, "render_depth")
+
+
+@router.get("/files/{file_id}/renders/{render_key}/hls/{name}", dependencies=[ApiKeyDep])
+async def get_render_variant_hls(request: Request, file_id: str, render_key: str, name: str):
+    # Served while the render runs, so there may be no variant record yet.
+    if not _HLS_NAME.fullmatch(name) or not _RENDER_KEY.fullmatch(render_key):
+        raise HTTPException(status_code=404, detail="file not found")
+    path = storage_paths.render_variant_hls_dir(settings.data_dir, file_id, render_key) / name
+    _touch(request, file_id, render_artifact(render_key))
+    # Segments never change once written; the playlist grows until the render ends.
+    cache_control = "no-cache" if name == HLS_PLAYLIST else "max-age=86400"
+    return _download(
+        path,
+        "hls",
+        media_type=_HLS_MEDIA_TYPES[Path(name).suffix],
+        headers={"Cache-Control": cache_control},
+    )
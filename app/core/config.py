@@ -11,25 +11,129 @@ def _get_env(name: str, default: str | None = None) -> str:
     return value
 
 
+def _get_bool(name: str, default: str) -> bool:
+    return _get_env(name, default).strip().lower() in {"1", "true", "yes", "on"}
+
+
 @dataclass(frozen=True)
 class Settings:
     api_key: str
+    admin_api_key: str
     model_path: str
+    model_id: str
     data_dir: str
     db_path: str
     max_upload_mb: int
     max_gpu_tasks: int
+    device_queue_size: int
+    task_workers: int
+    predict_max_batch: int
+    predict_batch_wait_ms: float
+    pipeline_decode_workers: int
+    pipeline_infer_workers: int
+    pipeline_serialize_workers: int
+    pipeline_queue_size: int
+    render_budget_mb: int
+    render_backend: str
+    cpu_render_scale: float
+    cpu_render_threads: int
+    cpu_render_tile: int
+    render_hls: bool
+    hls_segment_seconds: float
+    hls_crf: int
+    hls_preset: str
+    gaussian_cache_host_mb: int
+    gaussian_cache_device_mb: int
+    snapshot_concurrency: int
+    gaussians_min_opacity: float
+    gaussians_min_pixels: float
+    gaussians_lod_tiers: tuple[float, ...]
+    retention_budget_mb: int
+    retention_ttl_hours: float
+    retention_interval_seconds: float
+    retention_batch: int
+    admission_slo_seconds: float
+    admission_max_inflight: int
+    admission_max_per_key: int
+    preload_model: bool
+    model_mmap: bool
+    model_warmup: bool
+    inference_precision: str
+    inference_compile: bool
+    inference_channels_last: bool
+    compile_cache_dir: str
+    torch_num_threads: int
+    torch_interop_threads: int
+    cpu_workers: int
+    cpu_worker_threads: int
+    embedded_worker: bool
+    worker_concurrency: int
+    job_lease_seconds: float
+    job_max_attempts: int
+    job_poll_ms: float
     device_default: str
     port: int
 
 
 settings = Settings(
     api_key=_get_env("API_KEY"),
+    admin_api_key=_get_env("ADMIN_API_KEY", ""),
     model_path=_get_env("MODEL_PATH", "/app/models/sharp_2572gikvuh.pt"),
+    model_id=_get_env("MODEL_ID", ""),
     data_dir=_get_env("DATA_DIR", "/app/data"),
     db_path=_get_env("DB_PATH", "/app/data/mlsharp.db"),
     max_upload_mb=int(_get_env("MAX_UPLOAD_MB", "10")),
     max_gpu_tasks=int(_get_env("MAX_GPU_TASKS", "1")),
+    device_queue_size=int(_get_env("DEVICE_QUEUE_SIZE", "64")),
+    task_workers=int(_get_env("TASK_WORKERS", "8")),
+    predict_max_batch=int(_get_env("PREDICT_MAX_BATCH", "4")),
+    predict_batch_wait_ms=float(_get_env("PREDICT_BATCH_WAIT_MS", "10")),
+    pipeline_decode_workers=int(_get_env("PIPELINE_DECODE_WORKERS", "2")),
+    pipeline_infer_workers=int(_get_env("PIPELINE_INFER_WORKERS", "0")),
+    pipeline_serialize_workers=int(_get_env("PIPELINE_SERIALIZE_WORKERS", "2")),
+    pipeline_queue_size=int(_get_env("PIPELINE_QUEUE_SIZE", "4")),
+    render_budget_mb=int(_get_env("RENDER_BUDGET_MB", "256")),
+    render_backend=_get_env("RENDER_BACKEND", "auto").lower(),
+    cpu_render_scale=float(_get_env("CPU_RENDER_SCALE", "0.5")),
+    cpu_render_threads=int(_get_env("CPU_RENDER_THREADS", "0")),
+    cpu_render_tile=int(_get_env("CPU_RENDER_TILE", "64")),
+    render_hls=_get_bool("RENDER_HLS", "true"),
+    hls_segment_seconds=float(_get_env("HLS_SEGMENT_SECONDS", "2")),
+    hls_crf=int(_get_env("HLS_CRF", "23")),
+    hls_preset=_get_env("HLS_PRESET", "veryfast").lower(),
+    gaussian_cache_host_mb=int(_get_env("GAUSSIAN_CACHE_HOST_MB", "1024")),
+    gaussian_cache_device_mb=int(_get_env("GAUSSIAN_CACHE_DEVICE_MB", "512")),
+    snapshot_concurrency=int(_get_env("SNAPSHOT_CONCURRENCY", "2")),
+    gaussians_min_opacity=float(_get_env("GAUSSIANS_MIN_OPACITY", "0")),
+    gaussians_min_pixels=float(_get_env("GAUSSIANS_MIN_PIXELS", "0")),
+    gaussians_lod_tiers=tuple(
+        float(value) for value in _get_env("GAUSSIANS_LOD_TIERS", "0.1,0.3,1").split(",")
+    ),
+    retention_budget_mb=int(_get_env("RETENTION_BUDGET_MB", "0")),
+    retention_ttl_hours=float(_get_env("RETENTION_TTL_HOURS", "0")),
+    retention_interval_seconds=float(_get_env("RETENTION_INTERVAL_SECONDS", "60")),
+    retention_batch=int(_get_env("RETENTION_BATCH", "100")),
+    admission_slo_seconds=float(_get_env("ADMISSION_SLO_SECONDS", "60")),
+    admission_max_inflight=int(_get_env("ADMISSION_MAX_INFLIGHT", "256")),
+    admission_max_per_key=int(_get_env("ADMISSION_MAX_PER_KEY", "0")),
+    preload_model=_get_bool("PRELOAD_MODEL", "true"),
+    model_mmap=_get_bool("MODEL_MMAP", "true"),
+    model_warmup=_get_bool("MODEL_WARMUP", "false"),
+    inference_precision=_get_env("INFERENCE_PRECISION", "fp32").lower(),
+    inference_compile=_get_bool("INFERENCE_COMPILE", "false"),
+    inference_channels_last=_get_bool("INFERENCE_CHANNELS_LAST", "false"),
+    compile_cache_dir=_get_env(
+        "COMPILE_CACHE_DIR", os.path.join(_get_env("DATA_DIR", "/app/data"), "torch-compile")
+    ),
+    torch_num_threads=int(_get_env("TORCH_NUM_THREADS", "0")),
+    torch_interop_threads=int(_get_env("TORCH_INTEROP_THREADS", "0")),
+    cpu_workers=int(_get_env("CPU_WORKERS", "0")),
+    cpu_worker_threads=int(_get_env("CPU_WORKER_THREADS", "0")),
+    embedded_worker=_get_bool("EMBEDDED_WORKER", "true"),
+    worker_concurrency=int(_get_env("WORKER_CONCURRENCY", "0")),
+    job_lease_seconds=float(_get_env("JOB_LEASE_SECONDS", "60")),
+    job_max_attempts=int(_get_env("JOB_MAX_ATTEMPTS", "3")),
+    job_poll_ms=float(_get_env("JOB_POLL_MS", "500")),
     device_default=_get_env("DEVICE_DEFAULT", "auto"),
     port=int(_get_env("PORT", "11011")),
 )
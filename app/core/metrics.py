@@ -0,0 +1,252 @@
+"""Minimal in-process metrics with Prometheus text exposition.
+
+Counters, gauges and histograms keep one child per label combination; an
+observation is a dict lookup plus a short locked update, so instruments can sit
+on request and task hot paths.
+"""
+
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+# Seconds; spans SQLite calls (sub-millisecond) to renders (minutes).
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0,
+)  # fmt: skip
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, description: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.description = description
+        self.labelnames = labelnames
+        self._children: dict[tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str):
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            children = list(self._children.items())
+        for key, child in sorted(children):
+            lines.extend(self._render_child(key, child))
+        return lines
+
+    def _render_child(self, key: tuple[str, ...], child) -> list[str]:
+        labels = _format_labels(self.labelnames, key)
+        return [f"{self.name}{labels} {_format_value(child.get())}"]
+
+
+class _Value:
+    __slots__ = ("_value", "_lock")
+
+    def __init__(self) -> None:
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value -= amount
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+    def get(self) -> float:
+        return self._value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+
+class _HistogramChild:
+    __slots__ = ("_buckets", "_counts", "_sum", "_lock")
+
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self._buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self._buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def snapshot(self) -> tuple[list[int], float]:
+        with self._lock:
+            return list(self._counts), self._sum
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def _render_child(self, key: tuple[str, ...], child: _HistogramChild) -> list[str]:
+        counts, total = child.snapshot()
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, float("inf")), counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def counter(name: str, description: str, labelnames: tuple[str, ...] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, description, labelnames))
+
+
+def gauge(name: str, description: str, labelnames: tuple[str, ...] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, description, labelnames))
+
+
+def histogram(
+    name: str,
+    description: str,
+    labelnames: tuple[str, ...] = (),
+    buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+) -> Histogram:
+    return REGISTRY.register(Histogram(name, description, labelnames, buckets))
+
+
+STAGE_SECONDS = histogram("mlsharp_stage_seconds", "Duration of task stages.", ("task", "stage"))
+QUEUE_DEPTH = gauge("mlsharp_queue_depth", "Jobs waiting to start.", ("queue",))
+QUEUE_WAIT_SECONDS = histogram(
+    "mlsharp_queue_wait_seconds", "Time jobs waited before starting.", ("queue",)
+)
+DEVICE_SLOTS = gauge("mlsharp_device_slots", "Configured slots per device.", ("device",))
+DEVICE_SLOTS_BUSY = gauge("mlsharp_device_slots_busy", "Slots running a job.", ("device",))
+DEVICE_BUSY_SECONDS = counter(
+    "mlsharp_device_busy_seconds_total", "Slot-seconds spent running jobs.", ("device",)
+)
+PIPELINE_BUSY_SECONDS = counter(
+    "mlsharp_pipeline_busy_seconds_total",
+    "Seconds a pipeline stage had at least one item in progress.",
+    ("pipeline", "stage"),
+)
+DB_SECONDS = histogram(
+    "mlsharp_db_seconds", "SQLite call latency by repository operation.", ("operation",)
+)
+UPLOAD_BYTES = counter("mlsharp_upload_bytes_total", "Bytes received in uploads.")
+DOWNLOAD_BYTES = counter(
+    "mlsharp_download_bytes_total", "Bytes served from file downloads.", ("artifact",)
+)
+ADMISSION_INFLIGHT = gauge("mlsharp_admission_inflight", "Admitted tasks not yet finished.")
+ADMISSION_ESTIMATED_WAIT_SECONDS = gauge(
+    "mlsharp_admission_estimated_wait_seconds", "Queue wait estimated at the last admission."
+)
+ADMISSION_SHED = counter(
+    "mlsharp_admission_shed_total", "Tasks rejected by admission control.", ("reason",)
+)
+ARTIFACT_BYTES = gauge("mlsharp_artifact_bytes", "Bytes of tracked artifacts under DATA_DIR.")
+RETENTION_EVICTED = counter(
+    "mlsharp_retention_evicted_total", "Artifacts deleted by retention.", ("reason",)
+)
+RETENTION_RECLAIMED_BYTES = counter(
+    "mlsharp_retention_reclaimed_bytes_total", "Disk bytes freed by retention.", ("reason",)
+)
+GAUSSIAN_CACHE_LOOKUPS = counter(
+    "mlsharp_gaussian_cache_lookups_total",
+    "Gaussian cache lookups by result (hit or miss).",
+    ("tier", "result"),
+)
+GAUSSIAN_CACHE_EVICTED = counter(
+    "mlsharp_gaussian_cache_evicted_total", "Gaussian cache entries evicted.", ("tier",)
+)
+GAUSSIAN_CACHE_BYTES = gauge(
+    "mlsharp_gaussian_cache_bytes", "Bytes held by the gaussian cache.", ("tier",)
+)
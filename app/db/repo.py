@@ -1,35 +1,169 @@
 from __future__ import annotations
 
+import functools
 import sqlite3
-from typing import Iterable
+import threading
+import time
+import weakref
+from pathlib import Path
+from typing import Callable, Iterable, TypeVar
 
-from .schema import FileRecord, TaskRecord, ensure_db, utc_now
+from app.core import metrics
+
+from .schema import (
+    ARTIFACT_GAUSSIANS,
+    ARTIFACT_RENDER_PREFIX,
+    TIER_DERIVED,
+    ArtifactRecord,
+    FileRecord,
+    PredictCacheRecord,
+    RenderRecord,
+    TaskRecord,
+    ensure_db,
+    render_artifact,
+    utc_now,
+)
+
+
+# Applied to every pooled connection. WAL lets task-status readers proceed while
+# workers write; NORMAL sync is durable across application crashes in WAL mode.
+_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+)
+
+# Ids bound per ``IN (...)`` query; older SQLite builds allow 999 variables.
+_IN_CHUNK = 500
+
+_F = TypeVar("_F", bound=Callable)
+
+
+def _timed(method: _F) -> _F:
+    """Record the latency of a repository call under its method name."""
+    histogram = metrics.DB_SECONDS.labels(method.__name__)
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            histogram.observe(time.perf_counter() - started)
+
+    return wrapper  # type: ignore[return-value]
+
+
+def _keyset_page(
+    table: str,
+    id_column: str,
+    filters: dict[str, str | None],
+    created_after: str | None,
+    created_before: str | None,
+    after: tuple[str, str] | None,
+    limit: int,
+) -> tuple[str, list]:
+    """One page of ``table`` ordered by ``(created_at, id)`` descending.
+
+    ``after`` is the ``(created_at, id)`` of the last row of the previous page.
+    The page starts with a seek in a ``(filter, created_at, id)`` index instead
+    of skipping rows with OFFSET, so every page costs the same however deep it
+    is. ``created_after`` is inclusive and ``created_before`` exclusive.
+    """
+    clauses = [f"{column} = ?" for column, value in filters.items() if value is not None]
+    params: list = [value for value in filters.values() if value is not None]
+    if created_after is not None:
+        clauses.append("created_at >= ?")
+        params.append(created_after)
+    # SQLite seeks on one upper bound only; keep whichever is tighter.
+    if after is not None and (created_before is None or after[0] < created_before):
+        clauses.append(f"(created_at, {id_column}) < (?, ?)")
+        params.extend(after)
+    elif created_before is not None:
+        clauses.append("created_at < ?")
+        params.append(created_before)
+    where = " AND ".join(clauses) or "1"
+    sql = (
+        f"SELECT * FROM {table} WHERE {where} "
+        f"ORDER BY created_at DESC, {id_column} DESC LIMIT ?"
+    )
+    return sql, [*params, limit]
+
+
+class _Connection:
+    """A thread's connection, held only by that thread's locals, so that it is
+    collected, and the connection closed, when the thread exits."""
+
+    __slots__ = ("conn", "__weakref__")
+
+    def __init__(self, conn: sqlite3.Connection) -> None:
+        self.conn = conn
+
+
+def _close_connection(
+    connections: dict[sqlite3.Connection, weakref.finalize], conn: sqlite3.Connection
+) -> None:
+    # Runs on the exiting thread or from close(); dict.pop is atomic.
+    connections.pop(conn, None)
+    conn.close()
 
 
 class Repository:
     def __init__(self, db_path: str) -> None:
         self.db_path = db_path
         ensure_db(self.db_path)
+        self._local = threading.local()
+        # Open connections, to the finalizer that closes each one. Worker
+        # threads come and go (the anyio pool retires idle ones), so a
+        # connection lives only as long as its thread.
+        self._connections: dict[sqlite3.Connection, weakref.finalize] = {}
+        self._lock = threading.Lock()
+        self._operations = 0
 
     def _connect(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+        """Return this thread's connection, opening it on first use."""
+        with self._lock:
+            self._operations += 1
+        holder = getattr(self._local, "holder", None)
+        if holder is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            for pragma in _PRAGMAS:
+                conn.execute(pragma)
+            holder = self._local.holder = _Connection(conn)
+            self._connections[conn] = weakref.finalize(
+                holder, _close_connection, self._connections, conn
+            )
+        return holder.conn
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"operations": self._operations, "connections": len(self._connections)}
 
+    def close(self) -> None:
+        for finalizer in list(self._connections.values()):
+            finalizer()
+        self._local = threading.local()
+
+    @_timed
     def create_file(self, file_id: str, original_name: str, original_path: str) -> FileRecord:
         now = utc_now()
         with self._connect() as conn:
-            conn.execute(
+            row = conn.execute(
                 """
                 INSERT INTO files (
                     file_id, original_name, original_path, gaussians_path,
                     render_path, render_depth_path, created_at, updated_at
                 ) VALUES (?, ?, ?, NULL, NULL, NULL, ?, ?)
+                RETURNING *
                 """,
                 (file_id, original_name, original_path, now, now),
-            )
-        return self.get_file(file_id)
+            ).fetchone()
+        return FileRecord(**dict(row))
 
+    @_timed
     def update_file_outputs(
         self,
         file_id: str,
@@ -37,69 +171,573 @@ class Repository:
         render_path: str | None = None,
         render_depth_path: str | None = None,
     ) -> FileRecord:
+        with self._connect() as conn:
+            row = self._update_file_outputs(
+                conn, file_id, gaussians_path, render_path, render_depth_path
+            )
+        if row is None:
+            raise KeyError("file not found")
+        return FileRecord(**dict(row))
+
+    @staticmethod
+    def _update_file_outputs(
+        conn: sqlite3.Connection,
+        file_id: str,
+        gaussians_path: str | None,
+        render_path: str | None,
+        render_depth_path: str | None,
+    ) -> sqlite3.Row | None:
+        return conn.execute(
+            """
+            UPDATE files
+            SET gaussians_path = COALESCE(?, gaussians_path),
+                render_path = COALESCE(?, render_path),
+                render_depth_path = COALESCE(?, render_depth_path),
+                updated_at = ?
+            WHERE file_id = ?
+            RETURNING *
+            """,
+            (gaussians_path, render_path, render_depth_path, utc_now(), file_id),
+        ).fetchone()
+
+    @_timed
+    def get_file(self, file_id: str) -> FileRecord:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM files WHERE file_id = ?", (file_id,)).fetchone()
+        if row is None:
+            raise KeyError("file not found")
+        return FileRecord(**dict(row))
+
+    @_timed
+    def page_files(
+        self,
+        limit: int,
+        created_after: str | None = None,
+        created_before: str | None = None,
+        after: tuple[str, str] | None = None,
+    ) -> list[FileRecord]:
+        """Files newest first; see :func:`_keyset_page`."""
+        sql, params = _keyset_page(
+            "files", "file_id", {}, created_after, created_before, after, limit
+        )
+        with self._connect() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        return [FileRecord(**dict(row)) for row in rows]
+
+    @_timed
+    def create_task(
+        self,
+        task_id: str,
+        task_type: str,
+        file_id: str,
+        status: str = "queued",
+        inference_mode: str | None = None,
+        payload: str | None = None,
+        lease_owner: str | None = None,
+        lease_seconds: float = 0.0,
+    ) -> TaskRecord:
+        """Insert a task. Only queued tasks with a ``payload`` are claimed by
+        workers; the others are settled by the API process itself, which
+        holds them under a lease as ``lease_owner``."""
         now = utc_now()
+        expires_at = time.time() + lease_seconds if lease_owner is not None else None
         with self._connect() as conn:
-            current = self.get_file(file_id)
-            conn.execute(
+            row = conn.execute(
                 """
-                UPDATE files
-                SET gaussians_path = ?, render_path = ?, render_depth_path = ?, updated_at = ?
-                WHERE file_id = ?
+                INSERT INTO tasks (
+                    task_id, task_type, status, error, file_id, created_at, updated_at,
+                    inference_mode, payload, lease_owner, lease_expires_at
+                )
+                VALUES (?, ?, ?, NULL, ?, ?, ?, ?, ?, ?, ?)
+                RETURNING *
                 """,
                 (
-                    gaussians_path if gaussians_path is not None else current.gaussians_path,
-                    render_path if render_path is not None else current.render_path,
-                    render_depth_path if render_depth_path is not None else current.render_depth_path,
-                    now,
+                    task_id,
+                    task_type,
+                    status,
                     file_id,
+                    now,
+                    now,
+                    inference_mode,
+                    payload,
+                    lease_owner,
+                    expires_at,
                 ),
-            )
-        return self.get_file(file_id)
+            ).fetchone()
+        return TaskRecord(**dict(row))
 
-    def get_file(self, file_id: str) -> FileRecord:
+    @_timed
+    def update_task(
+        self,
+        task_id: str,
+        status: str,
+        error: str | None = None,
+        queue_wait_ms: float | None = None,
+        owner: str | None = None,
+    ) -> TaskRecord:
+        """Set a task's status. With ``owner`` the update only applies while
+        that worker still holds the task's lease."""
         with self._connect() as conn:
-            row = conn.execute("SELECT * FROM files WHERE file_id = ?", (file_id,)).fetchone()
+            row = self._update_task(conn, task_id, status, error, queue_wait_ms, owner)
+        return TaskRecord(**dict(row))
+
+    @staticmethod
+    def _update_task(
+        conn: sqlite3.Connection,
+        task_id: str,
+        status: str,
+        error: str | None,
+        queue_wait_ms: float | None,
+        owner: str | None,
+    ) -> sqlite3.Row:
+        now = utc_now()
+        started_at = now if queue_wait_ms is not None else None
+        row = conn.execute(
+            """
+            UPDATE tasks
+            SET status = ?, error = ?, updated_at = ?,
+                started_at = COALESCE(?, started_at),
+                queue_wait_ms = COALESCE(?, queue_wait_ms)
+            WHERE task_id = ?
+                AND (? IS NULL OR (lease_owner = ? AND status IN ('queued', 'running')))
+            RETURNING *
+            """,
+            (status, error, now, started_at, queue_wait_ms, task_id, owner, owner),
+        ).fetchone()
         if row is None:
-            raise KeyError("file not found")
-        return FileRecord(**dict(row))
+            # Raised inside the transaction so related writes roll back too.
+            raise KeyError("task lease lost" if owner else "task not found")
+        return row
 
-    def list_files(self, file_ids: Iterable[str]) -> list[FileRecord]:
-        ids = list(file_ids)
+    @_timed
+    def complete_task(
+        self,
+        task_id: str,
+        file_id: str,
+        gaussians_path: str | None = None,
+        render_path: str | None = None,
+        render_depth_path: str | None = None,
+        owner: str | None = None,
+    ) -> TaskRecord:
+        """Record a task's outputs on its file and mark it completed in one transaction."""
+        with self._connect() as conn:
+            self._update_file_outputs(conn, file_id, gaussians_path, render_path, render_depth_path)
+            row = self._update_task(conn, task_id, "completed", None, None, owner)
+        return TaskRecord(**dict(row))
+
+    @_timed
+    def get_task(self, task_id: str) -> TaskRecord:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        if row is None:
+            raise KeyError("task not found")
+        return TaskRecord(**dict(row))
+
+    @_timed
+    def list_tasks(self, task_ids: Iterable[str]) -> list[TaskRecord]:
+        ids = list(task_ids)
         if not ids:
             return []
-        placeholders = ",".join(["?"] * len(ids))
+        rows: list[sqlite3.Row] = []
+        with self._connect() as conn:
+            for start in range(0, len(ids), _IN_CHUNK):
+                chunk = ids[start : start + _IN_CHUNK]
+                placeholders = ",".join(["?"] * len(chunk))
+                rows += conn.execute(
+                    f"SELECT * FROM tasks WHERE task_id IN ({placeholders})", chunk
+                ).fetchall()
+        return [TaskRecord(**dict(row)) for row in rows]
+
+    @_timed
+    def page_tasks(
+        self,
+        limit: int,
+        status: str | None = None,
+        task_type: str | None = None,
+        created_after: str | None = None,
+        created_before: str | None = None,
+        after: tuple[str, str] | None = None,
+    ) -> list[TaskRecord]:
+        """Tasks newest first; see :func:`_keyset_page`."""
+        sql, params = _keyset_page(
+            "tasks",
+            "task_id",
+            {"status": status, "task_type": task_type},
+            created_after,
+            created_before,
+            after,
+            limit,
+        )
+        with self._connect() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        return [TaskRecord(**dict(row)) for row in rows]
+
+    @_timed
+    def claim_task(
+        self, owner: str, lease_seconds: float, task_types: Iterable[str]
+    ) -> TaskRecord | None:
+        """Lease a queued job of one of ``task_types`` to ``owner``: the oldest
+        of the first type in ``task_types`` that has one queued.
+
+        A single UPDATE selects and marks the job, so concurrent workers, in
+        this process or others sharing the database, never claim the same one.
+        The job stays ``queued`` until :meth:`mark_started`; it may still
+        wait for a device.
+        """
+        types = list(task_types)
+        placeholders = ",".join(["?"] * len(types))
+        rank = " ".join(f"WHEN ? THEN {index}" for index in range(len(types)))
+        with self._connect() as conn:
+            row = conn.execute(
+                f"""
+                UPDATE tasks
+                SET lease_owner = ?, lease_expires_at = ?, attempts = attempts + 1
+                WHERE task_id = (
+                    SELECT task_id FROM tasks
+                    WHERE status = 'queued' AND payload IS NOT NULL
+                        AND lease_owner IS NULL AND task_type IN ({placeholders})
+                    ORDER BY CASE task_type {rank} END, created_at
+                    LIMIT 1
+                )
+                RETURNING *
+                """,
+                (owner, time.time() + lease_seconds, *types, *types),
+            ).fetchone()
+        return TaskRecord(**dict(row)) if row is not None else None
+
+    @_timed
+    def mark_started(self, task_id: str, owner: str) -> TaskRecord:
+        """Mark a job claimed by ``owner`` running, with the time it waited
+        since it was enqueued. Raises ``KeyError`` when the lease was lost."""
+        now = utc_now()
+        with self._connect() as conn:
+            row = conn.execute(
+                """
+                UPDATE tasks
+                SET status = 'running', updated_at = ?, started_at = ?,
+                    queue_wait_ms = (julianday(?) - julianday(created_at)) * 86400000.0
+                WHERE task_id = ? AND lease_owner = ? AND status = 'queued'
+                RETURNING *
+                """,
+                (now, now, now, task_id, owner),
+            ).fetchone()
+        if row is None:
+            raise KeyError("task lease lost")
+        return TaskRecord(**dict(row))
+
+    @_timed
+    def renew_leases(self, owner: str, lease_seconds: float) -> int:
+        with self._connect() as conn:
+            cursor = conn.execute(
+                """
+                UPDATE tasks SET lease_expires_at = ?
+                WHERE lease_owner = ? AND status IN ('queued', 'running')
+                """,
+                (time.time() + lease_seconds, owner),
+            )
+        return cursor.rowcount
+
+    @_timed
+    def requeue_expired(self, max_attempts: int) -> list[TaskRecord]:
+        """Return claimed jobs whose lease ran out to the queue, or fail them
+        once they have been attempted ``max_attempts`` times."""
+        now = utc_now()
+        with self._connect() as conn:
+            rows = conn.execute(
+                """
+                UPDATE tasks
+                SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END,
+                    error = CASE WHEN attempts >= ?
+                        THEN 'worker lease expired after ' || attempts || ' attempts'
+                        ELSE NULL END,
+                    lease_owner = NULL, lease_expires_at = NULL, updated_at = ?
+                WHERE status IN ('queued', 'running') AND payload IS NOT NULL
+                    AND lease_owner IS NOT NULL
+                    AND (lease_expires_at IS NULL OR lease_expires_at < ?)
+                RETURNING *
+                """,
+                (max_attempts, max_attempts, now, time.time()),
+            ).fetchall()
+        return [TaskRecord(**dict(row)) for row in rows]
+
+    @_timed
+    def fail_orphaned_tasks(self, error: str) -> list[TaskRecord]:
+        """Fail unfinished tasks that no worker can pick up: those settled in
+        the memory of an API process that stopped renewing their lease, so
+        has exited."""
         with self._connect() as conn:
             rows = conn.execute(
-                f"SELECT * FROM files WHERE file_id IN ({placeholders})", ids
+                """
+                UPDATE tasks
+                SET status = 'failed', error = ?, updated_at = ?,
+                    lease_owner = NULL, lease_expires_at = NULL
+                WHERE status IN ('queued', 'running') AND payload IS NULL
+                    AND (lease_expires_at IS NULL OR lease_expires_at < ?)
+                RETURNING *
+                """,
+                (error, utc_now(), time.time()),
             ).fetchall()
-        return [FileRecord(**dict(row)) for row in rows]
+        return [TaskRecord(**dict(row)) for row in rows]
+
+    @_timed
+    def count_jobs(self) -> dict[str, int]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                """
+                SELECT status, COUNT(*) FROM tasks
+                WHERE status IN ('queued', 'running') AND payload IS NOT NULL
+                GROUP BY status
+                """
+            ).fetchall()
+        counts = {"queued": 0, "running": 0}
+        counts.update({row[0]: row[1] for row in rows})
+        return counts
+
+    @_timed
+    def get_predict_cache(self, content_hash: str) -> PredictCacheRecord | None:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM predict_cache WHERE content_hash = ?", (content_hash,)
+            ).fetchone()
+        if row is None:
+            return None
+        return PredictCacheRecord(**dict(row))
 
-    def create_task(self, task_id: str, task_type: str, file_id: str) -> TaskRecord:
+    @_timed
+    def put_predict_cache(
+        self, content_hash: str, model_id: str, file_id: str, gaussians_path: str
+    ) -> None:
         now = utc_now()
         with self._connect() as conn:
             conn.execute(
                 """
-                INSERT INTO tasks (task_id, task_type, status, error, file_id, created_at, updated_at)
-                VALUES (?, ?, ?, NULL, ?, ?, ?)
+                INSERT OR REPLACE INTO predict_cache (
+                    content_hash, model_id, file_id, gaussians_path, hits, created_at, last_hit_at
+                ) VALUES (?, ?, ?, ?, 0, ?, NULL)
                 """,
-                (task_id, task_type, "queued", file_id, now, now),
+                (content_hash, model_id, file_id, gaussians_path, now),
             )
-        return self.get_task(task_id)
 
-    def update_task(self, task_id: str, status: str, error: str | None = None) -> TaskRecord:
-        now = utc_now()
+    @_timed
+    def touch_predict_cache(self, content_hash: str) -> None:
         with self._connect() as conn:
             conn.execute(
                 """
-                UPDATE tasks SET status = ?, error = ?, updated_at = ? WHERE task_id = ?
+                UPDATE predict_cache SET hits = hits + 1, last_hit_at = ? WHERE content_hash = ?
                 """,
-                (status, error, now, task_id),
+                (utc_now(), content_hash),
             )
-        return self.get_task(task_id)
 
-    def get_task(self, task_id: str) -> TaskRecord:
+    @_timed
+    def delete_predict_cache(self, content_hash: str) -> None:
         with self._connect() as conn:
-            row = conn.execute("SELECT * FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+            conn.execute("DELETE FROM predict_cache WHERE content_hash = ?", (content_hash,))
+
+    @_timed
+    def get_render(self, file_id: str, render_key: str) -> RenderRecord | None:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM renders WHERE file_id = ? AND render_key = ?", (file_id, render_key)
+            ).fetchone()
         if row is None:
-            raise KeyError("task not found")
-        return TaskRecord(**dict(row))
+            return None
+        return RenderRecord(**dict(row))
+
+    @_timed
+    def put_render(
+        self,
+        file_id: str,
+        render_key: str,
+        params: str,
+        render_path: str,
+        render_depth_path: str,
+        size_bytes: int,
+    ) -> RenderRecord:
+        now = utc_now()
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO renders (
+                    file_id, render_key, params, render_path, render_depth_path,
+                    size_bytes, created_at, last_access_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (file_id, render_key, params, render_path, render_depth_path, size_bytes, now, now),
+            )
+            self._put_artifact(
+                conn,
+                file_id,
+                render_artifact(render_key),
+                str(Path(render_path).parent),
+                TIER_DERIVED,
+                size_bytes,
+                now,
+            )
+        return RenderRecord(
+            file_id=file_id,
+            render_key=render_key,
+            params=params,
+            render_path=render_path,
+            render_depth_path=render_depth_path,
+            size_bytes=size_bytes,
+            created_at=now,
+            last_access_at=now,
+        )
+
+    @_timed
+    def touch_render(self, file_id: str, render_key: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE renders SET last_access_at = ? WHERE file_id = ? AND render_key = ?",
+                (utc_now(), file_id, render_key),
+            )
+
+    @_timed
+    def list_renders(self, file_id: str) -> list[RenderRecord]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM renders WHERE file_id = ? ORDER BY last_access_at DESC",
+                (file_id,),
+            ).fetchall()
+        return [RenderRecord(**dict(row)) for row in rows]
+
+    @_timed
+    def delete_render(self, file_id: str, render_key: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM renders WHERE file_id = ? AND render_key = ?", (file_id, render_key)
+            )
+            conn.execute(
+                "DELETE FROM artifacts WHERE file_id = ? AND name = ?",
+                (file_id, render_artifact(render_key)),
+            )
+
+    @_timed
+    def put_artifact(
+        self, file_id: str, name: str, path: str, tier: int, size_bytes: int
+    ) -> None:
+        with self._connect() as conn:
+            self._put_artifact(conn, file_id, name, path, tier, size_bytes, utc_now())
+
+    @staticmethod
+    def _put_artifact(
+        conn: sqlite3.Connection,
+        file_id: str,
+        name: str,
+        path: str,
+        tier: int,
+        size_bytes: int,
+        now: str,
+    ) -> None:
+        conn.execute(
+            """
+            INSERT INTO artifacts (
+                file_id, name, path, tier, size_bytes, created_at, last_access_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (file_id, name) DO UPDATE SET
+                path = excluded.path,
+                size_bytes = excluded.size_bytes,
+                last_access_at = excluded.last_access_at
+            """,
+            (file_id, name, path, tier, size_bytes, now, now),
+        )
+
+    @_timed
+    def touch_artifacts(self, accesses: Iterable[tuple[str, str, str]]) -> None:
+        """Apply ``(file_id, name, accessed_at)`` tuples, keeping the latest access."""
+        with self._connect() as conn:
+            conn.executemany(
+                """
+                UPDATE artifacts SET last_access_at = MAX(last_access_at, ?)
+                WHERE file_id = ? AND name = ?
+                """,
+                [(accessed_at, file_id, name) for file_id, name, accessed_at in accesses],
+            )
+
+    @_timed
+    def artifact_usage(self) -> dict[str, int]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM artifacts"
+            ).fetchone()
+        return {"artifacts": row[0], "bytes": row[1]}
+
+    @_timed
+    def list_eviction_candidates(
+        self, limit: int, accessed_before: str | None = None
+    ) -> list[ArtifactRecord]:
+        """Artifacts in eviction order: derived before originals, least recently
+        used first. Files with a queued or running task are skipped."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                """
+                SELECT * FROM artifacts
+                WHERE (? IS NULL OR last_access_at < ?)
+                    AND file_id NOT IN (
+                        SELECT file_id FROM tasks WHERE status IN ('queued', 'running')
+                    )
+                ORDER BY tier, last_access_at
+                LIMIT ?
+                """,
+                (accessed_before, accessed_before, limit),
+            ).fetchall()
+        return [ArtifactRecord(**dict(row)) for row in rows]
+
+    @_timed
+    def evict_artifact(self, record: ArtifactRecord) -> bool:
+        """Forget an artifact and every reference to it, unless it was accessed
+        since ``record`` was read. Returns whether it was removed; the caller
+        deletes the data on disk."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                """
+                DELETE FROM artifacts
+                WHERE file_id = ? AND name = ? AND last_access_at = ?
+                """,
+                (record.file_id, record.name, record.last_access_at),
+            )
+            if cursor.rowcount == 0:
+                return False
+            now = utc_now()
+            if record.name == ARTIFACT_GAUSSIANS:
+                conn.execute(
+                    "UPDATE files SET gaussians_path = NULL, updated_at = ? WHERE file_id = ?",
+                    (now, record.file_id),
+                )
+                conn.execute(
+                    "DELETE FROM predict_cache WHERE gaussians_path = ?", (record.path,)
+                )
+            elif record.name.startswith(ARTIFACT_RENDER_PREFIX):
+                render_key = record.name.removeprefix(ARTIFACT_RENDER_PREFIX)
+                conn.execute(
+                    """
+                    UPDATE files
+                    SET render_path = NULL, render_depth_path = NULL, updated_at = ?
+                    WHERE file_id = ? AND render_path IN (
+                        SELECT render_path FROM renders WHERE file_id = ? AND render_key = ?
+                    )
+                    """,
+                    (now, record.file_id, record.file_id, render_key),
+                )
+                conn.execute(
+                    "DELETE FROM renders WHERE file_id = ? AND render_key = ?",
+                    (record.file_id, render_key),
+                )
+        return True
+
+    @_timed
+    def list_untracked_files(self, after: str, limit: int) -> list[FileRecord]:
+        """Files, in ``file_id`` order after ``after``, with no tracked artifacts:
+        those stored before artifacts were tracked."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                """
+                SELECT * FROM files AS f
+                WHERE f.file_id > ?
+                    AND NOT EXISTS (SELECT 1 FROM artifacts AS a WHERE a.file_id = f.file_id)
+                ORDER BY f.file_id
+                LIMIT ?
+                """,
+                (after, limit),
+            ).fetchall()
+        return [FileRecord(**dict(row)) for row in rows]
@@ -6,10 +6,29 @@ from datetime import datetime, timezone
 from pathlib import Path
 
 
+# Artifact names in the ``artifacts`` table. Derived artifacts can be rebuilt
+# from the original and are evicted before it.
+ARTIFACT_ORIGINAL = "original"
+ARTIFACT_GAUSSIANS = "gaussians"
+ARTIFACT_SPLAT = "splat"
+ARTIFACT_RENDER_PREFIX = "render:"
+ARTIFACT_PROFILE_PREFIX = "profile:"
+TIER_DERIVED = 0
+TIER_ORIGINAL = 1
+
+
 def utc_now() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
+def render_artifact(render_key: str) -> str:
+    return ARTIFACT_RENDER_PREFIX + render_key
+
+
+def profile_artifact(task_id: str) -> str:
+    return ARTIFACT_PROFILE_PREFIX + task_id
+
+
 @dataclass(frozen=True)
 class FileRecord:
     file_id: str
@@ -31,6 +50,66 @@ class TaskRecord:
     file_id: str
     created_at: str
     updated_at: str
+    started_at: str | None = None
+    queue_wait_ms: float | None = None
+    inference_mode: str | None = None
+    payload: str | None = None
+    lease_owner: str | None = None
+    lease_expires_at: float | None = None
+    attempts: int = 0
+
+
+@dataclass(frozen=True)
+class PredictCacheRecord:
+    content_hash: str
+    model_id: str
+    file_id: str
+    gaussians_path: str
+    hits: int
+    created_at: str
+    last_hit_at: str | None
+
+
+@dataclass(frozen=True)
+class RenderRecord:
+    file_id: str
+    render_key: str
+    params: str
+    render_path: str
+    render_depth_path: str
+    size_bytes: int
+    created_at: str
+    last_access_at: str
+
+
+@dataclass(frozen=True)
+class ArtifactRecord:
+    file_id: str
+    name: str
+    path: str
+    tier: int
+    size_bytes: int
+    created_at: str
+    last_access_at: str
+
+
+def _ensure_columns(conn: sqlite3.Connection, table: str, columns: dict[str, str]) -> None:
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    for name, definition in columns.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+
+
+def _ensure_index(
+    conn: sqlite3.Connection, name: str, table: str, columns: tuple[str, ...]
+) -> None:
+    """Create an index, replacing an older definition under the same name."""
+    existing = tuple(row[2] for row in conn.execute(f"PRAGMA index_info({name})"))
+    if existing == columns:
+        return
+    if existing:
+        conn.execute(f"DROP INDEX {name}")
+    conn.execute(f"CREATE INDEX {name} ON {table}({', '.join(columns)})")
 
 
 def ensure_db(db_path: str) -> None:
@@ -50,6 +129,7 @@ def ensure_db(db_path: str) -> None:
             )
             """
         )
+        _ensure_index(conn, "idx_files_created", "files", ("created_at", "file_id"))
         conn.execute(
             """
             CREATE TABLE IF NOT EXISTS tasks (
@@ -60,9 +140,94 @@ def ensure_db(db_path: str) -> None:
                 file_id TEXT NOT NULL,
                 created_at TEXT NOT NULL,
                 updated_at TEXT NOT NULL,
+                started_at TEXT,
+                queue_wait_ms REAL,
+                inference_mode TEXT,
+                payload TEXT,
+                lease_owner TEXT,
+                lease_expires_at REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
                 FOREIGN KEY (file_id) REFERENCES files(file_id)
             )
             """
         )
+        _ensure_columns(
+            conn,
+            "tasks",
+            {
+                "started_at": "TEXT",
+                "queue_wait_ms": "REAL",
+                "inference_mode": "TEXT",
+                "payload": "TEXT",
+                "lease_owner": "TEXT",
+                "lease_expires_at": "REAL",
+                "attempts": "INTEGER NOT NULL DEFAULT 0",
+            },
+        )
         conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_file_id ON tasks(file_id)")
+        # Keyset pagination walks (created_at, id) within each listing filter;
+        # workers also claim the oldest queued job through the status index.
+        for name, columns in (
+            ("idx_tasks_status_created", ("status", "created_at", "task_id")),
+            ("idx_tasks_type_created", ("task_type", "created_at", "task_id")),
+            ("idx_tasks_status_type_created", ("status", "task_type", "created_at", "task_id")),
+            ("idx_tasks_created", ("created_at", "task_id")),
+        ):
+            _ensure_index(conn, name, "tasks", columns)
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS predict_cache (
+                content_hash TEXT PRIMARY KEY,
+                model_id TEXT NOT NULL,
+                file_id TEXT NOT NULL,
+                gaussians_path TEXT NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                created_at TEXT NOT NULL,
+                last_hit_at TEXT,
+                FOREIGN KEY (file_id) REFERENCES files(file_id)
+            )
+            """
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_predict_cache_model_id ON predict_cache(model_id)"
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS renders (
+                file_id TEXT NOT NULL,
+                render_key TEXT NOT NULL,
+                params TEXT NOT NULL,
+                render_path TEXT NOT NULL,
+                render_depth_path TEXT NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                created_at TEXT NOT NULL,
+                last_access_at TEXT NOT NULL,
+                PRIMARY KEY (file_id, render_key),
+                FOREIGN KEY (file_id) REFERENCES files(file_id)
+            )
+            """
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_renders_file_access ON renders(file_id, last_access_at)"
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS artifacts (
+                file_id TEXT NOT NULL,
+                name TEXT NOT NULL,
+                path TEXT NOT NULL,
+                tier INTEGER NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                created_at TEXT NOT NULL,
+                last_access_at TEXT NOT NULL,
+                PRIMARY KEY (file_id, name),
+                FOREIGN KEY (file_id) REFERENCES files(file_id)
+            )
+            """
+        )
+        # Eviction walks artifacts least-recently-used first, derived before originals.
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_artifacts_tier_access "
+            "ON artifacts(tier, last_access_at)"
+        )
         conn.commit()
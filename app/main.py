@@ -1,29 +1,22 @@
 from __future__ import annotations
 
 import asyncio
+import logging
+import threading
 from pathlib import Path
 
 from fastapi import FastAPI
 from fastapi import HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 
 from app.api import routes
+from app.core import metrics
 from app.core.config import settings
-from app.db.repo import Repository
-from app.services.predictor import PredictService, PredictorManager
-from app.services.renderer import RenderService
-from app.tasks.runner import TaskRunner
-
-
-class AppState:
-    def __init__(self) -> None:
-        self.repo = Repository(settings.db_path)
-        self.runner = TaskRunner(max_workers=4)
-        self.predictor_manager = PredictorManager(settings.model_path)
-        self.predict_service = PredictService(self.repo, self.predictor_manager)
-        self.render_service = RenderService()
+from app.state import AppState
 
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="mlsharp-service")
 app.add_middleware(
@@ -31,18 +24,55 @@ app.add_middleware(
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
-    allow_headers=["*"]
+    allow_headers=["*"],
+    expose_headers=["X-LOD-Tiers"],
 )
+
+
+def bind_state(new_state: AppState) -> None:
+    """Serve requests from ``new_state``. The load harness uses this to swap in
+    stand-in services before the server starts."""
+    global state
+    state = new_state
+    app.state.repo = state.repo
+    app.state.runner = state.runner
+    app.state.events = state.events
+    app.state.admission = state.admission
+    app.state.batcher = state.batcher
+    app.state.cpu_pool = state.cpu_pool
+    app.state.predict_cache = state.predict_cache
+    app.state.predict_service = state.predict_service
+    app.state.gaussian_cache = state.gaussian_cache
+    app.state.render_service = state.render_service
+    app.state.render_cache = state.render_cache
+    app.state.retention = state.retention
+    app.state.watcher = state.watcher
+    app.state.job_worker = state.job_worker if settings.embedded_worker else None
+
+
 state = AppState()
-app.state.repo = state.repo
-app.state.runner = state.runner
-app.state.predict_service = state.predict_service
-app.state.render_service = state.render_service
+bind_state(state)
 
 
 @app.on_event("startup")
 async def on_startup() -> None:
-    state.runner.set_loop(asyncio.get_running_loop())
+    state.events.set_loop(asyncio.get_running_loop())
+    # Coalesced followers live only in the memory of the API process that
+    # made them; those of a stopped process are failed once their lease expires.
+    state.watcher.hold_followers()
+    state.watcher.start()
+    state.retention.start()
+    threading.Thread(target=state.identify_model, name="model-id", daemon=True).start()
+    if settings.embedded_worker:
+        state.start_worker()
+
+
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+    state.watcher.stop()
+    state.stop_worker()
+    state.retention.stop()
+    state.repo.close()
 
 
 @app.get("/healthz")
@@ -50,6 +80,30 @@ async def healthz():
     return {"status": "ok"}
 
 
+@app.get("/readyz")
+async def readyz():
+    if not settings.embedded_worker:
+        # Jobs run in separate worker processes; this process only enqueues.
+        return {"status": "ready", "worker": "external"}
+    if state.ready():
+        return {
+            "status": "ready",
+            "devices": state.predictor_manager.loaded_devices(),
+            "cpu_workers": settings.cpu_workers if state.cpu_pool else 0,
+            "inference_mode": state.predictor_manager.mode.name,
+            "preload_ms": state.preload_timings,
+        }
+    error = state.preload_error or (state.cpu_pool.error if state.cpu_pool else None)
+    if error is not None:
+        return JSONResponse(status_code=503, content={"status": "failed", "error": error})
+    return JSONResponse(status_code=503, content={"status": "loading"})
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+
 @app.get("/")
 async def index():
     test_path = Path(__file__).resolve().parents[1] / "test.html"
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any
+
+import torch
+
+from app.core import metrics
+from app.tasks.runner import TaskRunner
+from app.tasks.scheduler import PRIORITY_INTERACTIVE
+
+if TYPE_CHECKING:
+    from app.services.predictor import PredictorManager
+
+
+@dataclass
+class _Pending:
+    image: torch.Tensor
+    disparity_factor: torch.Tensor
+    future: Future = field(default_factory=Future)
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class _BatchStats:
+    batches: int = 0
+    items: int = 0
+    forward_seconds: float = 0.0
+    latency_seconds: float = 0.0
+
+
+def _select(outputs: Any, index: int) -> Any:
+    if isinstance(outputs, torch.Tensor):
+        return outputs[index : index + 1]
+    if isinstance(outputs, tuple) and hasattr(outputs, "_fields"):
+        return type(outputs)(*(_select(value, index) for value in outputs))
+    if isinstance(outputs, (tuple, list)):
+        return type(outputs)(_select(value, index) for value in outputs)
+    return outputs
+
+
+class PredictBatcher:
+    """Groups concurrent forward passes into one batched predictor call.
+
+    Callers block in :meth:`infer` while a per-device collector thread waits for
+    up to ``max_batch_size`` items or ``max_wait_ms`` after the first one, then
+    runs the stacked batch in a device slot and hands each caller its slice.
+    """
+
+    def __init__(
+        self,
+        manager: PredictorManager,
+        runner: TaskRunner,
+        max_batch_size: int,
+        max_wait_ms: float,
+    ) -> None:
+        self._manager = manager
+        self._runner = runner
+        self._max_batch_size = max(1, max_batch_size)
+        self._max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._cond = threading.Condition()
+        self._pending: dict[str, list[_Pending]] = {}
+        self._collectors: dict[str, threading.Thread] = {}
+        self._stats: dict[int, _BatchStats] = {}
+
+    @property
+    def max_batch_size(self) -> int:
+        return self._max_batch_size
+
+    def infer(
+        self, device: torch.device, image: torch.Tensor, disparity_factor: torch.Tensor
+    ) -> Any:
+        item = _Pending(image=image, disparity_factor=disparity_factor)
+        key = str(device)
+        with self._cond:
+            self._pending.setdefault(key, []).append(item)
+            if key not in self._collectors:
+                collector = threading.Thread(
+                    target=self._collect, args=(device,), name=f"batcher-{key}", daemon=True
+                )
+                self._collectors[key] = collector
+                collector.start()
+            self._cond.notify_all()
+        return item.future.result()
+
+    def stats(self) -> dict[str, Any]:
+        with self._cond:
+            snapshot = {size: _BatchStats(**vars(stats)) for size, stats in self._stats.items()}
+        report: dict[str, Any] = {
+            "max_batch_size": self._max_batch_size,
+            "max_wait_ms": self._max_wait * 1000.0,
+            "by_batch_size": {},
+        }
+        for size, stats in sorted(snapshot.items()):
+            report["by_batch_size"][str(size)] = {
+                "batches": stats.batches,
+                "items": stats.items,
+                "forward_ms_avg": stats.forward_seconds / stats.batches * 1000.0,
+                "item_latency_ms_avg": stats.latency_seconds / stats.items * 1000.0,
+                "items_per_second": stats.items / stats.forward_seconds
+                if stats.forward_seconds > 0
+                else 0.0,
+            }
+        return report
+
+    def _collect(self, device: torch.device) -> None:
+        key = str(device)
+        while True:
+            with self._cond:
+                pending = self._pending[key]
+                while not pending:
+                    self._cond.wait()
+                deadline = pending[0].enqueued_at + self._max_wait
+                while len(pending) < self._max_batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = pending[: self._max_batch_size]
+                del pending[: self._max_batch_size]
+            self._run_batch(device, batch)
+
+    def _run_batch(self, device: torch.device, batch: list[_Pending]) -> None:
+        images = torch.cat([item.image for item in batch])
+        disparity_factors = torch.cat([item.disparity_factor for item in batch])
+        started = time.perf_counter()
+        try:
+            outputs = self._runner.scheduler(str(device)).call(
+                self._manager.forward,
+                device,
+                images,
+                disparity_factors,
+                priority=PRIORITY_INTERACTIVE,
+            )
+        except BaseException as exc:
+            for item in batch:
+                item.future.set_exception(exc)
+            return
+        finished = time.monotonic()
+        forward_seconds = time.perf_counter() - started
+        metrics.STAGE_SECONDS.labels("predict", "forward_batch").observe(forward_seconds)
+        with self._cond:
+            stats = self._stats.setdefault(len(batch), _BatchStats())
+            stats.batches += 1
+            stats.items += len(batch)
+            stats.forward_seconds += forward_seconds
+            stats.latency_seconds += sum(finished - item.enqueued_at for item in batch)
+        for index, item in enumerate(batch):
+            item.future.set_result(_select(outputs, index))
@@ -0,0 +1,327 @@
+from __future__ import annotations
+
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+import torch
+
+from app.services.inference import FP32_EAGER, InferenceMode
+from app.services.predictor import PredictorManager
+from app.tasks.events import NULL_PROGRESS, TaskProgress
+
+logger = logging.getLogger(__name__)
+
+_POLL_SECONDS = 1.0
+
+
+def partition_cores(workers: int) -> list[list[int]]:
+    """Split the cores this process may run on into ``workers`` disjoint sets.
+
+    With more workers than cores, sets wrap around and share cores.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        cores = sorted(os.sched_getaffinity(0))
+    else:
+        cores = list(range(os.cpu_count() or 1))
+    if workers >= len(cores):
+        return [[cores[index % len(cores)]] for index in range(workers)]
+    per_worker = len(cores) // workers
+    return [cores[index * per_worker : (index + 1) * per_worker] for index in range(workers)]
+
+
+class _WorkerProgress(TaskProgress):
+    """Forwards stage transitions from a worker to the API process."""
+
+    def __init__(self, events: Any, index: int, job_id: int) -> None:
+        super().__init__(None, None)
+        self._events = events
+        self._index = index
+        self._job_id = job_id
+
+    def stage(self, name: str, current: int | None = None, total: int | None = None) -> None:
+        self._events.put(("stage", self._index, self._job_id, (name, current, total)))
+
+
+def _worker_main(
+    index: int,
+    cores: list[int],
+    threads: int,
+    model_path: str,
+    mmap: bool,
+    mode: InferenceMode,
+    warmup: bool,
+    inbox: Any,
+    events: Any,
+) -> None:
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass
+    # With mmap loading and meta-device construction the weights stay backed by
+    # the page cache, so K workers share one copy of the checkpoint in RAM.
+    manager = PredictorManager(model_path, mmap=mmap, mode=mode)
+    try:
+        timings = manager.preload(torch.device("cpu"), warmup=warmup)
+    except Exception as exc:
+        events.put(("failed", index, None, f"{type(exc).__name__}: {exc}"))
+        return
+    events.put(("ready", index, None, timings))
+    while True:
+        job = inbox.get()
+        if job is None:
+            return
+        job_id, fn, args = job
+        try:
+            result = fn(manager, *args, progress=_WorkerProgress(events, index, job_id))
+        except Exception as exc:
+            events.put(("error", index, job_id, str(exc) or type(exc).__name__))
+        else:
+            events.put(("done", index, job_id, result))
+
+
+@dataclass
+class _Job:
+    job_id: int
+    fn: Callable[..., Any]
+    args: tuple
+    progress: TaskProgress
+    future: Future = field(default_factory=Future)
+
+
+@dataclass
+class _Worker:
+    index: int
+    cores: list[int]
+    process: Any = None
+    inbox: Any = None
+    ready: bool = False
+    job: _Job | None = None
+    completed: int = 0
+    load_ms: dict[str, float] = field(default_factory=dict)
+
+
+class CpuInferencePool:
+    """Runs predict jobs in K worker processes, each pinned to its own cores.
+
+    Every worker loads the predictor once and runs jobs with its own intra-op
+    thread budget, so Python-side work (decoding, PLY writing) does not contend
+    on one GIL. Jobs are queued in the API process and handed to an idle
+    worker; a worker that dies fails only the job it was running and is
+    restarted.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        model_path: str,
+        threads_per_worker: int = 0,
+        mmap: bool = True,
+        mode: InferenceMode = FP32_EAGER,
+        warmup: bool = False,
+    ) -> None:
+        self._context = multiprocessing.get_context("spawn")
+        self._model_path = model_path
+        self._mmap = mmap
+        self._mode = mode
+        self._warmup = warmup
+        self._workers = [
+            _Worker(index=index, cores=cores)
+            for index, cores in enumerate(partition_cores(max(1, workers)))
+        ]
+        self._threads = threads_per_worker
+        self._events = self._context.Queue()
+        self._pending: deque[_Job] = deque()
+        self._job_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._error: str | None = None
+        self._restarts = 0
+        self._stopping = False
+        self._collector: threading.Thread | None = None
+
+    def start(self) -> None:
+        for worker in self._workers:
+            self._spawn(worker)
+        self._collector = threading.Thread(target=self._collect, name="cpu-pool", daemon=True)
+        self._collector.start()
+
+    def ready(self) -> bool:
+        with self._lock:
+            return all(worker.ready for worker in self._workers)
+
+    @property
+    def error(self) -> str | None:
+        return self._error
+
+    def pids(self) -> list[int]:
+        with self._lock:
+            return [worker.process.pid for worker in self._workers if worker.process is not None]
+
+    def submit(
+        self, fn: Callable[..., Any], *args: Any, progress: TaskProgress = NULL_PROGRESS
+    ) -> Future:
+        """Run ``fn(manager, *args, progress=...)`` in a worker.
+
+        ``fn`` must be importable by module path, and its arguments and result
+        picklable.
+        """
+        job = _Job(job_id=next(self._job_ids), fn=fn, args=args, progress=progress)
+        with self._lock:
+            if self._error is not None:
+                raise RuntimeError(self._error)
+            self._pending.append(job)
+            self._dispatch()
+        return job.future
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": len(self._workers),
+                "ready": sum(worker.ready for worker in self._workers),
+                "busy": sum(worker.job is not None for worker in self._workers),
+                "queued": len(self._pending),
+                "restarts": self._restarts,
+                "error": self._error,
+                "per_worker": [
+                    {
+                        "cores": worker.cores,
+                        "threads": self._thread_budget(worker),
+                        "completed": worker.completed,
+                        "load_ms": worker.load_ms,
+                    }
+                    for worker in self._workers
+                ],
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._stopping = True
+            pending = list(self._pending)
+            self._pending.clear()
+            workers = list(self._workers)
+        for job in pending:
+            job.future.set_exception(RuntimeError("CPU pool is shutting down"))
+        for worker in workers:
+            if worker.inbox is not None:
+                worker.inbox.put(None)
+        for worker in workers:
+            if worker.process is not None:
+                worker.process.join(timeout=5)
+                if worker.process.is_alive():
+                    worker.process.terminate()
+
+    def _thread_budget(self, worker: _Worker) -> int:
+        return self._threads if self._threads > 0 else len(worker.cores)
+
+    def _spawn(self, worker: _Worker) -> None:
+        worker.inbox = self._context.SimpleQueue()
+        worker.ready = False
+        worker.process = self._context.Process(
+            target=_worker_main,
+            args=(
+                worker.index,
+                worker.cores,
+                self._thread_budget(worker),
+                self._model_path,
+                self._mmap,
+                self._mode,
+                self._warmup,
+                worker.inbox,
+                self._events,
+            ),
+            name=f"cpu-worker-{worker.index}",
+            daemon=True,
+        )
+        worker.process.start()
+
+    def _dispatch(self) -> None:
+        # Caller holds self._lock.
+        for worker in self._workers:
+            if not self._pending:
+                return
+            if worker.ready and worker.job is None:
+                job = self._pending.popleft()
+                worker.job = job
+                worker.inbox.put((job.job_id, job.fn, job.args))
+
+    def _collect(self) -> None:
+        checked_at = time.monotonic()
+        while True:
+            if time.monotonic() - checked_at >= _POLL_SECONDS:
+                checked_at = time.monotonic()
+                self._check_workers()
+            try:
+                kind, index, job_id, payload = self._events.get(timeout=_POLL_SECONDS)
+            except queue.Empty:
+                with self._lock:
+                    if self._stopping:
+                        return
+                continue
+            worker = self._workers[index]
+            if kind == "stage":
+                with self._lock:
+                    job = worker.job
+                if job is not None and job.job_id == job_id:
+                    job.progress.stage(*payload)
+                continue
+            finished: _Job | None = None
+            failed: list[_Job] = []
+            with self._lock:
+                if kind == "ready":
+                    worker.ready = True
+                    worker.load_ms = payload
+                    logger.info(
+                        "CPU worker %d ready on cores %s with %d threads",
+                        index,
+                        worker.cores,
+                        self._thread_budget(worker),
+                    )
+                elif kind == "failed":
+                    self._error = f"CPU worker {index} failed to load the model: {payload}"
+                    failed = list(self._pending)
+                    self._pending.clear()
+                elif kind in ("done", "error"):
+                    finished, worker.job = worker.job, None
+                    worker.completed += 1
+                self._dispatch()
+            if kind == "failed":
+                logger.error(self._error)
+            for job in failed:
+                job.future.set_exception(RuntimeError(self._error))
+            if finished is not None:
+                if kind == "done":
+                    finished.future.set_result(payload)
+                else:
+                    finished.future.set_exception(RuntimeError(payload))
+
+    def _check_workers(self) -> None:
+        lost: list[_Job] = []
+        with self._lock:
+            if self._stopping or self._error is not None:
+                return
+            for worker in self._workers:
+                if worker.process.is_alive():
+                    continue
+                logger.warning(
+                    "CPU worker %d exited with code %s, restarting",
+                    worker.index,
+                    worker.process.exitcode,
+                )
+                if worker.job is not None:
+                    lost.append(worker.job)
+                    worker.job = None
+                self._restarts += 1
+                self._spawn(worker)
+        for job in lost:
+            job.future.set_exception(RuntimeError("CPU worker exited while running the job"))
@@ -0,0 +1,251 @@
+"""Gaussian rasterization on the CPU.
+
+A NumPy port of the forward pass gsplat runs on CUDA, for hosts without a GPU:
+gaussians are projected to 2D (EWA splatting with gsplat's 0.3 px low-pass),
+sorted by depth and binned into square tiles. Within a tile each splat is
+evaluated only at the pixels inside its footprint, and those samples are
+composited front to back per pixel. A frame runs on one thread; callers
+render several frames at once to use more cores, which works because NumPy
+releases the GIL inside the array operations that dominate."""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+
+import numpy as np
+
+_NEAR = 0.01
+_EPS_2D = 0.3
+_MIN_ALPHA = 1.0 / 255.0
+_MAX_ALPHA = 0.99
+_MIN_TRANSMITTANCE = 1e-4
+
+
+@dataclass(frozen=True)
+class CpuScene:
+    """Gaussians in the layout the rasterizer uses, prepared once per render."""
+
+    means: np.ndarray
+    # Covariance square roots R·S, so that the covariance is F·Fᵀ.
+    factors: np.ndarray
+    colors: np.ndarray
+    opacities: np.ndarray
+
+    @classmethod
+    def from_gaussians(cls, gaussians) -> CpuScene:
+        """From sharp's ``Gaussians3D`` (batch of one)."""
+        quaternions = gaussians.quaternions[0].detach().cpu().double().numpy()
+        w, x, y, z = (quaternions / np.linalg.norm(quaternions, axis=1, keepdims=True)).T
+        rotations = np.stack(
+            [
+                np.stack([1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y)], 1),
+                np.stack([2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x)], 1),
+                np.stack([2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y)], 1),
+            ],
+            axis=1,
+        )
+        scales = gaussians.singular_values[0].detach().cpu().double().numpy()
+        return cls(
+            means=gaussians.mean_vectors[0].detach().cpu().float().numpy(),
+            factors=(rotations * scales[:, None, :]).astype(np.float32),
+            colors=gaussians.colors[0].detach().cpu().float().numpy(),
+            opacities=gaussians.opacities[0].detach().cpu().float().numpy().reshape(-1),
+        )
+
+    @property
+    def count(self) -> int:
+        return len(self.means)
+
+
+@dataclass(frozen=True)
+class _Splats:
+    """Gaussians visible in one frame, nearest first."""
+
+    u: np.ndarray
+    v: np.ndarray
+    depth: np.ndarray
+    # Inverse 2D covariance [[a, b], [b, c]].
+    conic_a: np.ndarray
+    conic_b: np.ndarray
+    conic_c: np.ndarray
+    opacities: np.ndarray
+    colors: np.ndarray
+    # Half extents of the box outside which alpha is below the threshold.
+    extent_u: np.ndarray
+    extent_v: np.ndarray
+
+
+def _project(
+    scene: CpuScene, extrinsics: np.ndarray, intrinsics: np.ndarray, width: int, height: int
+) -> _Splats:
+    rotation = extrinsics[:3, :3].astype(np.float32)
+    cam = scene.means @ rotation.T + extrinsics[:3, 3].astype(np.float32)
+    (index,) = np.nonzero((cam[:, 2] > _NEAR) & (scene.opacities >= _MIN_ALPHA))
+    cam = cam[index]
+    x, y, z = cam.T
+    fx, fy = float(intrinsics[0, 0]), float(intrinsics[1, 1])
+    cx, cy = float(intrinsics[0, 2]), float(intrinsics[1, 2])
+    inv_z = 1.0 / z
+    u = fx * x * inv_z + cx
+    v = fy * y * inv_z + cy
+
+    # Rows of J·W·F, where J is the Jacobian of the projection at the mean:
+    # the 2D covariance is their Gram matrix.
+    factors = np.einsum("ij,njk->nik", rotation, scene.factors[index])
+    row_u = (fx * inv_z)[:, None] * (factors[:, 0] - (x * inv_z)[:, None] * factors[:, 2])
+    row_v = (fy * inv_z)[:, None] * (factors[:, 1] - (y * inv_z)[:, None] * factors[:, 2])
+    cov_a = np.einsum("ij,ij->i", row_u, row_u) + _EPS_2D
+    cov_b = np.einsum("ij,ij->i", row_u, row_v)
+    cov_c = np.einsum("ij,ij->i", row_v, row_v) + _EPS_2D
+    det = cov_a * cov_c - cov_b * cov_b
+
+    # Alpha is below the compositing threshold outside the ellipse
+    # d·Σ⁻¹·d = level, whose bounding box has half extents sqrt(level·Σ).
+    opacities = scene.opacities[index]
+    level = 2.0 * np.log(np.maximum(opacities, _MIN_ALPHA) / _MIN_ALPHA)
+    extent_u = np.sqrt(level * cov_a)
+    extent_v = np.sqrt(level * cov_c)
+
+    keep = (
+        (det > 0)
+        & (level > 0)
+        & (u + extent_u > 0)
+        & (u - extent_u < width)
+        & (v + extent_v > 0)
+        & (v - extent_v < height)
+    )
+    order = np.nonzero(keep)[0]
+    order = order[np.argsort(z[order], kind="stable")]
+    inv_det = 1.0 / det[order]
+    return _Splats(
+        u=u[order],
+        v=v[order],
+        depth=z[order],
+        conic_a=cov_c[order] * inv_det,
+        conic_b=-cov_b[order] * inv_det,
+        conic_c=cov_a[order] * inv_det,
+        opacities=opacities[order],
+        colors=scene.colors[index[order]],
+        extent_u=extent_u[order],
+        extent_v=extent_v[order],
+    )
+
+
+def _bin(
+    splats: _Splats, tiles_x: int, tiles_y: int, tile_size: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """Splat indices grouped by tile, nearest first within each tile, and the
+    offset of each tile's group."""
+    u, v = splats.u, splats.v
+    x0 = np.clip(((u - splats.extent_u) // tile_size).astype(np.int64), 0, tiles_x - 1)
+    x1 = np.clip(((u + splats.extent_u) // tile_size).astype(np.int64), 0, tiles_x - 1)
+    y0 = np.clip(((v - splats.extent_v) // tile_size).astype(np.int64), 0, tiles_y - 1)
+    y1 = np.clip(((v + splats.extent_v) // tile_size).astype(np.int64), 0, tiles_y - 1)
+    spans = x1 - x0 + 1
+    counts = spans * (y1 - y0 + 1)
+    splat = np.repeat(np.arange(len(counts)), counts)
+    starts = np.cumsum(counts) - counts
+    offset = np.arange(len(splat)) - np.repeat(starts, counts)
+    tile = (y0[splat] + offset // spans[splat]) * tiles_x + x0[splat] + offset % spans[splat]
+    # Splats are already in depth order, so a stable sort keeps it per tile.
+    order = np.argsort(tile, kind="stable")
+    bounds = np.zeros(tiles_x * tiles_y + 1, dtype=np.int64)
+    np.cumsum(np.bincount(tile, minlength=tiles_x * tiles_y), out=bounds[1:])
+    return splat[order], bounds
+
+
+def _footprints(
+    splats: _Splats, ids: np.ndarray, left: int, top: int, right: int, bottom: int
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(splat, x, y) for every pixel of the tile each splat may touch, in the
+    order of ``ids``."""
+    u, v = splats.u[ids] - 0.5, splats.v[ids] - 0.5
+    extent_u, extent_v = splats.extent_u[ids], splats.extent_v[ids]
+    # Pixel i has its center at i + 0.5.
+    x0 = np.maximum(np.ceil(u - extent_u), left).astype(np.int32)
+    x1 = np.minimum(np.floor(u + extent_u), right - 1).astype(np.int32)
+    y0 = np.maximum(np.ceil(v - extent_v), top).astype(np.int32)
+    y1 = np.minimum(np.floor(v + extent_v), bottom - 1).astype(np.int32)
+    spans = np.maximum(x1 - x0 + 1, 1)
+    counts = np.where(x1 >= x0, spans * np.maximum(y1 - y0 + 1, 0), 0)
+    owner = np.repeat(np.arange(len(ids), dtype=np.int32), counts)
+    offset = np.arange(len(owner), dtype=np.int32) - np.repeat(
+        (np.cumsum(counts) - counts).astype(np.int32), counts
+    )
+    rows, columns = np.divmod(offset, spans[owner])
+    return ids[owner], x0[owner] + columns, y0[owner] + rows
+
+
+def rasterize(
+    scene: CpuScene,
+    extrinsics: np.ndarray,
+    intrinsics: np.ndarray,
+    width: int,
+    height: int,
+    tile_size: int = 64,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Render one view on a black background.
+
+    ``extrinsics`` is the 4x4 world-to-camera transform and ``intrinsics`` the
+    camera matrix in pixels, as in sharp's ``CameraInfo``. Returns color
+    (H, W, 3), expected depth (H, W) and alpha (H, W), all float32.
+    """
+    splats = _project(scene, extrinsics, intrinsics, width, height)
+    tiles_x = math.ceil(width / tile_size)
+    tiles_y = math.ceil(height / tile_size)
+    members, bounds = _bin(splats, tiles_x, tiles_y, tile_size)
+
+    # Color and depth, weighted by each splat's contribution, plus alpha.
+    image = np.zeros((height * width, 5), dtype=np.float32)
+    # One row per channel: gathering from contiguous rows is much cheaper.
+    features = np.concatenate(
+        [splats.colors.T, splats.depth[None], np.ones((1, len(splats.depth)), np.float32)]
+    )
+    # Below this Mahalanobis power a splat's alpha is under the threshold.
+    min_power = np.log(_MIN_ALPHA / np.maximum(splats.opacities, _MIN_ALPHA))
+    for tile in np.nonzero(np.diff(bounds))[0]:
+        ty, tx = divmod(int(tile), tiles_x)
+        left, top = tx * tile_size, ty * tile_size
+        right, bottom = min(left + tile_size, width), min(top + tile_size, height)
+        ids, x, y = _footprints(
+            splats, members[bounds[tile] : bounds[tile + 1]], left, top, right, bottom
+        )
+        dx = x + np.float32(0.5) - splats.u[ids]
+        dy = y + np.float32(0.5) - splats.v[ids]
+        power = splats.conic_a[ids] * dx * dx
+        power += splats.conic_c[ids] * dy * dy
+        power *= -0.5
+        power -= splats.conic_b[ids] * dx * dy
+        # Pixels a splat barely reaches neither take color nor block light.
+        (hit,) = np.nonzero(power >= min_power[ids])
+        if not len(hit):
+            continue
+
+        # Group by pixel; the sort is stable, so each pixel's splats stay
+        # nearest first. Transmittance in front of a splat is the product of
+        # (1 - alpha) before it within its pixel, via a segmented log-sum.
+        local = (y[hit] - top) * (right - left) + (x[hit] - left)
+        # Stable sorts of 16-bit keys are radix sorts.
+        order = np.argsort(local.astype(np.int16), kind="stable")
+        hit = hit[order]
+        pixel, ids = y[hit] * width + x[hit], ids[hit]
+        alpha = np.minimum(_MAX_ALPHA, splats.opacities[ids] * np.exp(power[hit]))
+        log_remaining = np.log1p(-alpha.astype(np.float64))
+        before = np.cumsum(log_remaining)
+        before -= log_remaining
+        starts = np.flatnonzero(np.diff(pixel, prepend=-1))
+        before -= np.repeat(before[starts], np.diff(starts, append=len(pixel)))
+        transmittance = np.exp(before)
+        weights = (alpha * transmittance).astype(np.float32)
+        # A pixel stops compositing once it is nearly opaque.
+        weights[transmittance < _MIN_TRANSMITTANCE] = 0.0
+        image[pixel[starts]] = np.stack(
+            [np.add.reduceat(weights * channel[ids], starts) for channel in features], axis=1
+        )
+    image = image.reshape(height, width, 5)
+    color = np.ascontiguousarray(image[..., :3])
+    alpha = np.ascontiguousarray(image[..., 4])
+    # Expected depth: the alpha-weighted mean over the splats a pixel sees.
+    depth = np.divide(image[..., 3], alpha, out=np.zeros_like(alpha), where=alpha > 0)
+    return color, depth, alpha
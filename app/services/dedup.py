@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any
+
+from app.db.repo import Repository
+
+
+def content_hasher(model_id: str) -> "hashlib._Hash":
+    """Start a digest for an upload; feed it the upload bytes to get the cache key."""
+    digest = hashlib.sha256(model_id.encode())
+    digest.update(b"\0")
+    return digest
+
+
+class PredictCache:
+    """Content-addressed lookup of finished predictions plus in-flight coalescing.
+
+    Keys are ``sha256(model_id, upload bytes)``. A key is either cached in the
+    ``predict_cache`` table, in flight (one leader computing it, any number of
+    followers waiting on its future), or unknown.
+    """
+
+    def __init__(self, repo: Repository) -> None:
+        self._repo = repo
+        self._lock = threading.Lock()
+        self._inflight: dict[str, Future] = {}
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+
+    def lookup(self, key: str) -> Path | None:
+        record = self._repo.get_predict_cache(key)
+        if record is not None and not Path(record.gaussians_path).exists():
+            self._repo.delete_predict_cache(key)
+            record = None
+        with self._lock:
+            if record is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+        self._repo.touch_predict_cache(key)
+        return Path(record.gaussians_path)
+
+    def join(self, key: str) -> tuple[Future, bool]:
+        """Return the in-flight future for ``key`` and whether the caller leads it."""
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self._coalesced += 1
+                return future, False
+            future = Future()
+            self._inflight[key] = future
+            return future, True
+
+    def complete(
+        self, key: str, model_id: str, file_id: str, gaussians_path: Path
+    ) -> None:
+        self._repo.put_predict_cache(key, model_id, file_id, str(gaussians_path))
+        self.resolve(key, gaussians_path)
+
+    def resolve(self, key: str, gaussians_path: Path) -> None:
+        """Hand a finished prediction to the followers waiting in this process."""
+        with self._lock:
+            future = self._inflight.pop(key, None)
+        if future is not None:
+            future.set_result(gaussians_path)
+
+    def fail(self, key: str, exc: BaseException) -> None:
+        with self._lock:
+            future = self._inflight.pop(key, None)
+        if future is not None:
+            future.set_exception(exc)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "coalesced": self._coalesced,
+                "inflight": len(self._inflight),
+                "hit_ratio": self._hits / lookups if lookups else 0.0,
+            }
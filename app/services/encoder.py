@@ -0,0 +1,256 @@
+"""Video encoding off the render thread.
+
+Rendered frames go through a bounded queue to a background thread, which
+writes them with sharp's ``VideoWriter`` (``render.mp4`` and its depth video)
+and pipes the color frames to an ffmpeg process that cuts an HLS stream of
+fragmented-MP4 segments. ffmpeg rewrites the playlist after every segment, so
+playback can start while the rest of the trajectory is still rendering."""
+
+from __future__ import annotations
+
+import logging
+import queue
+import shutil
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import torch
+
+from app.core import metrics
+
+logger = logging.getLogger(__name__)
+
+# sharp's VideoWriter default.
+FPS = 30.0
+HLS_PLAYLIST = "playlist.m3u8"
+HLS_INIT = "init.mp4"
+# Frames waiting for the encoder before ``add_frame`` blocks the renderer.
+_QUEUE_FRAMES = 16
+_STOP = object()
+
+
+@dataclass(frozen=True)
+class HlsParams:
+    crf: int
+    preset: str
+    # Output height; None keeps the rendered size.
+    height: int | None
+    segment_seconds: float
+
+
+def ffmpeg_exe() -> str:
+    """The ffmpeg that imageio (and so sharp's ``VideoWriter``) uses, else the
+    one on ``PATH``."""
+    try:
+        import imageio_ffmpeg
+    except ImportError:
+        path = shutil.which("ffmpeg")
+        if path is None:
+            raise RuntimeError("ffmpeg not found")
+        return path
+    return imageio_ffmpeg.get_ffmpeg_exe()
+
+
+def hls_command(hls_dir: Path, width: int, height: int, params: HlsParams) -> list[str]:
+    """ffmpeg reading rgb24 frames of ``width`` x ``height`` on stdin and
+    writing an H.264 fMP4 HLS event playlist into ``hls_dir``."""
+    frames_per_segment = max(1, round(params.segment_seconds * FPS))
+    if params.height:
+        scale = f"scale=-2:{params.height}"
+    else:
+        # yuv420p needs even dimensions.
+        scale = "scale=trunc(iw/2)*2:trunc(ih/2)*2"
+    return [
+        ffmpeg_exe(),
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-y",
+        "-f",
+        "rawvideo",
+        "-pix_fmt",
+        "rgb24",
+        "-s",
+        f"{width}x{height}",
+        "-r",
+        f"{FPS:g}",
+        "-i",
+        "-",
+        "-vf",
+        scale,
+        "-c:v",
+        "libx264",
+        "-preset",
+        params.preset,
+        "-crf",
+        str(params.crf),
+        "-pix_fmt",
+        "yuv420p",
+        # A keyframe exactly every segment, so segments are cut at equal length.
+        "-g",
+        str(frames_per_segment),
+        "-keyint_min",
+        str(frames_per_segment),
+        "-sc_threshold",
+        "0",
+        "-f",
+        "hls",
+        "-hls_time",
+        f"{frames_per_segment / FPS:g}",
+        "-hls_list_size",
+        "0",
+        "-hls_playlist_type",
+        "event",
+        "-hls_segment_type",
+        "fmp4",
+        "-hls_fmp4_init_filename",
+        HLS_INIT,
+        # Segments are written under a temporary name and renamed when complete.
+        "-hls_flags",
+        "independent_segments+temp_file",
+        "-hls_segment_filename",
+        str(hls_dir / "seg_%05d.m4s"),
+        str(hls_dir / HLS_PLAYLIST),
+    ]
+
+
+class FrameEncoder:
+    """Encodes frames on a background thread while the caller renders more.
+
+    ``add_frame`` takes the (H, W, 3) uint8 color and (1, H, W) depth that
+    sharp's ``VideoWriter`` takes and only blocks while ``_QUEUE_FRAMES``
+    frames are waiting. Without ``hls_dir`` only the MP4s are written. An
+    error on the encoder thread is raised by the next ``add_frame`` or by
+    ``close``; ``abort`` stops without finishing the outputs and removes them.
+    """
+
+    def __init__(self, output_path: Path, hls_dir: Path | None, hls: HlsParams) -> None:
+        from sharp.utils import io
+
+        if hls_dir is not None:
+            # Segments of an earlier, failed attempt at this render.
+            shutil.rmtree(hls_dir, ignore_errors=True)
+            hls_dir.mkdir(parents=True)
+        self._writer = io.VideoWriter(output_path)
+        self._writer_closed = False
+        self._output_path = output_path
+        self._hls_dir = hls_dir
+        self._hls = hls
+        self._process: subprocess.Popen | None = None
+        self._queue: queue.Queue = queue.Queue(maxsize=_QUEUE_FRAMES)
+        self._error: BaseException | None = None
+        self._aborted = False
+        self._started = time.perf_counter()
+        self._first_segment = hls_dir is None
+        self._thread = threading.Thread(target=self._run, name="render-encode", daemon=True)
+        self._thread.start()
+
+    def add_frame(self, color: torch.Tensor, depth: torch.Tensor) -> None:
+        self._raise_error()
+        self._queue.put((color, depth))
+
+    def close(self) -> None:
+        """Wait for queued frames to be encoded and the outputs finished."""
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._raise_error()
+
+    def abort(self) -> None:
+        """Stop encoding, kill ffmpeg and remove the partial outputs. Also
+        cleans up after a ``close`` that raised."""
+        self._aborted = True
+        process = self._process
+        if process is not None and process.poll() is None:
+            # Unblocks the encoder thread if it is waiting on ffmpeg's stdin.
+            process.kill()
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._close_writer()
+        # sharp's VideoWriter names the depth video after the color one.
+        for path in (self._output_path, self._output_path.with_suffix(".depth.mp4")):
+            path.unlink(missing_ok=True)
+        if self._hls_dir is not None:
+            shutil.rmtree(self._hls_dir, ignore_errors=True)
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            raise RuntimeError(f"Video encoding failed: {self._error}") from self._error
+
+    def _run(self) -> None:
+        busy = 0.0
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            # After an error or abort, keep draining so producers never block.
+            if self._error is not None or self._aborted:
+                continue
+            started = time.perf_counter()
+            try:
+                self._encode(*item)
+            except BrokenPipeError as exc:
+                if not self._aborted:
+                    self._error = self._ffmpeg_error() or exc
+            except Exception as exc:
+                self._error = exc
+            busy += time.perf_counter() - started
+        try:
+            if self._error is None and not self._aborted:
+                self._finish()
+        except Exception as exc:
+            self._error = exc
+        finally:
+            if self._process is not None and self._process.poll() is None:
+                self._process.kill()
+                self._process.wait()
+        metrics.STAGE_SECONDS.labels("render", "encode_frames").observe(busy)
+
+    def _encode(self, color: torch.Tensor, depth: torch.Tensor) -> None:
+        color = color.cpu()
+        if self._hls_dir is not None:
+            if self._process is None:
+                self._process = subprocess.Popen(
+                    hls_command(self._hls_dir, color.shape[1], color.shape[0], self._hls),
+                    stdin=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                )
+            self._process.stdin.write(color.contiguous().numpy().tobytes())
+            if not self._first_segment and (self._hls_dir / HLS_PLAYLIST).exists():
+                self._first_segment = True
+                metrics.STAGE_SECONDS.labels("render", "first_segment").observe(
+                    time.perf_counter() - self._started
+                )
+        self._writer.add_frame(color, depth)
+
+    def _close_writer(self) -> None:
+        if self._writer_closed:
+            return
+        self._writer_closed = True
+        try:
+            self._writer.close()
+        except Exception:
+            logger.warning("Closing the video writer failed", exc_info=True)
+
+    def _finish(self) -> None:
+        self._writer_closed = True
+        self._writer.close()
+        if self._process is None:
+            return
+        _, stderr = self._process.communicate()
+        if self._process.returncode != 0:
+            raise RuntimeError(
+                f"ffmpeg exited with {self._process.returncode}: {stderr.decode().strip()}"
+            )
+
+    def _ffmpeg_error(self) -> RuntimeError | None:
+        """ffmpeg's own message after its stdin closed on us."""
+        try:
+            self._process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            return None
+        stderr = self._process.stderr.read().decode().strip()
+        logger.warning("ffmpeg exited with %s: %s", self._process.returncode, stderr)
+        return RuntimeError(f"ffmpeg exited with {self._process.returncode}: {stderr}")
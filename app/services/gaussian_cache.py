@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+import numpy as np
+import torch
+
+from app.core import metrics
+from app.core.config import settings
+from app.services.cpu_render import CpuScene
+from app.storage import paths as storage_paths
+
+
+@dataclass(frozen=True)
+class LoadedScene:
+    """A parsed ``gaussians.ply``: sharp's ``Gaussians3D`` on the CPU, its
+    ``SceneMetaData`` and the median depth of the gaussians."""
+
+    gaussians: Any
+    metadata: Any
+    focus_depth: float
+
+
+@dataclass
+class _Entry:
+    mtime_ns: int
+    value: Any
+    nbytes: int
+
+
+@dataclass
+class _Tier:
+    name: str
+    budget_bytes: int
+    entries: OrderedDict = field(default_factory=OrderedDict)
+    bytes: int = 0
+    hits: int = 0
+    misses: int = 0
+    evicted: int = 0
+    evicted_bytes: int = 0
+
+
+def _tensor_bytes(gaussians) -> int:
+    return sum(tensor.numel() * tensor.element_size() for tensor in gaussians)
+
+
+def _array_bytes(scene: CpuScene) -> int:
+    return sum(value.nbytes for value in vars(scene).values() if isinstance(value, np.ndarray))
+
+
+class GaussianCache:
+    """Gaussians of recently rendered files, so repeated renders of a file skip
+    parsing the PLY and copying it to the device.
+
+    Two LRU tiers, each within its own byte budget: ``host`` holds parsed
+    scenes, ``device`` holds them in the form a render backend takes (tensors
+    on a CUDA device, or :class:`CpuScene` for the CPU rasterizer). Entries are
+    keyed by file and checked against the PLY's mtime, so a rewritten or
+    deleted file is never served stale. Concurrent misses for the same entry
+    load it once. A zero budget disables the tier.
+    """
+
+    def __init__(self, host_budget_bytes: int, device_budget_bytes: int) -> None:
+        self._lock = threading.Lock()
+        self._tiers = {
+            "host": _Tier("host", max(0, host_budget_bytes)),
+            "device": _Tier("device", max(0, device_budget_bytes)),
+        }
+        self._loading: dict[tuple[str, Any, int], Future] = {}
+
+    def host(self, file_id: str) -> LoadedScene:
+        """Raises FileNotFoundError when the file has no gaussians."""
+        mtime_ns = self._mtime_ns(file_id)
+        return self._get("host", file_id, mtime_ns, lambda: self._load(file_id))
+
+    def device(self, file_id: str, device: str) -> Any:
+        """The file's gaussians for the render backend on ``device``:
+        ``Gaussians3D`` on a CUDA device, or a :class:`CpuScene` for ``cpu``."""
+        mtime_ns = self._mtime_ns(file_id)
+
+        def load() -> tuple[Any, int]:
+            scene = self.host(file_id)
+            if device == "cpu":
+                cpu_scene = CpuScene.from_gaussians(scene.gaussians)
+                return cpu_scene, _array_bytes(cpu_scene)
+            on_device = scene.gaussians.to(torch.device(device))
+            return on_device, _tensor_bytes(on_device)
+
+        return self._get("device", (file_id, device), mtime_ns, load)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            report = {}
+            for tier in self._tiers.values():
+                lookups = tier.hits + tier.misses
+                report[tier.name] = {
+                    "entries": len(tier.entries),
+                    "bytes": tier.bytes,
+                    "budget_bytes": tier.budget_bytes,
+                    "hits": tier.hits,
+                    "misses": tier.misses,
+                    "hit_ratio": tier.hits / lookups if lookups else 0.0,
+                    "evicted": tier.evicted,
+                    "evicted_bytes": tier.evicted_bytes,
+                }
+            return report
+
+    def _mtime_ns(self, file_id: str) -> int:
+        try:
+            return os.stat(storage_paths.gaussians_path(settings.data_dir, file_id)).st_mtime_ns
+        except FileNotFoundError:
+            # Deleted by retention or with its file: drop what is cached.
+            with self._lock:
+                for tier in self._tiers.values():
+                    for key in [key for key in tier.entries if _file_of(key) == file_id]:
+                        self._remove(tier, key)
+            raise
+
+    @staticmethod
+    def _load(file_id: str) -> tuple[LoadedScene, int]:
+        from sharp.utils.gaussians import load_ply
+
+        path = storage_paths.gaussians_path(settings.data_dir, file_id)
+        with metrics.STAGE_SECONDS.labels("render", "load_ply").time():
+            gaussians, metadata = load_ply(path)
+        focus_depth = float(gaussians.mean_vectors[0, :, 2].median())
+        return LoadedScene(gaussians, metadata, focus_depth), _tensor_bytes(gaussians)
+
+    def _get(
+        self, tier_name: str, key: Any, mtime_ns: int, load: Callable[[], tuple[Any, int]]
+    ) -> Any:
+        tier = self._tiers[tier_name]
+        with self._lock:
+            entry = tier.entries.get(key)
+            if entry is not None and entry.mtime_ns == mtime_ns:
+                tier.entries.move_to_end(key)
+                tier.hits += 1
+                metrics.GAUSSIAN_CACHE_LOOKUPS.labels(tier_name, "hit").inc()
+                return entry.value
+            if entry is not None:
+                self._remove(tier, key)
+            tier.misses += 1
+            metrics.GAUSSIAN_CACHE_LOOKUPS.labels(tier_name, "miss").inc()
+            loading = self._loading.get((tier_name, key, mtime_ns))
+            leader = loading is None
+            if leader:
+                loading = Future()
+                self._loading[(tier_name, key, mtime_ns)] = loading
+        if not leader:
+            return loading.result()
+        try:
+            value, nbytes = load()
+        except BaseException as exc:
+            with self._lock:
+                del self._loading[(tier_name, key, mtime_ns)]
+            loading.set_exception(exc)
+            raise
+        with self._lock:
+            del self._loading[(tier_name, key, mtime_ns)]
+            self._store(tier, key, _Entry(mtime_ns, value, nbytes))
+        loading.set_result(value)
+        return value
+
+    def _store(self, tier: _Tier, key: Any, entry: _Entry) -> None:
+        if entry.nbytes > tier.budget_bytes:
+            return
+        if key in tier.entries:
+            self._remove(tier, key)
+        tier.entries[key] = entry
+        tier.bytes += entry.nbytes
+        while tier.bytes > tier.budget_bytes:
+            _, evicted = tier.entries.popitem(last=False)
+            tier.bytes -= evicted.nbytes
+            tier.evicted += 1
+            tier.evicted_bytes += evicted.nbytes
+            metrics.GAUSSIAN_CACHE_EVICTED.labels(tier.name).inc()
+        metrics.GAUSSIAN_CACHE_BYTES.labels(tier.name).set(tier.bytes)
+
+    def _remove(self, tier: _Tier, key: Any) -> None:
+        entry = tier.entries.pop(key)
+        tier.bytes -= entry.nbytes
+        metrics.GAUSSIAN_CACHE_BYTES.labels(tier.name).set(tier.bytes)
+
+
+def _file_of(key: Any) -> str:
+    return key[0] if isinstance(key, tuple) else key
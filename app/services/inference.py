@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import contextlib
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any
+
+import torch
+
+from app.core.config import Settings
+
+logger = logging.getLogger(__name__)
+
+PRECISIONS = {"fp32": torch.float32, "bf16": torch.bfloat16, "fp16": torch.float16}
+
+
+@dataclass(frozen=True)
+class InferenceMode:
+    """How the predictor forward pass is executed on a deployment."""
+
+    precision: str = "fp32"
+    compile: bool = False
+    channels_last: bool = False
+
+    def __post_init__(self) -> None:
+        if self.precision not in PRECISIONS:
+            raise RuntimeError(
+                f"Unsupported inference precision: {self.precision} "
+                f"(expected one of {', '.join(PRECISIONS)})"
+            )
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> InferenceMode:
+        return cls(
+            precision=settings.inference_precision,
+            compile=settings.inference_compile,
+            channels_last=settings.inference_channels_last,
+        )
+
+    @classmethod
+    def from_name(cls, name: str) -> InferenceMode:
+        """Parse a mode name such as ``bf16+compile+channels_last``."""
+        precision, *flags = name.lower().split("+")
+        unknown = set(flags) - {"compile", "channels_last"}
+        if unknown:
+            raise RuntimeError(f"Unknown inference mode flags: {', '.join(sorted(unknown))}")
+        return cls(
+            precision=precision, compile="compile" in flags, channels_last="channels_last" in flags
+        )
+
+    @property
+    def name(self) -> str:
+        parts = [self.precision]
+        if self.compile:
+            parts.append("compile")
+        if self.channels_last:
+            parts.append("channels_last")
+        return "+".join(parts)
+
+    @property
+    def dtype(self) -> torch.dtype:
+        return PRECISIONS[self.precision]
+
+    def prepare(self, predictor: torch.nn.Module) -> torch.nn.Module:
+        """Apply memory format and compilation to a predictor already on its device."""
+        if self.channels_last:
+            predictor = predictor.to(memory_format=torch.channels_last)
+        if self.compile:
+            predictor = torch.compile(predictor, dynamic=False)
+        return predictor
+
+    def autocast(self, device: torch.device) -> contextlib.AbstractContextManager:
+        if self.precision == "fp32":
+            return contextlib.nullcontext()
+        return torch.autocast(device_type=device.type, dtype=self.dtype)
+
+    def forward(
+        self,
+        predictor: torch.nn.Module,
+        device: torch.device,
+        images: torch.Tensor,
+        disparity_factors: torch.Tensor,
+    ) -> Any:
+        if self.channels_last:
+            images = images.contiguous(memory_format=torch.channels_last)
+        with self.autocast(device):
+            outputs = predictor(images, disparity_factors)
+        return to_float32(outputs)
+
+
+FP32_EAGER = InferenceMode()
+
+
+def to_float32(outputs: Any) -> Any:
+    """Cast reduced-precision floating tensors in (nested) outputs back to fp32
+    so unprojection and PLY writing are unchanged across modes."""
+    if isinstance(outputs, torch.Tensor):
+        if outputs.is_floating_point() and outputs.dtype != torch.float32:
+            return outputs.float()
+        return outputs
+    if isinstance(outputs, tuple) and hasattr(outputs, "_fields"):
+        return type(outputs)(*(to_float32(value) for value in outputs))
+    if isinstance(outputs, (tuple, list)):
+        return type(outputs)(to_float32(value) for value in outputs)
+    return outputs
+
+
+def configure_torch(settings: Settings) -> None:
+    """Apply process-wide thread counts and the compile artifact cache.
+
+    Must run before the first parallel torch op: the inter-op pool size can
+    only be set once per process.
+    """
+    if settings.torch_num_threads > 0:
+        torch.set_num_threads(settings.torch_num_threads)
+    if settings.torch_interop_threads > 0:
+        try:
+            torch.set_num_interop_threads(settings.torch_interop_threads)
+        except RuntimeError as exc:
+            logger.warning("Could not set inter-op threads: %s", exc)
+    if settings.inference_compile:
+        # Inductor reuses compiled kernels across restarts from this directory.
+        os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", settings.compile_cache_dir)
+        os.environ.setdefault("TORCHINDUCTOR_FX_GRAPH_CACHE", "1")
+    logger.info(
+        "Torch threads: intra-op=%d inter-op=%d",
+        torch.get_num_threads(),
+        torch.get_num_interop_threads(),
+    )
@@ -0,0 +1,191 @@
+"""Gaussian pruning and level-of-detail tiers.
+
+Predict drops gaussians that are nearly transparent or project to less than
+a pixel, and writes the rest most important first: importance is opacity
+times the projected area of the splat's two largest axes. Any prefix of the
+vertex array is then a coarse version of the scene, so a tier is served as
+the first ``ceil(fraction * count)`` vertices of the stored PLY or splat
+file, without storing tiers separately. Sorted PLYs carry ``LOD_COMMENT`` in
+their header; older files only have the full tier.
+"""
+
+from __future__ import annotations
+
+import math
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Iterator
+
+import numpy as np
+
+from app.core.config import Settings
+from app.services.splat import SPLAT_DTYPE, SPLAT_HEADER
+
+LOD_COMMENT = "mlsharp lod importance-sorted"
+
+_CHUNK_BYTES = 1024 * 1024
+_MAX_HEADER_BYTES = 64 * 1024
+_PLY_SIZES = {
+    name: size
+    for size, names in (
+        (1, ("char", "uchar", "int8", "uint8")),
+        (2, ("short", "ushort", "int16", "uint16")),
+        (4, ("int", "uint", "int32", "uint32", "float", "float32")),
+        (8, ("double", "float64")),
+    )
+    for name in names
+}
+
+
+@dataclass(frozen=True)
+class PruneParams:
+    min_opacity: float
+    min_pixels: float
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> PruneParams:
+        return cls(settings.gaussians_min_opacity, settings.gaussians_min_pixels)
+
+    @property
+    def tag(self) -> str:
+        """Cache identity of the pruned output."""
+        return f"prune{self.min_opacity:g}/{self.min_pixels:g}"
+
+
+def importance_order(
+    depth: np.ndarray,
+    logit_opacity: np.ndarray,
+    log_scales: np.ndarray,
+    f_px: float,
+    params: PruneParams,
+) -> np.ndarray:
+    """Indices of the gaussians kept by ``params``, most important first.
+
+    Inputs are PLY columns: camera-space depth, opacity before the sigmoid and
+    (N, 3) log scales. Projected sizes are in pixels of the original image.
+    """
+    opacity = 1.0 / (1.0 + np.exp(-logit_opacity))
+    pixels_per_unit = f_px / np.maximum(depth, 1e-6)
+    log_axes = np.sort(log_scales, axis=1)
+    radius_px = np.exp(log_axes[:, 2]) * pixels_per_unit
+    area_px = np.exp(log_axes[:, 1] + log_axes[:, 2]) * pixels_per_unit**2
+    (kept,) = np.nonzero((opacity >= params.min_opacity) & (radius_px >= params.min_pixels))
+    importance = opacity[kept] * area_px[kept]
+    return kept[np.argsort(-importance, kind="stable")]
+
+
+def tier_counts(
+    total: int, fractions: tuple[float, ...], importance_sorted: bool = True
+) -> list[int]:
+    """Vertex count of each tier, coarsest first; the last is always ``total``."""
+    if not importance_sorted:
+        return [total]
+    counts = sorted({min(total, max(1, math.ceil(f * total))) for f in fractions if f > 0})
+    if not counts or counts[-1] != total:
+        counts.append(total)
+    return counts
+
+
+def select_tier(counts: list[int], lod: int | None) -> int:
+    """Vertex count for tier ``lod``; None or a tier past the last means all."""
+    if lod is None:
+        return counts[-1]
+    return counts[min(lod, len(counts) - 1)]
+
+
+@dataclass(frozen=True)
+class _PlyLayout:
+    header: bytes
+    vertex_count: int
+    vertex_stride: int
+    # (name, count, item size) of the elements after the vertices.
+    trailing: list[tuple[str, int, int]]
+    sorted: bool
+
+
+def _read_ply_layout(f: BinaryIO) -> _PlyLayout:
+    header = b""
+    while not header.endswith(b"end_header\n"):
+        line = f.readline()
+        if not line or len(header) > _MAX_HEADER_BYTES:
+            raise ValueError("PLY header not found")
+        header += line
+    lines = header.decode("ascii").splitlines()
+    if "format binary_little_endian 1.0" not in lines:
+        raise ValueError("Only binary little-endian PLY files have tiers")
+    elements: list[list] = []
+    for line in lines:
+        words = line.split()
+        if words[:1] == ["element"]:
+            elements.append([words[1], int(words[2]), 0])
+        elif words[:1] == ["property"]:
+            if words[1] == "list":
+                raise ValueError("PLY list properties are not supported")
+            elements[-1][2] += _PLY_SIZES[words[1]]
+    if not elements or elements[0][0] != "vertex":
+        raise ValueError("PLY has no leading vertex element")
+    return _PlyLayout(
+        header=header,
+        vertex_count=elements[0][1],
+        vertex_stride=elements[0][2],
+        trailing=[tuple(element) for element in elements[1:]],
+        sorted=f"comment {LOD_COMMENT}" in lines,
+    )
+
+
+def ply_vertex_count(path: Path) -> tuple[int, bool]:
+    """Vertex count of a stored PLY and whether it is importance-sorted."""
+    with open(path, "rb") as f:
+        layout = _read_ply_layout(f)
+    return layout.vertex_count, layout.sorted
+
+
+def _copy(f: BinaryIO, size: int) -> Iterator[bytes]:
+    while size > 0:
+        chunk = f.read(min(_CHUNK_BYTES, size))
+        if not chunk:
+            raise ValueError("Truncated file")
+        size -= len(chunk)
+        yield chunk
+
+
+def iter_ply_tier(path: Path, count: int) -> Iterator[bytes]:
+    """The stored PLY cut to its first ``count`` vertices.
+
+    The vertex count in the header and the gaussian count in sharp's
+    ``frame`` metadata element are rewritten; everything else is copied.
+    """
+    with open(path, "rb") as f:
+        layout = _read_ply_layout(f)
+        count = min(count, layout.vertex_count)
+        yield layout.header.replace(
+            f"element vertex {layout.vertex_count}\n".encode(),
+            f"element vertex {count}\n".encode(),
+            1,
+        )
+        yield from _copy(f, count * layout.vertex_stride)
+        f.seek((layout.vertex_count - count) * layout.vertex_stride, 1)
+        trailing = bytearray(f.read())
+        offset = 0
+        for name, items, item_size in layout.trailing:
+            if name == "frame" and items == 2 and item_size == 4:
+                struct.pack_into("<i", trailing, offset + 4, count)
+            offset += items * item_size
+        yield bytes(trailing)
+
+
+def splat_vertex_count(path: Path) -> int:
+    with open(path, "rb") as f:
+        return SPLAT_HEADER.unpack(f.read(SPLAT_HEADER.size))[2]
+
+
+def iter_splat_tier(path: Path, count: int) -> Iterator[bytes]:
+    """The stored splat file cut to its first ``count`` splats."""
+    with open(path, "rb") as f:
+        magic, version, total, scale_min, scale_max = SPLAT_HEADER.unpack(
+            f.read(SPLAT_HEADER.size)
+        )
+        count = min(count, total)
+        yield SPLAT_HEADER.pack(magic, version, count, scale_min, scale_max)
+        yield from _copy(f, count * SPLAT_DTYPE.itemsize)
@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from app.core import metrics
+
+# How often a put blocked on a full queue checks whether the pipeline stopped.
+_STOP_POLL_SECONDS = 0.1
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    fn: Callable[[Any], None]
+    workers: int
+
+
+@dataclass
+class _Item:
+    value: Any
+    future: Future = field(default_factory=Future)
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class _StageState:
+    stage: Stage
+    queue: queue.Queue
+    label: str
+    busy: int = 0
+    items: int = 0
+    failed: int = 0
+    busy_seconds: float = 0.0
+    active_seconds: float = 0.0
+    changed_at: float = field(default_factory=time.monotonic)
+
+
+class StagedPipeline:
+    """Runs items through a fixed sequence of stages, each on its own threads.
+
+    Stages are connected by queues of ``queue_size`` items. A stage that falls
+    behind blocks the one before it instead of letting work (and the memory
+    it holds) pile up, and :meth:`submit` blocks while the first queue is full.
+    An item that fails in one stage skips the rest; its future carries the
+    exception. Each stage reports how much of the time it had an item in
+    progress, which shows whether the stages around it keep it fed.
+    :meth:`shutdown` fails the items still queued and waits only for those
+    in progress.
+    """
+
+    def __init__(self, name: str, stages: list[Stage], queue_size: int) -> None:
+        self._name = name
+        self._states = [
+            _StageState(
+                stage=Stage(stage.name, stage.fn, max(1, stage.workers)),
+                queue=queue.Queue(maxsize=max(1, queue_size)),
+                label=f"{name}_{stage.name}",
+            )
+            for stage in stages
+        ]
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._started_at: float | None = None
+
+    def submit(self, value: Any) -> Future:
+        """Queue ``value`` for the first stage; the future resolves to it once
+        the last stage is done with it."""
+        if self._stopping.is_set():
+            raise RuntimeError(f"{self._name} pipeline stopped")
+        self._ensure_started()
+        item = _Item(value)
+        self._put(0, item)
+        return item.future
+
+    def stats(self) -> dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            uptime = now - self._started_at if self._started_at is not None else 0.0
+            stages = {}
+            for state in self._states:
+                self._account(state, now)
+                workers = state.stage.workers
+                stages[state.stage.name] = {
+                    "workers": workers,
+                    "queued": state.queue.qsize(),
+                    "busy": state.busy,
+                    "items": state.items,
+                    "failed": state.failed,
+                    "utilization": state.active_seconds / uptime if uptime > 0 else 0.0,
+                    "worker_utilization": state.busy_seconds / (uptime * workers)
+                    if uptime > 0
+                    else 0.0,
+                }
+        return {"uptime_s": uptime, "queue_size": self._states[0].queue.maxsize, "stages": stages}
+
+    def shutdown(self) -> None:
+        self._stopping.set()
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for state in self._states:
+            for _ in range(state.stage.workers):
+                # The queue may be smaller than the stage; its workers take
+                # the markers as they come, after failing the queued items.
+                while True:
+                    self._drain(state)
+                    try:
+                        state.queue.put(None, timeout=_STOP_POLL_SECONDS)
+                        break
+                    except queue.Full:
+                        continue
+        for thread in threads:
+            thread.join(timeout=5.0)
+        # Items handed on by stages that were finishing never run.
+        for state in self._states:
+            self._drain(state)
+
+    def _drain(self, state: _StageState) -> None:
+        """Fail the items in ``state``'s queue, keeping its stop markers."""
+        markers = 0
+        while True:
+            try:
+                item = state.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                markers += 1
+                continue
+            metrics.QUEUE_DEPTH.labels(state.label).dec()
+            self._stopped(item)
+        for _ in range(markers):
+            state.queue.put(None)
+
+    def _stopped(self, item: _Item) -> None:
+        item.future.set_exception(RuntimeError(f"{self._name} pipeline stopped"))
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            self._started_at = time.monotonic()
+            for index, state in enumerate(self._states):
+                state.changed_at = self._started_at
+                for worker in range(state.stage.workers):
+                    thread = threading.Thread(
+                        target=self._work,
+                        args=(index,),
+                        name=f"{state.label}-{worker}",
+                        daemon=True,
+                    )
+                    self._threads.append(thread)
+                    thread.start()
+
+    def _put(self, index: int, item: _Item) -> None:
+        state = self._states[index]
+        item.enqueued_at = time.monotonic()
+        metrics.QUEUE_DEPTH.labels(state.label).inc()
+        while True:
+            try:
+                state.queue.put(item, timeout=_STOP_POLL_SECONDS)
+                return
+            except queue.Full:
+                if self._stopping.is_set():
+                    metrics.QUEUE_DEPTH.labels(state.label).dec()
+                    self._stopped(item)
+                    return
+
+    def _work(self, index: int) -> None:
+        state = self._states[index]
+        last = index == len(self._states) - 1
+        while True:
+            item = state.queue.get()
+            if item is None:
+                return
+            metrics.QUEUE_DEPTH.labels(state.label).dec()
+            if self._stopping.is_set():
+                self._stopped(item)
+                continue
+            metrics.QUEUE_WAIT_SECONDS.labels(state.label).observe(
+                time.monotonic() - item.enqueued_at
+            )
+            self._mark(state, 1)
+            try:
+                state.stage.fn(item.value)
+            except BaseException as exc:
+                self._mark(state, -1, failed=True)
+                item.future.set_exception(exc)
+                continue
+            self._mark(state, -1)
+            if last:
+                item.future.set_result(item.value)
+            else:
+                # Blocks while the next stage is saturated.
+                self._put(index + 1, item)
+
+    def _mark(self, state: _StageState, delta: int, failed: bool = False) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._account(state, now)
+            state.busy += delta
+            if delta < 0:
+                state.items += 1
+                state.failed += failed
+
+    def _account(self, state: _StageState, now: float) -> None:
+        elapsed = now - state.changed_at
+        state.changed_at = now
+        if state.busy:
+            state.busy_seconds += elapsed * state.busy
+            state.active_seconds += elapsed
+            metrics.PIPELINE_BUSY_SECONDS.labels(self._name, state.stage.name).inc(elapsed)
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import torch
+from sharp.utils import color_space as cs_utils
+from sharp.utils.gaussians import (
+    convert_rgb_to_spherical_harmonics,
+    convert_spherical_harmonics_to_rgb,
+)
+
+from app.services.lod import LOD_COMMENT, PruneParams, importance_order
+
+VERTEX_DTYPE = np.dtype(
+    [
+        ("x", "<f4"),
+        ("y", "<f4"),
+        ("z", "<f4"),
+        ("f_dc_0", "<f4"),
+        ("f_dc_1", "<f4"),
+        ("f_dc_2", "<f4"),
+        ("opacity", "<f4"),
+        ("scale_0", "<f4"),
+        ("scale_1", "<f4"),
+        ("scale_2", "<f4"),
+        ("rot_0", "<f4"),
+        ("rot_1", "<f4"),
+        ("rot_2", "<f4"),
+        ("rot_3", "<f4"),
+        ("red", "u1"),
+        ("green", "u1"),
+        ("blue", "u1"),
+    ]
+)
+
+_PLY_TYPE_NAMES = {"f4": "float", "u4": "uint", "i4": "int", "u1": "uchar"}
+
+
+def _inverse_sigmoid(tensor: torch.Tensor) -> torch.Tensor:
+    return torch.log(tensor / (1.0 - tensor))
+
+
+def _header(
+    vertex_count: int, metadata: list[tuple[str, np.ndarray]], comments: tuple[str, ...] = ()
+) -> bytes:
+    lines = ["ply", "format binary_little_endian 1.0"]
+    lines += [f"comment {comment}" for comment in comments]
+    lines.append(f"element vertex {vertex_count}")
+    for name in VERTEX_DTYPE.names:
+        type_name = _PLY_TYPE_NAMES[VERTEX_DTYPE[name].str.lstrip("<|")]
+        lines.append(f"property {type_name} {name}")
+    for name, values in metadata:
+        lines.append(f"element {name} {len(values)}")
+        lines.append(f"property {_PLY_TYPE_NAMES[values.dtype.str.lstrip('<|')]} {name}")
+    lines.append("end_header")
+    return ("\n".join(lines) + "\n").encode("ascii")
+
+
+def _metadata(
+    gaussians, f_px: float, image_shape: tuple[int, int], vertex_count: int
+) -> list[tuple[str, np.ndarray]]:
+    image_height, image_width = image_shape
+    disparity = 1.0 / gaussians.mean_vectors[0, ..., -1]
+    quantiles = torch.quantile(
+        disparity, q=torch.tensor([0.1, 0.9], device=disparity.device)
+    ).float()
+    return [
+        ("extrinsic", np.eye(4, dtype="<f4").flatten()),
+        (
+            "intrinsic",
+            np.array(
+                [f_px, 0, image_width * 0.5, 0, f_px, image_height * 0.5, 0, 0, 1], dtype="<f4"
+            ),
+        ),
+        ("image_size", np.array([image_width, image_height], dtype="<u4")),
+        ("frame", np.array([1, vertex_count], dtype="<i4")),
+        ("disparity", quantiles.cpu().numpy().astype("<f4")),
+        ("color_space", np.array([cs_utils.encode_color_space("sRGB")], dtype="u1")),
+        ("version", np.array([1, 5, 0], dtype="u1")),
+    ]
+
+
+@torch.no_grad()
+def write_gaussians_ply(
+    gaussians,
+    f_px: float,
+    image_shape: tuple[int, int],
+    path: Path,
+    prune: PruneParams | None = None,
+) -> None:
+    """Write gaussians as a binary PLY with precomputed RGB in a single pass.
+
+    Produces the same file as sharp's ``save_ply`` followed by
+    ``ensure_ply_has_rgb``: the vertex element carries the 3DGS attributes plus
+    uchar red/green/blue, followed by sharp's metadata elements. The whole file
+    is assembled in one preallocated buffer, with the vertex array filled in
+    place, and written with one call.
+
+    With ``prune``, gaussians below its thresholds are dropped and the rest are
+    written most important first, so that prefixes form the LOD tiers.
+    """
+    xyz = gaussians.mean_vectors.flatten(0, 1)
+    attributes = torch.cat(
+        (
+            xyz,
+            convert_rgb_to_spherical_harmonics(
+                cs_utils.linearRGB2sRGB(gaussians.colors.flatten(0, 1))
+            ),
+            _inverse_sigmoid(gaussians.opacities).flatten(0, 1).unsqueeze(-1),
+            torch.log(gaussians.singular_values).flatten(0, 1),
+            gaussians.quaternions.flatten(0, 1),
+        ),
+        dim=1,
+    )
+    attributes_np = attributes.float().cpu().numpy()
+    comments: tuple[str, ...] = ()
+    if prune is not None:
+        order = importance_order(
+            attributes_np[:, 2], attributes_np[:, 6], attributes_np[:, 7:10], f_px, prune
+        )
+        attributes_np = attributes_np[order]
+        comments = (LOD_COMMENT,)
+    vertex_count = attributes_np.shape[0]
+
+    metadata = _metadata(gaussians, f_px, image_shape, vertex_count)
+    header = _header(vertex_count, metadata, comments)
+    buffer = bytearray(
+        len(header)
+        + vertex_count * VERTEX_DTYPE.itemsize
+        + sum(values.nbytes for _, values in metadata)
+    )
+    buffer[: len(header)] = header
+    vertices = np.ndarray(vertex_count, dtype=VERTEX_DTYPE, buffer=buffer, offset=len(header))
+    for index, name in enumerate(VERTEX_DTYPE.names[:14]):
+        vertices[name] = attributes_np[:, index]
+
+    sh0 = torch.from_numpy(attributes_np[:, 3:6])
+    colors = convert_spherical_harmonics_to_rgb(sh0).clamp(0, 1).numpy()
+    colors_uint8 = (colors * 255.0).round().astype(np.uint8)
+    vertices["red"] = colors_uint8[:, 0]
+    vertices["green"] = colors_uint8[:, 1]
+    vertices["blue"] = colors_uint8[:, 2]
+
+    offset = len(header) + vertices.nbytes
+    for _, values in metadata:
+        buffer[offset : offset + values.nbytes] = values.tobytes()
+        offset += values.nbytes
+
+    with open(path, "wb") as f:
+        f.write(buffer)
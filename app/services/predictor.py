@@ -1,19 +1,38 @@
 from __future__ import annotations
 
+import contextlib
+import functools
+import hashlib
+import itertools
+import logging
 import threading
-from dataclasses import dataclass
+import time
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Iterator
 
 import numpy as np
 import torch
-import torch.nn.functional as F
 from plyfile import PlyData, PlyElement
 from sharp.utils.gaussians import convert_spherical_harmonics_to_rgb
 
+from app.core import metrics
 from app.core.config import settings
 from app.db.repo import Repository
+from app.services.batching import PredictBatcher
+from app.services.inference import FP32_EAGER, InferenceMode
+from app.services.lod import PruneParams
+from app.services.pipeline import Stage, StagedPipeline
+from app.services import preprocess, profiling
+from app.services.ply import write_gaussians_ply
 from app.storage import files as storage_files
 from app.storage import paths as storage_paths
+from app.tasks.events import NULL_PROGRESS, TaskProgress
+
+if TYPE_CHECKING:
+    from app.services.cpu_pool import CpuInferencePool
+
+logger = logging.getLogger(__name__)
 
 
 @dataclass(frozen=True)
@@ -22,27 +41,178 @@ class PredictResult:
 
 
 class PredictorManager:
-    def __init__(self, model_path: str) -> None:
+    def __init__(
+        self,
+        model_path: str,
+        mmap: bool = True,
+        mode: InferenceMode = FP32_EAGER,
+        model_id: str = "",
+    ) -> None:
         self._model_path = Path(model_path)
+        self._mmap = mmap
+        self._mode = mode
         self._cache: dict[str, torch.nn.Module] = {}
         self._lock = threading.Lock()
+        self._device_locks: dict[str, threading.Lock] = {}
+        self._model_id: str | None = model_id or None
+        self._model_id_lock = threading.Lock()
+
+    @property
+    def model_id(self) -> str:
+        """Identity of the weights: ``model_id`` when given, else a hash of
+        the whole file. Checkpoints of one architecture can share their size
+        and header, so hashing only part of the file could mix up models."""
+        if self._model_id is None:
+            with self._model_id_lock:
+                if self._model_id is None:
+                    self._model_id = self._hash_weights()
+        return self._model_id
+
+    def _hash_weights(self) -> str:
+        if not self._model_path.exists():
+            raise FileNotFoundError(f"Model not found at {self._model_path}")
+        started = time.perf_counter()
+        digest = hashlib.sha256()
+        with open(self._model_path, "rb") as f:
+            while chunk := f.read(8 * 1024 * 1024):
+                digest.update(chunk)
+        logger.info(
+            "Hashed %s in %.0f ms", self._model_path, (time.perf_counter() - started) * 1000.0
+        )
+        return digest.hexdigest()[:16]
+
+    @property
+    def mode(self) -> InferenceMode:
+        return self._mode
+
+    def is_loaded(self, device: torch.device) -> bool:
+        return str(device) in self._cache
+
+    def loaded_devices(self) -> list[str]:
+        return list(self._cache)
 
     def get_predictor(self, device: torch.device) -> torch.nn.Module:
         key = str(device)
+        predictor = self._cache.get(key)
+        if predictor is not None:
+            return predictor
+        # Loading holds only this device's lock, so a slow load on one device
+        # does not stall callers that already have a resident model elsewhere.
+        with self._device_lock(key):
+            predictor = self._cache.get(key)
+            if predictor is None:
+                predictor, timings = self._load(device)
+                self._cache[key] = predictor
+                logger.info("Loaded predictor on %s: %s", key, _format_timings(timings))
+            return predictor
+
+    def preload(self, device: torch.device, warmup: bool = False) -> dict[str, float]:
+        """Make the predictor resident on ``device``, optionally running one
+        forward pass at the internal resolution. Returns phase timings in ms."""
+        key = str(device)
+        timings: dict[str, float] = {}
+        with self._device_lock(key):
+            if key not in self._cache:
+                predictor, timings = self._load(device)
+                self._cache[key] = predictor
+        if warmup:
+            timings["warmup_ms"] = self.warmup(device)
+        return timings
+
+    @torch.no_grad()
+    def forward(
+        self, device: torch.device, images: torch.Tensor, disparity_factors: torch.Tensor
+    ):
+        return self._mode.forward(self.get_predictor(device), device, images, disparity_factors)
+
+    def warmup(self, device: torch.device) -> float:
+        image = torch.zeros(1, 3, INTERNAL_SHAPE[1], INTERNAL_SHAPE[0], device=device)
+        disparity_factor = torch.ones(1, device=device)
+        started = time.perf_counter()
+        self.forward(device, image, disparity_factor)
+        _synchronize(device)
+        return (time.perf_counter() - started) * 1000.0
+
+    def _device_lock(self, key: str) -> threading.Lock:
         with self._lock:
-            if key in self._cache:
-                return self._cache[key]
-            if not self._model_path.exists():
-                raise FileNotFoundError(f"Model not found at {self._model_path}")
-            from sharp.models import PredictorParams, create_predictor
-
-            state_dict = torch.load(self._model_path, map_location="cpu", weights_only=True)
-            predictor = create_predictor(PredictorParams())
-            predictor.load_state_dict(state_dict)
-            predictor.eval()
-            predictor.to(device)
-            self._cache[key] = predictor
+            return self._device_locks.setdefault(key, threading.Lock())
+
+    def _load(self, device: torch.device) -> tuple[torch.nn.Module, dict[str, float]]:
+        if not self._model_path.exists():
+            raise FileNotFoundError(f"Model not found at {self._model_path}")
+        from sharp.models import PredictorParams, create_predictor
+
+        timings: dict[str, float] = {}
+        started = time.perf_counter()
+        state_dict = self._load_state_dict()
+        timings["load_weights_ms"] = (time.perf_counter() - started) * 1000.0
+
+        started = time.perf_counter()
+        predictor = _build_predictor(create_predictor, PredictorParams(), state_dict)
+        predictor.eval()
+        del state_dict
+        timings["build_ms"] = (time.perf_counter() - started) * 1000.0
+
+        started = time.perf_counter()
+        predictor = self._mode.prepare(predictor.to(device))
+        _synchronize(device)
+        timings["to_device_ms"] = (time.perf_counter() - started) * 1000.0
+        return predictor, timings
+
+    def _load_state_dict(self) -> dict[str, torch.Tensor]:
+        if self._mmap:
+            # Tensors stay backed by the page cache and are only paged in as
+            # load_state_dict copies them, instead of reading the whole file.
+            try:
+                return torch.load(
+                    self._model_path, map_location="cpu", weights_only=True, mmap=True
+                )
+            except RuntimeError as exc:
+                logger.warning("mmap load of %s failed, reading fully: %s", self._model_path, exc)
+        return torch.load(self._model_path, map_location="cpu", weights_only=True)
+
+
+def _build_predictor(
+    create_predictor, params, state_dict: dict[str, torch.Tensor]
+) -> torch.nn.Module:
+    """Construct the predictor without allocating and initializing weights that
+    the checkpoint overwrites anyway.
+
+    The module is built on the meta device and the checkpoint tensors are
+    assigned in place, so mmap-backed weights are not copied on the host. Falls
+    back to regular construction when anything is left on the meta device
+    (tensors absent from the checkpoint, such as non-persistent buffers).
+    """
+    try:
+        with torch.device("meta"):
+            predictor = create_predictor(params)
+        expected = predictor.state_dict()
+        predictor.load_state_dict(
+            {
+                name: tensor.to(expected[name].dtype) if name in expected else tensor
+                for name, tensor in state_dict.items()
+            },
+            assign=True,
+        )
+        tensors = itertools.chain(predictor.parameters(), predictor.buffers())
+        if not any(tensor.is_meta for tensor in tensors):
             return predictor
+    except Exception:
+        logger.debug("Meta-device construction failed, building normally", exc_info=True)
+    predictor = create_predictor(params)
+    predictor.load_state_dict(state_dict)
+    return predictor
+
+
+def _synchronize(device: torch.device) -> None:
+    if device.type == "cuda":
+        torch.cuda.synchronize(device)
+    elif device.type == "mps":
+        torch.mps.synchronize()
+
+
+def _format_timings(timings: dict[str, float]) -> str:
+    return " ".join(f"{name}={value:.0f}" for name, value in timings.items())
 
 
 def resolve_device(requested: str | None) -> torch.device:
@@ -66,28 +236,29 @@ def resolve_device(requested: str | None) -> torch.device:
     raise RuntimeError(f"Unsupported device: {device_value}")
 
 
+@dataclass(frozen=True)
+class PreparedImage:
+    image_resized: torch.Tensor
+    disparity_factor: torch.Tensor
+    intrinsics_resized: torch.Tensor
+
+
+INTERNAL_SHAPE = (1536, 1536)
+
+
 @torch.no_grad()
-def predict_image(
-    predictor: torch.nn.Module,
+def prepare_image(
     image: np.ndarray,
     f_px: float,
     device: torch.device,
-):
-    from sharp.utils.gaussians import unproject_gaussians
-
-    internal_shape = (1536, 1536)
-    image_pt = torch.from_numpy(image.copy()).float().to(device).permute(2, 0, 1) / 255.0
-    _, height, width = image_pt.shape
+    original_size: tuple[int, int] | None = None,
+) -> PreparedImage:
+    """``image`` may be a reduced decode of an ``original_size`` (height, width)
+    image; ``f_px`` and the intrinsics are in original pixels."""
+    internal_shape = INTERNAL_SHAPE
+    height, width = original_size or image.shape[:2]
     disparity_factor = torch.tensor([f_px / width]).float().to(device)
-
-    image_resized_pt = F.interpolate(
-        image_pt[None],
-        size=(internal_shape[1], internal_shape[0]),
-        mode="bilinear",
-        align_corners=True,
-    )
-
-    gaussians_ndc = predictor(image_resized_pt, disparity_factor)
+    image_resized_pt = preprocess.to_model_input(image, internal_shape, device)
 
     intrinsics = (
         torch.tensor(
@@ -104,15 +275,41 @@ def predict_image(
     intrinsics_resized = intrinsics.clone()
     intrinsics_resized[0] *= internal_shape[0] / width
     intrinsics_resized[1] *= internal_shape[1] / height
+    return PreparedImage(
+        image_resized=image_resized_pt,
+        disparity_factor=disparity_factor,
+        intrinsics_resized=intrinsics_resized,
+    )
 
-    gaussians = unproject_gaussians(
-        gaussians_ndc, torch.eye(4).to(device), intrinsics_resized, internal_shape
+
+@torch.no_grad()
+def unproject(gaussians_ndc, prepared: PreparedImage, device: torch.device):
+    from sharp.utils.gaussians import unproject_gaussians
+
+    return unproject_gaussians(
+        gaussians_ndc, torch.eye(4).to(device), prepared.intrinsics_resized, INTERNAL_SHAPE
+    )
+
+
+@torch.no_grad()
+def predict_image(
+    predictor: torch.nn.Module,
+    image: np.ndarray,
+    f_px: float,
+    device: torch.device,
+    mode: InferenceMode = FP32_EAGER,
+):
+    prepared = prepare_image(image, f_px, device)
+    gaussians_ndc = mode.forward(
+        predictor, device, prepared.image_resized, prepared.disparity_factor
     )
-    return gaussians
+    return unproject(gaussians_ndc, prepared, device)
 
 
 def ensure_ply_has_rgb(path: Path) -> None:
-    plydata = PlyData.read(path)
+    # Read without mmap: the file is rewritten in place below, which would
+    # clobber memory-mapped metadata elements before they are written back.
+    plydata = PlyData.read(path, mmap=False)
     vertices = next(filter(lambda x: x.name == "vertex", plydata.elements))
 
     if "red" in vertices and "green" in vertices and "blue" in vertices:
@@ -166,24 +363,185 @@ def ensure_ply_has_rgb(path: Path) -> None:
     PlyData([vertex_element] + other_elements).write(path)
 
 
+@dataclass
+class PredictJob:
+    """One image moving through the predict stages."""
+
+    input_path: Path
+    output_path: Path
+    device: torch.device
+    progress: TaskProgress = NULL_PROGRESS
+    timings: dict[str, float] = field(default_factory=dict)
+    f_px: float = 0.0
+    original_size: tuple[int, int] = (0, 0)
+    prepared: PreparedImage | None = None
+    gaussians: Any = None
+
+    @contextlib.contextmanager
+    def timed(self, stage: str) -> Iterator[None]:
+        started = time.perf_counter()
+        yield
+        self.timings[stage] = time.perf_counter() - started
+
+
+def decode_stage(job: PredictJob) -> None:
+    """Decode the upload and prepare the model input on the job's device."""
+    job.progress.stage("decode")
+    with job.timed("decode"):
+        decoded = preprocess.decode_image(job.input_path, INTERNAL_SHAPE)
+    job.f_px, job.original_size = decoded.f_px, (decoded.height, decoded.width)
+    with job.timed("resize"):
+        job.prepared = prepare_image(decoded.pixels, job.f_px, job.device, job.original_size)
+        _synchronize(job.device)
+
+
+def infer_stage(
+    job: PredictJob, forward: Callable[[torch.device, torch.Tensor, torch.Tensor], Any]
+) -> None:
+    prepared = job.prepared
+    job.progress.stage("forward")
+    with job.timed("forward"):
+        gaussians_ndc = forward(job.device, prepared.image_resized, prepared.disparity_factor)
+    job.progress.stage("unproject")
+    with job.timed("unproject"):
+        job.gaussians = unproject(gaussians_ndc, prepared, job.device)
+        _synchronize(job.device)
+    # The input is no longer needed; do not hold it while waiting to serialize.
+    job.prepared = None
+
+
+def serialize_stage(job: PredictJob) -> None:
+    job.progress.stage("write_ply")
+    with job.timed("write_ply"):
+        write_gaussians_ply(
+            job.gaussians,
+            job.f_px,
+            job.original_size,
+            job.output_path,
+            prune=PruneParams.from_settings(settings),
+        )
+    job.gaussians = None
+
+
+def predict_to_ply(
+    input_path: Path,
+    output_path: Path,
+    device: torch.device,
+    forward: Callable[[torch.device, torch.Tensor, torch.Tensor], Any],
+    progress: TaskProgress = NULL_PROGRESS,
+) -> dict[str, float]:
+    """Decode an image, run ``forward`` on it and write the gaussians PLY.
+
+    Returns the duration of each stage in seconds. Device work is synchronized
+    at stage boundaries so it is attributed to the stage that queued it.
+    """
+    job = PredictJob(input_path, output_path, device, progress)
+    decode_stage(job)
+    infer_stage(job, forward)
+    serialize_stage(job)
+    return job.timings
+
+
+def predict_job(
+    manager: PredictorManager,
+    input_path: str,
+    output_path: str,
+    profile_dir: str | None = None,
+    progress: TaskProgress = NULL_PROGRESS,
+) -> dict[str, float]:
+    """Entry point for CPU pool workers, which hold their own manager."""
+    with profiling.capture(Path(profile_dir)) if profile_dir else contextlib.nullcontext():
+        return predict_to_ply(
+            Path(input_path), Path(output_path), torch.device("cpu"), manager.forward, progress
+        )
+
+
 class PredictService:
-    def __init__(self, repo: Repository, manager: PredictorManager) -> None:
+    def __init__(
+        self,
+        repo: Repository,
+        manager: PredictorManager,
+        batcher: PredictBatcher,
+        pool: CpuInferencePool | None = None,
+        decode_workers: int = 2,
+        infer_workers: int = 0,
+        serialize_workers: int = 2,
+        queue_size: int = 4,
+    ) -> None:
         self._repo = repo
         self._manager = manager
+        self._batcher = batcher
+        self._pool = pool
+        # The next images are decoded and the previous PLYs written while the
+        # current batch runs. By default there is one infer worker per batch
+        # slot, so PredictBatcher can still fill a batch.
+        self._pipeline = StagedPipeline(
+            "predict",
+            [
+                Stage("decode", decode_stage, decode_workers),
+                Stage(
+                    "infer",
+                    functools.partial(infer_stage, forward=batcher.infer),
+                    infer_workers or batcher.max_batch_size,
+                ),
+                Stage("serialize", serialize_stage, serialize_workers),
+            ],
+            queue_size,
+        )
 
-    def run(self, file_id: str, input_path: Path, device_request: str | None) -> PredictResult:
+    @property
+    def model_id(self) -> str:
+        """Cache identity of the outputs: reduced precision and pruning change
+        the result, compilation and memory format do not."""
+        parts = [self._manager.model_id]
+        if self._manager.mode.precision != "fp32":
+            parts.append(self._manager.mode.precision)
+        parts.append(PruneParams.from_settings(settings).tag)
+        return "+".join(parts)
+
+    @property
+    def inference_mode(self) -> str:
+        return self._manager.mode.name
+
+    def run(
+        self,
+        file_id: str,
+        input_path: Path,
+        device_request: str | None,
+        progress: TaskProgress = NULL_PROGRESS,
+        profile_dir: Path | None = None,
+    ) -> PredictResult:
+        """Predict gaussians for an upload.
+
+        With ``profile_dir`` the task is profiled into that directory. It then
+        skips batching and runs on the calling thread, which should hold a
+        device slot, so the profilers see every stage.
+        """
         device = resolve_device(device_request)
-        predictor = self._manager.get_predictor(device)
-
-        from sharp.utils import io
-        from sharp.utils.gaussians import save_ply
-
-        image, _, f_px = io.load_rgb(input_path)
-        height, width = image.shape[:2]
-        gaussians = predict_image(predictor, image, f_px, device)
-
         output_path = storage_paths.gaussians_path(settings.data_dir, file_id)
         storage_files.ensure_file_dir(settings.data_dir, file_id)
-        save_ply(gaussians, f_px, (height, width), output_path)
-        ensure_ply_has_rgb(output_path)
+        if self._pool is not None and device.type == "cpu":
+            timings = self._pool.submit(
+                predict_job,
+                str(input_path),
+                str(output_path),
+                str(profile_dir) if profile_dir else None,
+                progress=progress,
+            ).result()
+        elif profile_dir is not None:
+            with profiling.capture(profile_dir):
+                timings = predict_to_ply(
+                    input_path, output_path, device, self._manager.forward, progress
+                )
+        else:
+            job = PredictJob(input_path, output_path, device, progress)
+            timings = self._pipeline.submit(job).result().timings
+        for stage, seconds in timings.items():
+            metrics.STAGE_SECONDS.labels("predict", stage).observe(seconds)
         return PredictResult(gaussians_path=output_path)
+
+    def pipeline_stats(self) -> dict[str, Any]:
+        return self._pipeline.stats()
+
+    def shutdown(self) -> None:
+        self._pipeline.shutdown()
@@ -0,0 +1,112 @@
+"""Image decoding and model-input preparation for predict.
+
+``decode_image`` reads an upload once: orientation and focal length come from
+the EXIF header PIL parses when opening the file, and JPEGs are decoded with
+draft mode (libjpeg DCT scaling) at the smallest scale that still covers the
+model input. Pixels stay uint8 until ``to_model_input`` moves them to the
+device, where they are converted, resized and normalized in one pass.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import warnings
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+_EXIF_IFD = 0x8769
+_ORIENTATION = 0x0112
+_FOCAL_LENGTH = 0x920A
+_FOCAL_LENGTH_35MM = 0xA405
+
+# Same conventions as ``sharp.utils.io.load_rgb``: the 35 mm-equivalent focal
+# length is converted over the image diagonal, 30 mm when EXIF has none.
+_FILM_DIAGONAL_MM = math.hypot(36.0, 24.0)
+_DEFAULT_FOCAL_35MM = 30.0
+_TRANSPOSES = {
+    3: Image.Transpose.ROTATE_180,
+    6: Image.Transpose.ROTATE_270,
+    8: Image.Transpose.ROTATE_90,
+}
+
+
+@dataclass(frozen=True)
+class DecodedImage:
+    """``pixels`` (HxWx3 uint8) may be a reduced decode; ``height``, ``width``
+    and ``f_px`` describe the full-resolution, upright image."""
+
+    pixels: np.ndarray
+    height: int
+    width: int
+    f_px: float
+
+
+def decode_image(path: Path, min_size: tuple[int, int]) -> DecodedImage:
+    """Decode ``path`` at no less than ``min_size`` (width, height) where the
+    format allows it."""
+    if path.suffix.lower() == ".heic":
+        from sharp.utils import io
+
+        pixels, _, f_px = io.load_rgb(path)
+        return DecodedImage(pixels, pixels.shape[0], pixels.shape[1], f_px)
+
+    with Image.open(path) as image:
+        exif = image.getexif()
+        orientation = exif.get(_ORIENTATION, 1)
+        transpose = _TRANSPOSES.get(orientation)
+        if transpose is None and orientation != 1:
+            logger.warning("Ignoring image orientation %s", orientation)
+        rotated = transpose in (Image.Transpose.ROTATE_90, Image.Transpose.ROTATE_270)
+        width, height = image.size[::-1] if rotated else image.size
+        f_px = _focal_px(exif, width, height)
+        # Draft sizes are in stored orientation; JPEG only, a no-op otherwise.
+        image.draft("RGB", min_size[::-1] if rotated else min_size)
+        decoded = image if image.mode == "RGB" else image.convert("RGB")
+        if transpose is not None:
+            decoded = decoded.transpose(transpose)
+        pixels = np.asarray(decoded)
+    return DecodedImage(pixels, height, width, f_px)
+
+
+def _focal_px(exif: Image.Exif, width: int, height: int) -> float:
+    tags = {**exif.get_ifd(_EXIF_IFD), **exif}
+    focal_mm = tags.get(_FOCAL_LENGTH_35MM)
+    if focal_mm is None or focal_mm < 1:
+        focal_mm = tags.get(_FOCAL_LENGTH)
+        if focal_mm is None:
+            focal_mm = _DEFAULT_FOCAL_35MM
+        elif focal_mm < 10.0:
+            # A physical focal length; crude conversion to 35 mm-equivalent.
+            focal_mm *= 8.4
+    return float(focal_mm) * math.hypot(width, height) / _FILM_DIAGONAL_MM
+
+
+@torch.no_grad()
+def to_model_input(
+    pixels: np.ndarray, size: tuple[int, int], device: torch.device
+) -> torch.Tensor:
+    """Resize uint8 HxWx3 ``pixels`` to a (1, 3, height, width) float tensor in
+    [0, 1] on ``device``; ``size`` is (width, height).
+
+    Only the uint8 pixels cross to the device, without a host copy; the float
+    conversion happens there at the decoded size, and normalization is
+    applied to the small resized output since bilinear resizing is linear.
+    """
+    with warnings.catch_warnings():
+        # PIL hands out read-only buffers; the tensor is only read from.
+        warnings.simplefilter("ignore", UserWarning)
+        image = torch.from_numpy(pixels)
+    # HWC memory viewed as NCHW is channels_last, which interpolate reads directly.
+    image = image.to(device, non_blocking=True).permute(2, 0, 1)[None]
+    resized = F.interpolate(
+        image.float(), size=(size[1], size[0]), mode="bilinear", align_corners=True
+    )
+    return resized.mul_(1.0 / 255.0).contiguous()
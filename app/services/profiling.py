@@ -0,0 +1,106 @@
+"""Opt-in profiling of a single task.
+
+``capture`` runs a block under ``torch.profiler`` (CPU activities) and a
+sampling profiler for the calling thread, then writes the artifacts listed in
+``ARTIFACTS`` into a directory. Both profilers only see the thread that enters
+``capture``, so callers run the whole task on that thread.
+"""
+
+from __future__ import annotations
+
+import logging
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+import torch
+from torch.profiler import ProfilerActivity
+
+logger = logging.getLogger(__name__)
+
+# name -> (file name, media type)
+ARTIFACTS = {
+    "trace": ("trace.json", "application/json"),
+    "stacks": ("stacks.txt", "text/plain"),
+    "ops": ("ops.txt", "text/plain"),
+}
+
+_SAMPLE_INTERVAL_SECONDS = 0.005
+
+# torch.profiler keeps process-wide state; profiled tasks take turns.
+_LOCK = threading.Lock()
+
+
+class StackSampler:
+    """Samples one thread's Python stack at a fixed interval and aggregates the
+    samples as collapsed stacks (``outer;inner count``), the input format of
+    flamegraph tools."""
+
+    def __init__(self, thread_id: int, interval: float = _SAMPLE_INTERVAL_SECONDS) -> None:
+        self._thread_id = thread_id
+        self._interval = interval
+        self._counts: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self._counts.most_common())
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})")
+                frame = frame.f_back
+            self._counts[";".join(reversed(names))] += 1
+
+
+def artifact_path(directory: Path, name: str) -> Path:
+    return directory / ARTIFACTS[name][0]
+
+
+@contextmanager
+def capture(directory: Path) -> Iterator[None]:
+    """Profile the block and write its artifacts to ``directory``.
+
+    Artifacts are written even when the block raises, so failed tasks can be
+    inspected too.
+    """
+    with _LOCK:
+        directory.mkdir(parents=True, exist_ok=True)
+        profiler = torch.profiler.profile(activities=[ProfilerActivity.CPU], record_shapes=True)
+        sampler = StackSampler(threading.get_ident())
+        profiler.start()
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            profiler.stop()
+            try:
+                _write_artifacts(directory, profiler, sampler)
+            except Exception:
+                logger.exception("Could not write profile to %s", directory)
+
+
+def _write_artifacts(
+    directory: Path, profiler: torch.profiler.profile, sampler: StackSampler
+) -> None:
+    profiler.export_chrome_trace(str(artifact_path(directory, "trace")))
+    artifact_path(directory, "stacks").write_text(sampler.collapsed())
+    table = profiler.key_averages().table(sort_by="self_cpu_time_total", row_limit=50)
+    artifact_path(directory, "ops").write_text(table + "\n")
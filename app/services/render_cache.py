@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import shutil
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any
+
+from app.core.config import settings
+from app.db.repo import Repository
+from app.db.schema import RenderRecord
+from app.services.renderer import RenderParams, RenderResult
+from app.storage import paths as storage_paths
+
+
+class RenderCache:
+    """Tracks rendered variants per file, coalesces identical in-flight renders
+    and evicts least-recently-used variants beyond a per-file byte budget."""
+
+    def __init__(self, repo: Repository, budget_bytes: int) -> None:
+        self._repo = repo
+        self._budget_bytes = budget_bytes
+        self._lock = threading.Lock()
+        self._inflight: dict[tuple[str, str], Future] = {}
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._evicted = 0
+        self._evicted_bytes = 0
+
+    def lookup(self, file_id: str, render_key: str) -> RenderRecord | None:
+        record = self._repo.get_render(file_id, render_key)
+        if record is not None and not (
+            Path(record.render_path).exists() and Path(record.render_depth_path).exists()
+        ):
+            self._repo.delete_render(file_id, render_key)
+            record = None
+        with self._lock:
+            if record is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+        self._repo.touch_render(file_id, render_key)
+        return record
+
+    def join(self, file_id: str, render_key: str) -> tuple[Future, bool]:
+        """Return the in-flight future for this render and whether the caller leads it."""
+        with self._lock:
+            future = self._inflight.get((file_id, render_key))
+            if future is not None:
+                self._coalesced += 1
+                return future, False
+            future = Future()
+            self._inflight[(file_id, render_key)] = future
+            return future, True
+
+    def complete(self, file_id: str, params: RenderParams, result: RenderResult) -> RenderRecord:
+        # The videos and, when streamed, the HLS segments.
+        size_bytes = sum(
+            path.stat().st_size for path in result.render_path.parent.rglob("*") if path.is_file()
+        )
+        record = self._repo.put_render(
+            file_id=file_id,
+            render_key=result.render_key,
+            params=params.to_json(),
+            render_path=str(result.render_path),
+            render_depth_path=str(result.render_depth_path),
+            size_bytes=size_bytes,
+        )
+        self.evict(file_id, keep=result.render_key)
+        self.resolve(record)
+        return record
+
+    def resolve(self, record: RenderRecord) -> None:
+        """Hand a finished render to the followers waiting in this process."""
+        with self._lock:
+            future = self._inflight.pop((record.file_id, record.render_key), None)
+        if future is not None:
+            future.set_result(record)
+
+    def fail(self, file_id: str, render_key: str, exc: BaseException) -> None:
+        with self._lock:
+            future = self._inflight.pop((file_id, render_key), None)
+        if future is not None:
+            future.set_exception(exc)
+
+    def evict(self, file_id: str, keep: str | None = None) -> int:
+        """Drop least-recently-used variants of ``file_id`` until it fits the budget."""
+        records = self._repo.list_renders(file_id)
+        total = sum(record.size_bytes for record in records)
+        freed = 0
+        for record in reversed(records):
+            if total <= self._budget_bytes:
+                break
+            if record.render_key == keep:
+                continue
+            self._repo.delete_render(file_id, record.render_key)
+            shutil.rmtree(
+                storage_paths.render_variant_dir(settings.data_dir, file_id, record.render_key),
+                ignore_errors=True,
+            )
+            total -= record.size_bytes
+            freed += record.size_bytes
+            with self._lock:
+                self._evicted += 1
+                self._evicted_bytes += record.size_bytes
+        return freed
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "coalesced": self._coalesced,
+                "inflight": len(self._inflight),
+                "hit_ratio": self._hits / lookups if lookups else 0.0,
+                "evicted": self._evicted,
+                "evicted_bytes": self._evicted_bytes,
+                "budget_bytes_per_file": self._budget_bytes,
+            }
@@ -1,12 +1,31 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, replace
 from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterator, NamedTuple
 
+import numpy as np
 import torch
 
+from app.core import metrics
 from app.core.config import settings
+from app.services.cpu_render import CpuScene, rasterize
+from app.services.encoder import FrameEncoder, HlsParams
+from app.services.gaussian_cache import GaussianCache, LoadedScene
 from app.storage import paths as storage_paths
+from app.tasks.events import NULL_PROGRESS, TaskProgress
+from app.tasks.scheduler import PRIORITY_INTERACTIVE
+
+if TYPE_CHECKING:
+    from app.tasks.runner import TaskRunner
 
 
 @dataclass(frozen=True)
@@ -18,48 +37,443 @@ class RenderParams:
     distance_m: float | None = None
     num_steps: int | None = None
     num_repeats: int | None = None
+    resolution_scale: float | None = None
+    hls_crf: int | None = None
+    hls_preset: str | None = None
+    hls_height: int | None = None
+    # The configured RENDER_BACKEND (``auto``, ``cuda`` or ``cpu``).
+    backend: str | None = None
+
+    def normalized(self) -> dict[str, str | float | int]:
+        """Explicitly set parameters with numbers coerced to a canonical type."""
+        values: dict[str, str | float | int] = {}
+        for name, value in asdict(self).items():
+            if value is None:
+                continue
+            if name in {"num_steps", "num_repeats", "hls_crf", "hls_height"}:
+                values[name] = int(value)
+            elif isinstance(value, (int, float)):
+                values[name] = float(value)
+            else:
+                values[name] = value
+        return values
+
+    def to_json(self) -> str:
+        return json.dumps(self.normalized(), sort_keys=True, separators=(",", ":"))
+
+    def key(self) -> str:
+        return hashlib.sha256(self.to_json().encode()).hexdigest()[:16]
 
 
 @dataclass(frozen=True)
 class RenderResult:
+    render_key: str
     render_path: Path
     render_depth_path: Path
 
 
-class RenderService:
-    def run(self, file_id: str, params: RenderParams) -> RenderResult:
+def resolve_render_backend(requested: str) -> str:
+    value = requested.lower()
+    if value == "auto":
+        return "cuda" if torch.cuda.is_available() else "cpu"
+    if value == "cuda":
         if not torch.cuda.is_available():
-            raise RuntimeError("Rendering requires CUDA")
-
-        from sharp.utils.gaussians import load_ply
-        from sharp.utils import camera
-        from sharp.cli.render import render_gaussians
-
-        gaussians, metadata = load_ply(storage_paths.gaussians_path(settings.data_dir, file_id))
-        trajectory = camera.TrajectoryParams()
-        if params.trajectory_type is not None:
-            trajectory.type = params.trajectory_type
-        if params.lookat_mode is not None:
-            trajectory.lookat_mode = params.lookat_mode
-        if params.max_disparity is not None:
-            trajectory.max_disparity = params.max_disparity
-        if params.max_zoom is not None:
-            trajectory.max_zoom = params.max_zoom
-        if params.distance_m is not None:
-            trajectory.distance_m = params.distance_m
-        if params.num_steps is not None:
-            trajectory.num_steps = params.num_steps
-        if params.num_repeats is not None:
-            trajectory.num_repeats = params.num_repeats
-
-        output_path = storage_paths.render_path(settings.data_dir, file_id)
-        render_gaussians(
-            gaussians=gaussians,
-            metadata=metadata,
-            output_path=output_path,
-            params=trajectory,
+            raise RuntimeError("CUDA is not available")
+        return "cuda"
+    if value == "cpu":
+        return "cpu"
+    raise RuntimeError(f"Unsupported render backend: {value}")
+
+
+def cpu_render_threads() -> int:
+    if settings.cpu_render_threads > 0:
+        return settings.cpu_render_threads
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+class RenderService:
+    def __init__(
+        self, gaussian_cache: GaussianCache | None = None, runner: TaskRunner | None = None
+    ) -> None:
+        # Without a cache every render parses the PLY again.
+        self._gaussians = gaussian_cache or GaussianCache(0, 0)
+        # Snapshots on a CUDA device take a slot of its scheduler; without a
+        # runner they run on the calling thread.
+        self._runner = runner
+        self._snapshot_slots = threading.BoundedSemaphore(max(1, settings.snapshot_concurrency))
+
+    @property
+    def backend(self) -> str:
+        return self.backend_for(RenderParams())
+
+    @property
+    def device(self) -> str:
+        return self.device_for(RenderParams())
+
+    @staticmethod
+    def backend_for(params: RenderParams) -> str:
+        """The backend this host renders ``params`` with."""
+        return resolve_render_backend(params.backend or settings.render_backend)
+
+    def device_for(self, params: RenderParams) -> str:
+        """Device whose slot a render of ``params`` holds while it runs."""
+        return "cuda" if self.backend_for(params) == "cuda" else "cpu"
+
+    @staticmethod
+    def normalize(params: RenderParams) -> RenderParams:
+        """``params`` as enqueued and cached, without looking at this host's
+        hardware: the API may run on a host that renders nothing. The
+        configured backend is part of the key; the worker that claims the
+        job resolves it and the default resolution."""
+        scale = params.resolution_scale
+        params = replace(
+            params,
+            backend=settings.render_backend.lower(),
+            resolution_scale=None if scale is None or scale >= 1 else scale,
+        )
+        if not settings.render_hls:
+            # Without the stream, its settings would only split the cache.
+            params = replace(params, hls_crf=None, hls_preset=None, hls_height=None)
+        return params
+
+    @staticmethod
+    def hls_params(params: RenderParams) -> HlsParams:
+        return HlsParams(
+            crf=settings.hls_crf if params.hls_crf is None else params.hls_crf,
+            preset=params.hls_preset or settings.hls_preset,
+            height=params.hls_height,
+            segment_seconds=settings.hls_segment_seconds,
+        )
+
+    @staticmethod
+    def render_scale(params: RenderParams, backend: str) -> float:
+        """Output resolution relative to the input: as requested, else
+        ``CPU_RENDER_SCALE`` on the CPU."""
+        scale = params.resolution_scale
+        if scale is None and backend == "cpu":
+            scale = settings.cpu_render_scale
+        return min(scale or 1.0, 1.0)
+
+    def run(
+        self, file_id: str, params: RenderParams, progress: TaskProgress = NULL_PROGRESS
+    ) -> RenderResult:
+        backend = self.backend_for(params)
+        device = "cuda" if backend == "cuda" else "cpu"
+        progress.stage("load")
+        scene = self._gaussians.host(file_id)
+        rendered = self._gaussians.device(file_id, device)
+        trajectory = build_trajectory(params)
+
+        render_key = params.key()
+        variant_dir = storage_paths.render_variant_dir(settings.data_dir, file_id, render_key)
+        storage_paths.ensure_dir(variant_dir)
+        output_path = storage_paths.render_variant_path(settings.data_dir, file_id, render_key)
+        scale = self.render_scale(params, backend)
+        encoder = FrameEncoder(
+            output_path,
+            storage_paths.render_variant_hls_dir(settings.data_dir, file_id, render_key)
+            if settings.render_hls
+            else None,
+            self.hls_params(params),
         )
+        try:
+            if device == "cuda":
+                self._render_video(scene, rendered, encoder, trajectory, scale, progress)
+            else:
+                self._render_video_cpu(scene, rendered, encoder, trajectory, scale, progress)
+        except BaseException:
+            encoder.abort()
+            raise
         return RenderResult(
+            render_key=render_key,
             render_path=output_path,
-            render_depth_path=storage_paths.render_depth_path(settings.data_dir, file_id),
+            render_depth_path=storage_paths.render_variant_depth_path(
+                settings.data_dir, file_id, render_key
+            ),
+        )
+
+    @torch.no_grad()
+    def snapshot(
+        self, file_id: str, yaw: float, pitch: float, width: int, height: int | None = None
+    ) -> np.ndarray:
+        """One uint8 (H, W, 3) view of the file, the input camera orbited by
+        ``yaw`` and ``pitch`` degrees about the scene's median depth. Without
+        ``height`` the input's aspect ratio is kept.
+
+        On CUDA the device work goes through the device scheduler ahead of
+        batch renders; ``SNAPSHOT_CONCURRENCY`` bounds the CPU-side work.
+        """
+        device = self.device
+        with self._snapshot_slots:
+            scene = self._gaussians.host(file_id)
+            input_width, input_height = scene.metadata.resolution_px
+            height = height or max(1, round(width * input_height / input_width))
+            camera_info = snapshot_camera(
+                scene.metadata, scene.focus_depth, yaw, pitch, width, height
+            )
+            if device == "cpu":
+                rendered = self._gaussians.device(file_id, device)
+                color, _ = _cpu_frame(
+                    rendered, camera_info, scene.metadata.color_space, settings.cpu_render_tile
+                )
+                return color.numpy()
+        if self._runner is None:
+            return self._snapshot_cuda(file_id, scene, camera_info)
+        return self._runner.scheduler(device).call(
+            self._snapshot_cuda, file_id, scene, camera_info, priority=PRIORITY_INTERACTIVE
+        )
+
+    @torch.no_grad()
+    def _snapshot_cuda(
+        self, file_id: str, scene: LoadedScene, camera_info: FrameCamera
+    ) -> np.ndarray:
+        from sharp.utils import gsplat
+
+        device = torch.device("cuda")
+        rendered = self._gaussians.device(file_id, "cuda")
+        renderer = gsplat.GSplatRenderer(color_space=scene.metadata.color_space)
+        output = renderer(
+            rendered,
+            extrinsics=camera_info.extrinsics[None].to(device),
+            intrinsics=camera_info.intrinsics[None].to(device),
+            image_width=camera_info.width,
+            image_height=camera_info.height,
         )
+        color = (output.color[0].permute(1, 2, 0) * 255.0).to(dtype=torch.uint8)
+        return color.cpu().numpy()
+
+    def cache_stats(self) -> dict[str, Any]:
+        return self._gaussians.stats()
+
+    @torch.no_grad()
+    def _render_video(
+        self,
+        scene: LoadedScene,
+        gaussians_device,
+        encoder: FrameEncoder,
+        trajectory,
+        scale: float,
+        progress,
+    ) -> None:
+        """Same as sharp's ``render_gaussians``, reporting progress per frame
+        and encoding on ``encoder``'s thread."""
+        from sharp.utils import gsplat
+
+        device = torch.device("cuda")
+        cameras = trajectory_cameras(scene.gaussians, scene.metadata, trajectory, scale, device)
+        renderer = gsplat.GSplatRenderer(color_space=scene.metadata.color_space)
+        total = len(cameras)
+        started = time.perf_counter()
+        for index, camera_info in enumerate(cameras):
+            progress.stage("render", current=index + 1, total=total)
+            rendering_output = renderer(
+                gaussians_device,
+                extrinsics=camera_info.extrinsics[None].to(device),
+                intrinsics=camera_info.intrinsics[None].to(device),
+                image_width=camera_info.width,
+                image_height=camera_info.height,
+            )
+            color = (rendering_output.color[0].permute(1, 2, 0) * 255.0).to(dtype=torch.uint8)
+            depth = rendering_output.depth[0]
+            encoder.add_frame(color, depth)
+        metrics.STAGE_SECONDS.labels("render", "render_frames").observe(
+            time.perf_counter() - started
+        )
+        progress.stage("encode")
+        with metrics.STAGE_SECONDS.labels("render", "encode").time():
+            encoder.close()
+
+    @torch.no_grad()
+    def _render_video_cpu(
+        self,
+        scene: LoadedScene,
+        cpu_scene: CpuScene,
+        encoder: FrameEncoder,
+        trajectory,
+        scale: float,
+        progress,
+    ) -> None:
+        """The CUDA path with :func:`iter_cpu_frames` in place of gsplat."""
+        cameras = trajectory_cameras(
+            scene.gaussians, scene.metadata, trajectory, scale, torch.device("cpu")
+        )
+        frames = iter_cpu_frames(
+            cpu_scene,
+            cameras,
+            scene.metadata.color_space,
+            threads=cpu_render_threads(),
+            tile_size=settings.cpu_render_tile,
+        )
+        total = len(cameras)
+        started = time.perf_counter()
+        for index, (color, depth) in enumerate(frames):
+            progress.stage("render", current=index + 1, total=total)
+            encoder.add_frame(color, depth)
+        metrics.STAGE_SECONDS.labels("render", "render_frames").observe(
+            time.perf_counter() - started
+        )
+        progress.stage("encode")
+        with metrics.STAGE_SECONDS.labels("render", "encode").time():
+            encoder.close()
+
+
+def iter_cpu_frames(
+    scene: CpuScene, cameras: list[FrameCamera], color_space: str, threads: int, tile_size: int
+) -> Iterator[tuple[torch.Tensor, torch.Tensor]]:
+    """Rasterize ``cameras`` on ``threads`` threads, yielding frames in order
+    in the form sharp's ``VideoWriter`` takes: uint8 (H, W, 3) color and
+    (1, H, W) depth."""
+
+    def render(camera_info: FrameCamera) -> tuple[torch.Tensor, torch.Tensor]:
+        return _cpu_frame(scene, camera_info, color_space, tile_size)
+
+    # At most two frames per thread are in flight, so finished frames do not
+    # pile up behind a slow one.
+    window = 2 * threads
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="cpu-render") as pool:
+        pending = deque(pool.submit(render, camera_info) for camera_info in cameras[:window])
+        for camera_info in cameras[window:]:
+            yield pending.popleft().result()
+            pending.append(pool.submit(render, camera_info))
+        while pending:
+            yield pending.popleft().result()
+
+
+def _cpu_frame(
+    scene: CpuScene, camera_info: FrameCamera, color_space: str, tile_size: int
+) -> tuple[torch.Tensor, torch.Tensor]:
+    from sharp.utils import color_space as color_space_utils
+
+    color, depth, _ = rasterize(
+        scene,
+        camera_info.extrinsics.cpu().numpy(),
+        camera_info.intrinsics.cpu().numpy(),
+        camera_info.width,
+        camera_info.height,
+        tile_size=tile_size,
+    )
+    color = torch.from_numpy(color)
+    if color_space == "linearRGB":
+        color = color_space_utils.linearRGB2sRGB(color)
+    color = (color.clamp(0.0, 1.0) * 255.0).to(dtype=torch.uint8)
+    return color, torch.from_numpy(depth)[None]
+
+
+class FrameCamera(NamedTuple):
+    extrinsics: torch.Tensor
+    intrinsics: torch.Tensor
+    width: int
+    height: int
+
+
+def trajectory_cameras(
+    gaussians, metadata, trajectory, scale: float, device: torch.device
+) -> list[FrameCamera]:
+    """sharp's camera for each frame of ``trajectory``, at ``scale`` times the
+    input resolution (rounded to even sizes for the video encoder)."""
+    from sharp.utils import camera
+
+    width, height = metadata.resolution_px
+    f_px = metadata.focal_length_px
+    intrinsics = torch.tensor(
+        [
+            [f_px, 0, (width - 1) / 2.0, 0],
+            [0, f_px, (height - 1) / 2.0, 0],
+            [0, 0, 1, 0],
+            [0, 0, 0, 1],
+        ],
+        device=device,
+        dtype=torch.float32,
+    )
+    camera_model = camera.create_camera_model(
+        gaussians,
+        intrinsics,
+        resolution_px=metadata.resolution_px,
+        lookat_mode=trajectory.lookat_mode,
+    )
+    eye_positions = camera.create_eye_trajectory(
+        gaussians, trajectory, resolution_px=metadata.resolution_px, f_px=f_px
+    )
+    cameras = []
+    for eye_position in eye_positions:
+        info = camera_model.compute(eye_position)
+        camera_info = FrameCamera(info.extrinsics, info.intrinsics, info.width, info.height)
+        cameras.append(camera_info if scale == 1.0 else _scale_camera(camera_info, scale))
+    return cameras
+
+
+def _scale_camera(camera_info: FrameCamera, scale: float) -> FrameCamera:
+    width = max(2, round(camera_info.width * scale / 2) * 2)
+    height = max(2, round(camera_info.height * scale / 2) * 2)
+    intrinsics = camera_info.intrinsics.clone()
+    for axis, factor in ((0, width / camera_info.width), (1, height / camera_info.height)):
+        intrinsics[axis, axis] *= factor
+        # Scale about the image corner, with pixel centers at i + 0.5.
+        intrinsics[axis, 2] = (intrinsics[axis, 2] + 0.5) * factor - 0.5
+    return camera_info._replace(intrinsics=intrinsics, width=width, height=height)
+
+
+def snapshot_camera(
+    metadata, focus_depth: float, yaw: float, pitch: float, width: int, height: int
+) -> FrameCamera:
+    """The input camera orbited about the point ``focus_depth`` ahead of it,
+    framing a ``width`` x ``height`` image the input view covers."""
+    input_width, input_height = metadata.resolution_px
+    f_px = metadata.focal_length_px * max(width / input_width, height / input_height)
+    intrinsics = torch.tensor(
+        [
+            [f_px, 0, (width - 1) / 2.0, 0],
+            [0, f_px, (height - 1) / 2.0, 0],
+            [0, 0, 1, 0],
+            [0, 0, 0, 1],
+        ],
+        dtype=torch.float32,
+    )
+    # Camera axes are x right, y down, z forward: a positive yaw moves the
+    # camera right and a positive pitch moves it up, both still facing the
+    # focus point.
+    yaw_rad, pitch_rad = math.radians(-yaw), math.radians(-pitch)
+    rotation_y = torch.tensor(
+        [
+            [math.cos(yaw_rad), 0.0, math.sin(yaw_rad)],
+            [0.0, 1.0, 0.0],
+            [-math.sin(yaw_rad), 0.0, math.cos(yaw_rad)],
+        ]
+    )
+    rotation_x = torch.tensor(
+        [
+            [1.0, 0.0, 0.0],
+            [0.0, math.cos(pitch_rad), -math.sin(pitch_rad)],
+            [0.0, math.sin(pitch_rad), math.cos(pitch_rad)],
+        ]
+    )
+    camera_to_world = rotation_y @ rotation_x
+    focus = torch.tensor([0.0, 0.0, focus_depth])
+    eye = focus - camera_to_world @ focus
+    extrinsics = torch.eye(4)
+    extrinsics[:3, :3] = camera_to_world.T
+    extrinsics[:3, 3] = -camera_to_world.T @ eye
+    return FrameCamera(extrinsics, intrinsics, width, height)
+
+
+def build_trajectory(params: RenderParams):
+    from sharp.utils import camera
+
+    trajectory = camera.TrajectoryParams()
+    if params.trajectory_type is not None:
+        trajectory.type = params.trajectory_type
+    if params.lookat_mode is not None:
+        trajectory.lookat_mode = params.lookat_mode
+    if params.max_disparity is not None:
+        trajectory.max_disparity = params.max_disparity
+    if params.max_zoom is not None:
+        trajectory.max_zoom = params.max_zoom
+    if params.distance_m is not None:
+        trajectory.distance_m = params.distance_m
+    if params.num_steps is not None:
+        trajectory.num_steps = params.num_steps
+    if params.num_repeats is not None:
+        trajectory.num_repeats = params.num_repeats
+    return trajectory
@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import logging
+import shutil
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any
+
+from app.core import metrics
+from app.core.config import settings
+from app.db.repo import Repository
+from app.db.schema import (
+    ARTIFACT_GAUSSIANS,
+    ARTIFACT_ORIGINAL,
+    ARTIFACT_SPLAT,
+    TIER_DERIVED,
+    TIER_ORIGINAL,
+    ArtifactRecord,
+    profile_artifact,
+    render_artifact,
+    utc_now,
+)
+from app.storage import paths as storage_paths
+
+logger = logging.getLogger(__name__)
+
+# Pause between passes while a backlog remains, so eviction never holds the
+# database for long.
+_BACKLOG_PAUSE_SECONDS = 0.5
+
+EVICTION_REASONS = ("ttl", "budget")
+
+
+class ArtifactRetention:
+    """Keeps ``DATA_DIR/files`` within a byte budget and a time-to-live.
+
+    Every stored artifact (original upload, gaussians, splat, render variant)
+    has a row in the ``artifacts`` table with its size and last access. A
+    background thread evicts, in small batches, artifacts not accessed for
+    ``ttl_seconds`` and then least-recently-used artifacts until the total fits
+    ``budget_bytes``; derived artifacts go before originals. Zero disables the
+    corresponding limit. Downloads are recorded in memory and written once per
+    pass.
+    """
+
+    def __init__(
+        self,
+        repo: Repository,
+        budget_bytes: int,
+        ttl_seconds: float,
+        interval_seconds: float,
+        batch_size: int,
+    ) -> None:
+        self._repo = repo
+        self._budget = budget_bytes
+        self._ttl = ttl_seconds
+        self._interval = interval_seconds
+        self._batch = max(1, batch_size)
+        self._lock = threading.Lock()
+        self._accesses: dict[tuple[str, str], str] = {}
+        self._backfill_after: str | None = ""
+        self._usage = {"artifacts": 0, "bytes": 0}
+        self._evicted = dict.fromkeys(EVICTION_REASONS, 0)
+        self._reclaimed = dict.fromkeys(EVICTION_REASONS, 0)
+        self._passes = 0
+        self._last_pass_ms = 0.0
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def record(self, file_id: str, name: str, path: Path) -> None:
+        """Track a newly written artifact; ``path`` is a file or a directory."""
+        try:
+            size = _size(path)
+        except OSError:
+            logger.warning("Not tracking missing artifact %s", path)
+            return
+        tier = TIER_ORIGINAL if name == ARTIFACT_ORIGINAL else TIER_DERIVED
+        self._repo.put_artifact(file_id, name, str(path), tier, size)
+
+    def touch(self, file_id: str, name: str) -> None:
+        with self._lock:
+            self._accesses[(file_id, name)] = utc_now()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._loop, name="retention", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+        self._flush_accesses()
+
+    def run_once(self) -> bool:
+        """One incremental pass. Returns whether work is left for another."""
+        started = time.perf_counter()
+        self._flush_accesses()
+        backlog = self._backfill()
+        if self._ttl > 0:
+            cutoff = datetime.now(timezone.utc) - timedelta(seconds=self._ttl)
+            expired = self._repo.list_eviction_candidates(self._batch, cutoff.isoformat())
+            for record in expired:
+                self._evict(record, "ttl")
+            backlog = backlog or len(expired) == self._batch
+        usage = self._repo.artifact_usage()
+        if self._budget > 0 and usage["bytes"] > self._budget:
+            for record in self._repo.list_eviction_candidates(self._batch):
+                if usage["bytes"] <= self._budget:
+                    break
+                if self._evict(record, "budget") is not None:
+                    usage["artifacts"] -= 1
+                    usage["bytes"] -= record.size_bytes
+            backlog = backlog or usage["bytes"] > self._budget
+        metrics.ARTIFACT_BYTES.labels().set(usage["bytes"])
+        with self._lock:
+            self._usage = usage
+            self._passes += 1
+            self._last_pass_ms = (time.perf_counter() - started) * 1000.0
+        return backlog
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                **self._usage,
+                "budget_bytes": self._budget,
+                "ttl_seconds": self._ttl,
+                "evicted": dict(self._evicted),
+                "reclaimed_bytes": dict(self._reclaimed),
+                "passes": self._passes,
+                "last_pass_ms": self._last_pass_ms,
+                "backfilling": self._backfill_after is not None,
+            }
+
+    def _loop(self) -> None:
+        backlog = True
+        while not self._stopping.wait(_BACKLOG_PAUSE_SECONDS if backlog else self._interval):
+            try:
+                backlog = self.run_once()
+            except Exception:
+                logger.exception("Retention pass failed")
+                backlog = False
+
+    def _flush_accesses(self) -> None:
+        with self._lock:
+            accesses, self._accesses = self._accesses, {}
+        if accesses:
+            self._repo.touch_artifacts(
+                (file_id, name, accessed_at) for (file_id, name), accessed_at in accesses.items()
+            )
+
+    def _backfill(self) -> bool:
+        """Track one page of files stored before artifacts were tracked."""
+        if self._backfill_after is None:
+            return False
+        files = self._repo.list_untracked_files(self._backfill_after, self._batch)
+        for record in files:
+            file_id = record.file_id
+            candidates = [
+                (ARTIFACT_ORIGINAL, Path(record.original_path)),
+                (ARTIFACT_GAUSSIANS, storage_paths.gaussians_path(settings.data_dir, file_id)),
+                (ARTIFACT_SPLAT, storage_paths.splat_path(settings.data_dir, file_id)),
+            ]
+            candidates += [
+                (render_artifact(render.render_key), Path(render.render_path).parent)
+                for render in self._repo.list_renders(file_id)
+            ]
+            profiles = storage_paths.profiles_dir(settings.data_dir, file_id)
+            if profiles.is_dir():
+                candidates += [(profile_artifact(path.name), path) for path in profiles.iterdir()]
+            for name, path in candidates:
+                if path.exists():
+                    self.record(file_id, name, path)
+        if len(files) < self._batch:
+            self._backfill_after = None
+            return False
+        self._backfill_after = files[-1].file_id
+        return True
+
+    def _evict(self, record: ArtifactRecord, reason: str) -> int | None:
+        """Delete one artifact; None when it was accessed since it was listed."""
+        if not self._repo.evict_artifact(record):
+            return None
+        path = Path(record.path)
+        freed = _remove(path, record.size_bytes)
+        root = storage_paths.file_root(settings.data_dir, record.file_id)
+        # Drop directories the eviction left empty, up to the file's own.
+        for parent in path.parents:
+            if parent != root and root not in parent.parents:
+                break
+            try:
+                parent.rmdir()
+            except OSError:
+                break
+        with self._lock:
+            self._evicted[reason] += 1
+            self._reclaimed[reason] += freed
+        metrics.RETENTION_EVICTED.labels(reason).inc()
+        metrics.RETENTION_RECLAIMED_BYTES.labels(reason).inc(freed)
+        logger.info(
+            "Evicted %s of %s (%s), reclaimed %d bytes", record.name, record.file_id, reason, freed
+        )
+        return freed
+
+
+def _size(path: Path) -> int:
+    if path.is_dir():
+        return sum(child.stat().st_size for child in path.rglob("*") if child.is_file())
+    return path.stat().st_size
+
+
+def _remove(path: Path, size_bytes: int) -> int:
+    """Delete ``path`` and return the disk bytes freed. Hard-linked files (cached
+    predictions shared between uploads) free nothing until the last link goes."""
+    try:
+        stat = path.lstat()
+    except FileNotFoundError:
+        return 0
+    if path.is_dir():
+        shutil.rmtree(path, ignore_errors=True)
+        return size_bytes
+    path.unlink(missing_ok=True)
+    return stat.st_size if stat.st_nlink == 1 else 0
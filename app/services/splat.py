@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import os
+import struct
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from plyfile import PlyData
+
+SH_C0 = 0.28209479177387814
+
+SPLAT_MAGIC = b"SPLT"
+SPLAT_VERSION = 1
+# magic, version, splat count, log-scale range (min, max), reserved.
+SPLAT_HEADER = struct.Struct("<4sIIff12x")
+# 16 bytes per splat: fp16 position, uint8 log-scale quantized over the header
+# range, uint8 RGBA, and a smallest-three quaternion packed into 24 bits.
+SPLAT_DTYPE = np.dtype(
+    [
+        ("position", "<f2", 3),
+        ("scale", "u1", 3),
+        ("color", "u1", 4),
+        ("rotation", "u1", 3),
+    ]
+)
+
+
+def _pack_quaternions(quaternions: np.ndarray) -> np.ndarray:
+    """Pack (w, x, y, z) quaternions as 2 bits of largest-component index plus
+    the other three components at 7 bits each."""
+    norms = np.linalg.norm(quaternions, axis=1, keepdims=True)
+    q = quaternions / np.where(norms > 0, norms, 1.0)
+    largest = np.argmax(np.abs(q), axis=1)
+    rows = np.arange(len(q))
+    q *= np.where(q[rows, largest] < 0, -1.0, 1.0)[:, None]
+    others = np.array([[1, 2, 3], [0, 2, 3], [0, 1, 3], [0, 1, 2]])[largest]
+    small = np.take_along_axis(q, others, axis=1)
+    quantized = np.clip(np.rint((small * np.sqrt(2.0) + 1.0) * 63.5), 0, 127).astype(np.uint32)
+    bits = (
+        (largest.astype(np.uint32) << 21)
+        | (quantized[:, 0] << 14)
+        | (quantized[:, 1] << 7)
+        | quantized[:, 2]
+    )
+    return np.stack([bits & 0xFF, (bits >> 8) & 0xFF, (bits >> 16) & 0xFF], axis=1).astype(
+        np.uint8
+    )
+
+
+def convert_ply_to_splat(ply_path: Path, splat_path: Path) -> Path:
+    vertices = PlyData.read(ply_path)["vertex"]
+
+    def column(name: str) -> np.ndarray:
+        return np.asarray(vertices[name], dtype=np.float32)
+
+    opacity = 1.0 / (1.0 + np.exp(-column("opacity")))
+    alpha = np.rint(opacity * 255.0).astype(np.uint8)
+    keep = alpha > 0
+    count = int(keep.sum())
+
+    log_scales = np.stack([column(f"scale_{i}")[keep] for i in range(3)], axis=1)
+    scale_min = float(log_scales.min()) if count else 0.0
+    scale_max = float(log_scales.max()) if count else 0.0
+    scale_range = scale_max - scale_min or 1.0
+
+    splats = np.empty(count, dtype=SPLAT_DTYPE)
+    splats["position"] = np.stack([column(axis)[keep] for axis in ("x", "y", "z")], axis=1)
+    splats["scale"] = np.rint((log_scales - scale_min) / scale_range * 255.0)
+    sh0 = np.stack([column(f"f_dc_{i}")[keep] for i in range(3)], axis=1)
+    splats["color"][:, :3] = np.clip(np.rint((0.5 + SH_C0 * sh0) * 255.0), 0, 255)
+    splats["color"][:, 3] = alpha[keep]
+    splats["rotation"] = _pack_quaternions(
+        np.stack([column(f"rot_{i}")[keep] for i in range(4)], axis=1)
+    )
+
+    fd, tmp_name = tempfile.mkstemp(prefix=".splat-", dir=splat_path.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(SPLAT_HEADER.pack(SPLAT_MAGIC, SPLAT_VERSION, count, scale_min, scale_max))
+            f.write(splats.tobytes())
+        os.replace(tmp_name, splat_path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+    return splat_path
+
+
+def ensure_splat(ply_path: Path, splat_path: Path) -> Path:
+    """Return the cached splat file, regenerating it if the PLY is newer."""
+    if splat_path.exists() and splat_path.stat().st_mtime >= ply_path.stat().st_mtime:
+        return splat_path
+    return convert_ply_to_splat(ply_path, splat_path)
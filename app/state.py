@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+
+from app.core.config import settings
+from app.db.repo import Repository
+from app.services.batching import PredictBatcher
+from app.services.cpu_pool import CpuInferencePool
+from app.services.dedup import PredictCache
+from app.services.inference import InferenceMode, configure_torch
+from app.services.predictor import PredictService, PredictorManager, resolve_device
+from app.services.gaussian_cache import GaussianCache
+from app.services.render_cache import RenderCache
+from app.services.renderer import RenderService
+from app.services.retention import ArtifactRetention
+from app.tasks.admission import AdmissionController
+from app.tasks.events import EventBus
+from app.tasks.jobs import JobWorker, TaskWatcher
+from app.tasks.runner import TaskRunner
+from app.tasks.scheduler import PRIORITY_INTERACTIVE
+
+logger = logging.getLogger(__name__)
+
+
+class AppState:
+    """The services of one process, shared by the API and job workers."""
+
+    def __init__(
+        self,
+        predictor_manager: PredictorManager | None = None,
+        render_service: RenderService | None = None,
+    ) -> None:
+        started = time.perf_counter()
+        configure_torch(settings)
+        self.repo = Repository(settings.db_path)
+        self.runner = TaskRunner(max_workers=settings.task_workers)
+        self.events = EventBus()
+        self.admission = AdmissionController(
+            slots=settings.max_gpu_tasks,
+            slo_seconds=settings.admission_slo_seconds,
+            max_inflight=settings.admission_max_inflight,
+            max_per_key=settings.admission_max_per_key,
+        )
+        self.predictor_manager = predictor_manager or PredictorManager(
+            settings.model_path,
+            mmap=settings.model_mmap,
+            mode=InferenceMode.from_settings(settings),
+            model_id=settings.model_id,
+        )
+        self.batcher = PredictBatcher(
+            self.predictor_manager,
+            self.runner,
+            max_batch_size=settings.predict_max_batch,
+            max_wait_ms=settings.predict_batch_wait_ms,
+        )
+        self.cpu_pool = self._create_cpu_pool() if predictor_manager is None else None
+        self.predict_service = PredictService(
+            self.repo,
+            self.predictor_manager,
+            self.batcher,
+            self.cpu_pool,
+            decode_workers=settings.pipeline_decode_workers,
+            infer_workers=settings.pipeline_infer_workers,
+            serialize_workers=settings.pipeline_serialize_workers,
+            queue_size=settings.pipeline_queue_size,
+        )
+        self.predict_cache = PredictCache(self.repo)
+        self.gaussian_cache = GaussianCache(
+            settings.gaussian_cache_host_mb * 1024 * 1024,
+            settings.gaussian_cache_device_mb * 1024 * 1024,
+        )
+        self.render_service = render_service or RenderService(self.gaussian_cache, self.runner)
+        self.render_cache = RenderCache(self.repo, settings.render_budget_mb * 1024 * 1024)
+        self.retention = ArtifactRetention(
+            self.repo,
+            budget_bytes=settings.retention_budget_mb * 1024 * 1024,
+            ttl_seconds=settings.retention_ttl_hours * 3600.0,
+            interval_seconds=settings.retention_interval_seconds,
+            batch_size=settings.retention_batch,
+        )
+        self.preload_timings: dict[str, float] = {}
+        self.preload_error: str | None = None
+        self.preloaded = threading.Event()
+        poll_seconds = settings.job_poll_ms / 1000.0
+        self.watcher = TaskWatcher(
+            self.repo, self.events, poll_seconds, settings.job_lease_seconds
+        )
+        self.job_worker = JobWorker(
+            self,
+            concurrency=settings.worker_concurrency or settings.task_workers,
+            lease_seconds=settings.job_lease_seconds,
+            poll_seconds=poll_seconds,
+            max_attempts=settings.job_max_attempts,
+            ready=self.accepting_jobs,
+            on_change=self.watcher.poke,
+        )
+        logger.info("Services initialized in %.0f ms", (time.perf_counter() - started) * 1000.0)
+
+    @staticmethod
+    def _create_cpu_pool() -> CpuInferencePool | None:
+        if settings.cpu_workers <= 0:
+            return None
+        try:
+            if resolve_device(None).type != "cpu":
+                return None
+        except RuntimeError:
+            return None
+        return CpuInferencePool(
+            settings.cpu_workers,
+            settings.model_path,
+            threads_per_worker=settings.cpu_worker_threads,
+            mmap=settings.model_mmap,
+            mode=InferenceMode.from_settings(settings),
+            warmup=settings.model_warmup,
+        )
+
+    def identify_model(self) -> None:
+        """Compute the weights' identity ahead of the first upload, which
+        would otherwise wait for the whole file to be hashed."""
+        try:
+            self.predict_service.model_id
+        except FileNotFoundError as exc:
+            if settings.embedded_worker:
+                logger.warning("Cannot identify the model: %s", exc)
+            else:
+                logger.warning(
+                    "Cannot identify the model (%s); uploads bypass the predict cache "
+                    "until MODEL_ID is set",
+                    exc,
+                )
+
+    def preload_model(self) -> None:
+        started = time.perf_counter()
+        try:
+            device = resolve_device(None)
+            # Run in a device slot so the warm-up pass never overlaps user work
+            # beyond MAX_GPU_TASKS.
+            timings = self.runner.scheduler(str(device)).call(
+                self.predictor_manager.preload,
+                device,
+                settings.model_warmup,
+                priority=PRIORITY_INTERACTIVE,
+            )
+        except Exception as exc:
+            self.preload_error = str(exc)
+            logger.exception("Model preload failed")
+            return
+        timings["total_ms"] = (time.perf_counter() - started) * 1000.0
+        self.preload_timings = timings
+        self.preloaded.set()
+        logger.info(
+            "Model resident on %s (%s): %s",
+            device,
+            self.predictor_manager.mode.name,
+            ", ".join(f"{name}={value:.0f}" for name, value in timings.items()),
+        )
+
+    def start_worker(self) -> None:
+        """Load the model and start claiming jobs."""
+        if self.cpu_pool is not None:
+            # Pool workers load the model themselves; this process never does.
+            self.cpu_pool.start()
+        elif settings.preload_model:
+            # Load in the background so /healthz answers while weights are read;
+            # /readyz stays 503 until the model is resident.
+            threading.Thread(target=self.preload_model, name="model-preload", daemon=True).start()
+        self.job_worker.start()
+
+    def stop_worker(self) -> None:
+        self.job_worker.stop()
+        self.predict_service.shutdown()
+        self.runner.shutdown()
+        if self.cpu_pool is not None:
+            self.cpu_pool.shutdown()
+
+    def accepting_jobs(self) -> bool:
+        """Claim jobs once the model is loaded, or right away when loading is
+        left to the first job."""
+        if self.cpu_pool is not None:
+            return self.cpu_pool.ready()
+        if settings.preload_model:
+            return self.preloaded.is_set()
+        return True
+
+    def ready(self) -> bool:
+        if self.cpu_pool is not None:
+            return self.cpu_pool.ready()
+        if settings.preload_model and not self.preloaded.is_set():
+            return False
+        try:
+            device = resolve_device(None)
+        except RuntimeError:
+            return False
+        return self.predictor_manager.is_loaded(device)
@@ -1,17 +1,186 @@
 from __future__ import annotations
 
+import os
 import shutil
+import tempfile
 from pathlib import Path
+from typing import Any, AsyncIterator, BinaryIO
+
+from fastapi.concurrency import run_in_threadpool
 
 from . import paths
 
+try:
+    from python_multipart.exceptions import MultipartParseError
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ModuleNotFoundError:  # python-multipart < 0.0.13
+    from multipart.exceptions import MultipartParseError
+    from multipart.multipart import MultipartParser, parse_options_header
 
-def persist_upload(data_dir: str, file_id: str, filename: str, content: bytes) -> Path:
-    ext = Path(filename).suffix or ".bin"
-    target = paths.ensure_dir(paths.file_root(data_dir, file_id)) / f"original{ext}"
-    with open(target, "wb") as f:
-        f.write(content)
-    return target
+# Parsed data is hashed and written in batches of at least this many bytes.
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+# Room for multipart boundaries, part headers and small form fields.
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+class InvalidUpload(ValueError):
+    pass
+
+
+class _UploadPart:
+    """Collects the file part of a multipart body as the parser emits it."""
+
+    def __init__(self, field: str) -> None:
+        self._field = field.encode()
+        self._header_field = b""
+        self._header_value = b""
+        self._headers: dict[bytes, bytes] = {}
+        self._in_file = False
+        self.filename: str | None = None
+        self.pending: list[bytes] = []
+        self.pending_bytes = 0
+        self.size = 0
+        self.done = False
+
+    def callbacks(self) -> dict[str, Any]:
+        return {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        }
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = self._header_value = b""
+
+    def _on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        # Only the first part with the field name and a filename is the upload.
+        self._in_file = (
+            self.filename is None
+            and options.get(b"name") == self._field
+            and b"filename" in options
+        )
+        if self._in_file:
+            self.filename = options[b"filename"].decode("utf-8", "replace") or "upload.bin"
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._in_file:
+            self.pending.append(data[start:end])
+            self.pending_bytes += end - start
+            self.size += end - start
+
+    def _on_part_end(self) -> None:
+        if self._in_file:
+            self._in_file = False
+            self.done = True
+
+    def take(self) -> list[bytes]:
+        pending, self.pending, self.pending_bytes = self.pending, [], 0
+        return pending
+
+
+def _write_chunks(f: BinaryIO, digest: Any | None, chunks: list[bytes]) -> None:
+    for chunk in chunks:
+        if digest is not None:
+            digest.update(chunk)
+        f.write(chunk)
+
+
+async def stream_upload(
+    data_dir: str,
+    file_id: str,
+    content_type: str | None,
+    body: AsyncIterator[bytes],
+    max_bytes: int,
+    digest: Any | None = None,
+    field: str = "upload",
+) -> tuple[Path, str, int]:
+    """Parse a ``multipart/form-data`` request body as it arrives and write
+    the file in form field ``field`` to ``original{ext}``.
+
+    Nothing is buffered beyond one batch of parsed data: the file goes to a
+    temp file in the file's directory and is renamed into place once complete,
+    so readers never see a partial original. ``digest`` (a hashlib object) is
+    fed the file's bytes. Reading stops, raising :class:`UploadTooLarge`, as
+    soon as the file exceeds ``max_bytes`` or the body exceeds it by more than
+    ``MULTIPART_OVERHEAD_BYTES``. Raises :class:`InvalidUpload` when the body
+    is not multipart or has no such file. Returns the path, the client's
+    filename and the file size.
+    """
+    media_type, options = parse_options_header(content_type or "")
+    if media_type != b"multipart/form-data" or b"boundary" not in options:
+        raise InvalidUpload("expected a multipart/form-data body")
+    part = _UploadPart(field)
+    parser = MultipartParser(options[b"boundary"], part.callbacks())
+    root = paths.file_root(data_dir, file_id)
+    tmp_name: str | None = None
+    f: BinaryIO | None = None
+    received = 0
+    try:
+        async for chunk in body:
+            received += len(chunk)
+            if received > max_bytes + MULTIPART_OVERHEAD_BYTES:
+                raise UploadTooLarge(f"upload exceeds {max_bytes} bytes")
+            try:
+                parser.write(chunk)
+            except MultipartParseError as exc:
+                raise InvalidUpload(f"malformed multipart body: {exc}") from exc
+            if part.size > max_bytes:
+                raise UploadTooLarge(f"upload exceeds {max_bytes} bytes")
+            if part.pending_bytes >= UPLOAD_CHUNK_BYTES or (part.done and part.pending):
+                if f is None:
+                    f, tmp_name = await run_in_threadpool(_open_temp, root, part.filename)
+                await run_in_threadpool(_write_chunks, f, digest, part.take())
+            if part.done:
+                # The rest of the body is of no interest.
+                break
+        if not part.done:
+            raise InvalidUpload(f"missing file field {field!r}")
+        if f is None:
+            # An empty file.
+            f, tmp_name = await run_in_threadpool(_open_temp, root, part.filename)
+        await run_in_threadpool(f.close)
+        target = root / f"original{Path(part.filename).suffix or '.bin'}"
+        await run_in_threadpool(os.replace, tmp_name, target)
+    except BaseException:
+        # Also runs on cancellation, so no awaiting here.
+        if f is not None:
+            f.close()
+        _discard(root, tmp_name)
+        raise
+    return target, part.filename, part.size
+
+
+def _open_temp(root: Path, filename: str | None) -> tuple[BinaryIO, str]:
+    ext = Path(filename or "").suffix or ".bin"
+    paths.ensure_dir(root)
+    fd, tmp_name = tempfile.mkstemp(prefix=".upload-", suffix=ext, dir=root)
+    return os.fdopen(fd, "wb"), tmp_name
+
+
+def _discard(root: Path, tmp_name: str | None) -> None:
+    if tmp_name is not None:
+        Path(tmp_name).unlink(missing_ok=True)
+    if root.exists() and not any(root.iterdir()):
+        root.rmdir()
 
 
 def ensure_file_dir(data_dir: str, file_id: str) -> Path:
@@ -24,3 +193,14 @@ def ensure_clean_dir(data_dir: str, file_id: str) -> Path:
         shutil.rmtree(root)
     root.mkdir(parents=True, exist_ok=True)
     return root
+
+
+def link_or_copy(source: Path, target: Path) -> Path:
+    target.parent.mkdir(parents=True, exist_ok=True)
+    if target.exists():
+        target.unlink()
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+    return target
@@ -20,9 +20,41 @@ def gaussians_path(data_dir: str, file_id: str) -> Path:
     return file_root(data_dir, file_id) / "gaussians.ply"
 
 
+def splat_path(data_dir: str, file_id: str) -> Path:
+    return file_root(data_dir, file_id) / "gaussians.splat"
+
+
 def render_path(data_dir: str, file_id: str) -> Path:
     return file_root(data_dir, file_id) / "render.mp4"
 
 
 def render_depth_path(data_dir: str, file_id: str) -> Path:
     return file_root(data_dir, file_id) / "render.depth.mp4"
+
+
+def renders_dir(data_dir: str, file_id: str) -> Path:
+    return file_root(data_dir, file_id) / "renders"
+
+
+def render_variant_dir(data_dir: str, file_id: str, render_key: str) -> Path:
+    return renders_dir(data_dir, file_id) / render_key
+
+
+def render_variant_path(data_dir: str, file_id: str, render_key: str) -> Path:
+    return render_variant_dir(data_dir, file_id, render_key) / "render.mp4"
+
+
+def render_variant_depth_path(data_dir: str, file_id: str, render_key: str) -> Path:
+    return render_variant_dir(data_dir, file_id, render_key) / "render.depth.mp4"
+
+
+def render_variant_hls_dir(data_dir: str, file_id: str, render_key: str) -> Path:
+    return render_variant_dir(data_dir, file_id, render_key) / "hls"
+
+
+def profiles_dir(data_dir: str, file_id: str) -> Path:
+    return file_root(data_dir, file_id) / "profiles"
+
+
+def profile_dir(data_dir: str, file_id: str, task_id: str) -> Path:
+    return profiles_dir(data_dir, file_id) / task_id
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import hashlib
+import math
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any
+
+from app.core import metrics
+
+# Completed tasks per type that the service-time estimate averages over.
+_HISTORY = 50
+
+SHED_REASONS = ("slo", "capacity", "key_limit")
+
+
+class AdmissionRejected(RuntimeError):
+    def __init__(self, reason: str, retry_after: float, message: str) -> None:
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@dataclass(eq=False)
+class Ticket:
+    controller: AdmissionController = field(repr=False)
+    task_type: str
+    key: str
+    started_at: float | None = None
+    released: bool = False
+
+    def start(self) -> None:
+        self.started_at = time.monotonic()
+
+    def release(self, service_seconds: float | None = None) -> None:
+        self.controller.release(self, service_seconds)
+
+
+class AdmissionController:
+    """Decides whether a new task may queue, before any work is done for it.
+
+    Every admitted task holds a ticket until it finishes. The expected wait for
+    a new task is the remaining work of all held tickets, from the recent mean
+    service time of each task type, divided by the measured throughput: the
+    service time completed per second while tickets were held. Batched
+    predicts and extra workers raise the throughput; until tasks have
+    completed it is taken to be the device slots. A task is shed when that
+    wait exceeds ``slo_seconds``, when ``max_inflight`` tickets are held, or
+    when its API key already holds ``max_per_key`` tickets. Zero disables the
+    corresponding check.
+    """
+
+    def __init__(
+        self, slots: int, slo_seconds: float, max_inflight: int, max_per_key: int
+    ) -> None:
+        self._slots = max(1, slots)
+        self._slo = slo_seconds
+        self._max_inflight = max_inflight
+        self._max_per_key = max_per_key
+        self._lock = threading.Lock()
+        self._tickets: set[Ticket] = set()
+        self._per_key: dict[str, int] = {}
+        self._history: dict[str, deque[float]] = {}
+        self._means: dict[str, float] = {}
+        # Seconds during which tickets were held, and when the current stretch began.
+        self._busy_seconds = 0.0
+        self._busy_since: float | None = None
+        # (busy clock, service seconds) of recently completed tasks.
+        self._completions: deque[tuple[float, float]] = deque(maxlen=_HISTORY)
+        self._admitted = 0
+        self._shed = dict.fromkeys(SHED_REASONS, 0)
+        self._inflight_gauge = metrics.ADMISSION_INFLIGHT.labels()
+        self._wait_gauge = metrics.ADMISSION_ESTIMATED_WAIT_SECONDS.labels()
+
+    def admit(self, task_type: str, api_key: str | None) -> Ticket:
+        key = _key_id(api_key)
+        with self._lock:
+            service = self._service_time(task_type)
+            wait = self._estimated_wait(time.monotonic())
+            self._wait_gauge.set(wait)
+            if self._max_inflight and len(self._tickets) >= self._max_inflight:
+                raise self._reject(
+                    "capacity", wait / len(self._tickets), "Too many tasks in flight"
+                )
+            if self._max_per_key and self._per_key.get(key, 0) >= self._max_per_key:
+                raise self._reject(
+                    "key_limit", service, "Too many tasks in flight for this API key"
+                )
+            if self._slo and wait > self._slo:
+                raise self._reject(
+                    "slo",
+                    wait - self._slo,
+                    f"Estimated queue wait {wait:.0f}s exceeds {self._slo:.0f}s",
+                )
+            ticket = Ticket(self, task_type=task_type, key=key)
+            if not self._tickets:
+                self._busy_since = time.monotonic()
+            self._tickets.add(ticket)
+            self._per_key[key] = self._per_key.get(key, 0) + 1
+            self._admitted += 1
+            self._inflight_gauge.set(len(self._tickets))
+        return ticket
+
+    def release(self, ticket: Ticket, service_seconds: float | None = None) -> None:
+        """Return a ticket; repeated calls are ignored. ``service_seconds``, the
+        time the task ran, feeds the estimate when given."""
+        with self._lock:
+            if ticket.released:
+                return
+            ticket.released = True
+            self._tickets.discard(ticket)
+            now = time.monotonic()
+            remaining = self._per_key.get(ticket.key, 1) - 1
+            if remaining:
+                self._per_key[ticket.key] = remaining
+            else:
+                self._per_key.pop(ticket.key, None)
+            if service_seconds is not None:
+                history = self._history.setdefault(ticket.task_type, deque(maxlen=_HISTORY))
+                history.append(service_seconds)
+                self._means[ticket.task_type] = sum(history) / len(history)
+                self._completions.append((self._busy_clock(now), service_seconds))
+            if not self._tickets and self._busy_since is not None:
+                self._busy_seconds += now - self._busy_since
+                self._busy_since = None
+            self._inflight_gauge.set(len(self._tickets))
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "inflight": len(self._tickets),
+                "queued": sum(ticket.started_at is None for ticket in self._tickets),
+                "running": sum(ticket.started_at is not None for ticket in self._tickets),
+                "estimated_wait_s": self._estimated_wait(now),
+                "service_time_s": dict(self._means),
+                "throughput": self._throughput(),
+                "admitted": self._admitted,
+                "shed": dict(self._shed),
+                "slo_s": self._slo,
+                "max_inflight": self._max_inflight,
+                "max_per_key": self._max_per_key,
+            }
+
+    def _service_time(self, task_type: str) -> float:
+        # Caller holds self._lock.
+        return self._means.get(task_type, 0.0)
+
+    def _estimated_wait(self, now: float) -> float:
+        # Caller holds self._lock.
+        work = 0.0
+        for ticket in self._tickets:
+            service = self._service_time(ticket.task_type)
+            if ticket.started_at is not None:
+                service = max(0.0, service - (now - ticket.started_at))
+            work += service
+        return work / self._throughput()
+
+    def _busy_clock(self, now: float) -> float:
+        # Caller holds self._lock.
+        if self._busy_since is None:
+            return self._busy_seconds
+        return self._busy_seconds + now - self._busy_since
+
+    def _throughput(self) -> float:
+        """Service seconds completed per busy second over the recent
+        completions, so idle time between tasks does not count against it."""
+        # Caller holds self._lock.
+        if not self._completions:
+            return float(self._slots)
+        # From when the oldest of them started.
+        first_done, first_service = self._completions[0]
+        span = self._completions[-1][0] - (first_done - first_service)
+        work = sum(service for _, service in self._completions)
+        if span <= 0.0 or work <= 0.0:
+            return float(self._slots)
+        return work / span
+
+    def _reject(self, reason: str, retry_after: float, message: str) -> AdmissionRejected:
+        # Caller holds self._lock.
+        self._shed[reason] += 1
+        metrics.ADMISSION_SHED.labels(reason).inc()
+        return AdmissionRejected(reason, max(1.0, math.ceil(retry_after)), message)
+
+
+def _key_id(api_key: str | None) -> str:
+    """Stable identifier for an API key that does not keep the key itself."""
+    return hashlib.sha256((api_key or "").encode()).hexdigest()[:12]
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Any
+
+from app.db.schema import TaskRecord
+
+TERMINAL_STATUSES = frozenset({"completed", "failed"})
+
+
+def task_event(task: TaskRecord, **extra: Any) -> dict[str, Any]:
+    return {
+        "task_id": task.task_id,
+        "task_type": task.task_type,
+        "status": task.status,
+        "error": task.error,
+        "file_id": task.file_id,
+        "queue_wait_ms": task.queue_wait_ms,
+        "inference_mode": task.inference_mode,
+        **extra,
+    }
+
+
+class EventBus:
+    """In-process pub/sub of task events.
+
+    Publishers may be any thread; subscribers are asyncio queues on the API
+    event loop. The last event of recently active tasks is kept so late
+    subscribers start from the current stage.
+    """
+
+    def __init__(self, history: int = 4096) -> None:
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._lock = threading.Lock()
+        self._subscribers: dict[str, set[asyncio.Queue]] = {}
+        self._last: OrderedDict[str, dict[str, Any]] = OrderedDict()
+        self._history = history
+
+    def set_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        with self._lock:
+            self._loop = loop
+
+    def publish(self, task_id: str, event: dict[str, Any]) -> None:
+        with self._lock:
+            self._last[task_id] = event
+            self._last.move_to_end(task_id)
+            while len(self._last) > self._history:
+                self._last.popitem(last=False)
+            loop = self._loop
+            queues = list(self._subscribers.get(task_id, ()))
+        if loop is None:
+            return
+        for queue in queues:
+            loop.call_soon_threadsafe(queue.put_nowait, event)
+
+    def publish_task(self, task: TaskRecord, **extra: Any) -> None:
+        self.publish(task.task_id, task_event(task, **extra))
+
+    def last(self, task_id: str) -> dict[str, Any] | None:
+        with self._lock:
+            return self._last.get(task_id)
+
+    def subscribe(self, task_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue()
+        with self._lock:
+            self._subscribers.setdefault(task_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, task_id: str, queue: asyncio.Queue) -> None:
+        with self._lock:
+            queues = self._subscribers.get(task_id)
+            if queues is None:
+                return
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[task_id]
+
+
+class TaskProgress:
+    """Reports stage transitions of one running task to the event bus."""
+
+    def __init__(self, bus: EventBus | None, task: TaskRecord | None) -> None:
+        self._bus = bus
+        self._task = task
+
+    def stage(self, name: str, current: int | None = None, total: int | None = None) -> None:
+        if self._bus is None or self._task is None:
+            return
+        self._bus.publish_task(
+            self._task, status="running", stage=name, current=current, total=total
+        )
+
+
+NULL_PROGRESS = TaskProgress(None, None)
@@ -0,0 +1,474 @@
+"""Durable predict/render jobs on top of the ``tasks`` table.
+
+The API inserts a task row with a JSON ``payload``; a :class:`JobWorker`, in the
+API process or in ``python -m app.worker`` processes on other hosts sharing the
+data directory and database, leases it, runs it on that process's services and
+writes the result. The API follows the tasks it enqueued with a
+:class:`TaskWatcher`.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable
+
+from app.core.config import settings
+from app.db.schema import ARTIFACT_GAUSSIANS, RenderRecord, TaskRecord, profile_artifact
+from app.services import profiling
+from app.services.predictor import resolve_device
+from app.services.renderer import RenderParams
+from app.storage import paths as storage_paths
+from app.tasks.events import TERMINAL_STATUSES, TaskProgress
+
+if TYPE_CHECKING:
+    from app.db.repo import Repository
+    from app.state import AppState
+    from app.tasks.events import EventBus
+
+logger = logging.getLogger(__name__)
+
+# In claim order: interactive predicts go ahead of renders.
+JOB_TYPES = ("predict", "render")
+
+TaskCallback = Callable[[TaskRecord], None]
+
+
+def predict_payload(
+    input_path: Path, cache_key: str | None, model_id: str | None, profile_dir: Path | None
+) -> str:
+    """``cache_key`` is None for runs that must not populate the predict cache."""
+    return json.dumps(
+        {
+            "input_path": str(input_path),
+            "cache_key": cache_key,
+            "model_id": model_id,
+            "profile_dir": str(profile_dir) if profile_dir else None,
+        }
+    )
+
+
+def render_payload(params: RenderParams, profile_dir: Path | None) -> str:
+    return json.dumps(
+        {"params": params.normalized(), "profile_dir": str(profile_dir) if profile_dir else None}
+    )
+
+
+def render_params(task: TaskRecord) -> RenderParams:
+    return RenderParams(**json.loads(task.payload or "{}")["params"])
+
+
+def render_result(record: RenderRecord) -> dict[str, str]:
+    return {
+        "render_key": record.render_key,
+        "render_path": record.render_path,
+        "render_depth_path": record.render_depth_path,
+    }
+
+
+def task_result(repo: Repository, task: TaskRecord) -> dict[str, str] | None:
+    """The ``result`` of a completed job's final event, rebuilt from storage."""
+    if task.status != "completed":
+        return None
+    if task.task_type == "predict":
+        gaussians_path = storage_paths.gaussians_path(settings.data_dir, task.file_id)
+        return {"gaussians_path": str(gaussians_path)}
+    record = repo.get_render(task.file_id, render_params(task).key())
+    return render_result(record) if record is not None else None
+
+
+def service_seconds(task: TaskRecord) -> float | None:
+    """How long a finished job ran after it started."""
+    if task.started_at is None:
+        return None
+    started = datetime.fromisoformat(task.started_at)
+    return max(0.0, (datetime.fromisoformat(task.updated_at) - started).total_seconds())
+
+
+class JobWorker:
+    """Claims queued jobs and runs them on this process's services.
+
+    Up to ``concurrency`` jobs run at once off the device queues. Jobs bound
+    for a device scheduler give their claim slot back once queued there, so
+    renders waiting for the GPU never keep predicts from being claimed; the
+    scheduler's slots bound how many of them run, and at most ``concurrency``
+    wait, still ``queued``: a job is marked ``running``, with its queue wait,
+    when it starts. Each job holds a lease that a heartbeat renews every third of
+    ``lease_seconds``. Every worker also sweeps for expired leases, left by
+    workers that crashed or were killed, and re-queues those jobs, failing them
+    after ``max_attempts`` claims. Results are only written while the lease is
+    held, so a job taken over by another worker is not completed twice.
+    """
+
+    def __init__(
+        self,
+        state: AppState,
+        concurrency: int,
+        lease_seconds: float,
+        poll_seconds: float,
+        max_attempts: int,
+        ready: Callable[[], bool] = lambda: True,
+        on_change: Callable[[], None] | None = None,
+    ) -> None:
+        self._state = state
+        self._repo = state.repo
+        self._events = state.events
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._concurrency = max(1, concurrency)
+        self._slots = threading.Semaphore(self._concurrency)
+        self._lease = lease_seconds
+        self._poll = poll_seconds
+        self._max_attempts = max_attempts
+        self._ready = ready
+        self._on_change = on_change
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiting = 0
+        self._counts = {"claimed": 0, "completed": 0, "failed": 0, "requeued": 0, "lost": 0}
+
+    def start(self) -> None:
+        # Recover jobs whose workers died while this one was down.
+        self._sweep()
+        self._threads = [
+            threading.Thread(target=self._claim_loop, name="job-claim", daemon=True),
+            threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info("Job worker %s started (concurrency %d)", self.owner, self._concurrency)
+
+    def wake(self) -> None:
+        """Claim now instead of at the next poll; called when a job is enqueued."""
+        self._wake.set()
+
+    def stop(self) -> None:
+        """Stop claiming. Jobs still running keep their leases until the
+        process exits; other workers re-queue them once the leases expire."""
+        self._stopping.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout=self._poll + 1.0)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "owner": self.owner,
+                "concurrency": self._concurrency,
+                "active": self._active,
+                "waiting": self._waiting,
+                **self._counts,
+            }
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counts[name] += amount
+
+    def _changed(self) -> None:
+        if self._on_change is not None:
+            self._on_change()
+
+    def _claim_loop(self) -> None:
+        while not self._stopping.is_set():
+            if not self._ready():
+                self._stopping.wait(self._poll)
+                continue
+            if not self._slots.acquire(timeout=self._poll):
+                continue
+            with self._lock:
+                # Enough jobs are queued for the device; only predicts run without it.
+                types = JOB_TYPES if self._waiting < self._concurrency else ("predict",)
+            try:
+                task = self._repo.claim_task(self.owner, self._lease, types)
+            except Exception:
+                logger.exception("Claiming a job failed")
+                task = None
+            if task is None:
+                self._slots.release()
+                self._wake.wait(self._poll)
+                self._wake.clear()
+                continue
+            with self._lock:
+                self._active += 1
+                self._counts["claimed"] += 1
+            self._dispatch(task)
+
+    def _dispatch(self, task: TaskRecord) -> None:
+        payload = json.loads(task.payload or "{}")
+        slot = True
+        try:
+            profile_dir = Path(payload["profile_dir"]) if payload.get("profile_dir") else None
+            if task.task_type == "predict":
+                # Only the forward pass needs a device slot; it is batched by
+                # PredictBatcher. A profiled predict runs unbatched, entirely
+                # inside one slot.
+                device = str(resolve_device(None)) if profile_dir else None
+                fn = self._run_predict
+            else:
+                device = self._state.render_service.device_for(RenderParams(**payload["params"]))
+                fn = self._run_render
+            if device is not None:
+                with self._lock:
+                    self._waiting += 1
+                self._slots.release()
+                slot = False
+            self._state.runner.submit(
+                task.task_id, self._execute, slot, fn, task, payload, profile_dir, device=device
+            )
+        except Exception as exc:
+            if not slot:
+                self._device_started()
+            self._run(slot, self._fail, task, payload, exc)
+
+    def _device_started(self) -> None:
+        with self._lock:
+            self._waiting -= 1
+        # Room to claim another job for the device.
+        self._wake.set()
+
+    def _execute(
+        self, slot: bool, fn: Callable[..., None], task: TaskRecord, *args: Any
+    ) -> None:
+        # The job only turns ``running``, with its queue wait, once it gets
+        # here: device jobs wait for a scheduler slot while still ``queued``.
+        if not slot:
+            self._device_started()
+        try:
+            started = self._repo.mark_started(task.task_id, self.owner)
+        except Exception as exc:
+            if not isinstance(exc, KeyError):
+                logger.exception("Starting task %s failed", task.task_id)
+            self._run(slot, self._lost, task)
+            return
+        self._events.publish_task(started)
+        self._changed()
+        self._run(slot, fn, started, *args)
+
+    def _lost(self, task: TaskRecord) -> None:
+        self._count("lost")
+        logger.warning("Lost the lease on task %s before it started", task.task_id)
+
+    def _run(self, slot: bool, fn: Callable[..., None], task: TaskRecord, *args: Any) -> None:
+        try:
+            fn(task, *args)
+        finally:
+            with self._lock:
+                self._active -= 1
+            if slot:
+                self._slots.release()
+            self._changed()
+
+    def _run_predict(
+        self, task: TaskRecord, payload: dict[str, Any], profile_dir: Path | None
+    ) -> None:
+        state = self._state
+        try:
+            result = state.predict_service.run(
+                file_id=task.file_id,
+                input_path=Path(payload["input_path"]),
+                device_request=None,
+                progress=TaskProgress(self._events, task),
+                profile_dir=profile_dir,
+            )
+            completed = self._repo.complete_task(
+                task.task_id,
+                task.file_id,
+                gaussians_path=str(result.gaussians_path),
+                owner=self.owner,
+            )
+        except Exception as exc:
+            self._fail(task, payload, exc)
+            return
+        finally:
+            self._record_profile(task, profile_dir)
+        state.retention.record(task.file_id, ARTIFACT_GAUSSIANS, result.gaussians_path)
+        if payload.get("cache_key"):
+            state.predict_cache.complete(
+                payload["cache_key"], payload["model_id"], task.file_id, result.gaussians_path
+            )
+        self._count("completed")
+        self._events.publish_task(completed, result={"gaussians_path": str(result.gaussians_path)})
+
+    def _run_render(
+        self, task: TaskRecord, payload: dict[str, Any], profile_dir: Path | None
+    ) -> None:
+        state = self._state
+        params = RenderParams(**payload["params"])
+        try:
+            with profiling.capture(profile_dir) if profile_dir else contextlib.nullcontext():
+                result = state.render_service.run(
+                    file_id=task.file_id, params=params, progress=TaskProgress(self._events, task)
+                )
+            record = state.render_cache.complete(task.file_id, params, result)
+            completed = self._repo.complete_task(
+                task.task_id,
+                task.file_id,
+                render_path=record.render_path,
+                render_depth_path=record.render_depth_path,
+                owner=self.owner,
+            )
+        except Exception as exc:
+            self._fail(task, payload, exc)
+            return
+        finally:
+            self._record_profile(task, profile_dir)
+        self._count("completed")
+        self._events.publish_task(completed, result=render_result(record))
+
+    def _record_profile(self, task: TaskRecord, profile_dir: Path | None) -> None:
+        # Written for failed runs too.
+        if profile_dir is not None:
+            self._state.retention.record(
+                task.file_id, profile_artifact(task.task_id), profile_dir
+            )
+
+    def _fail(self, task: TaskRecord, payload: dict[str, Any], exc: BaseException) -> None:
+        state = self._state
+        if task.task_type == "predict" and payload.get("cache_key"):
+            state.predict_cache.fail(payload["cache_key"], exc)
+        elif task.task_type == "render" and "params" in payload:
+            state.render_cache.fail(task.file_id, RenderParams(**payload["params"]).key(), exc)
+        try:
+            failed = self._repo.update_task(task.task_id, "failed", str(exc), owner=self.owner)
+        except KeyError:
+            self._count("lost")
+            logger.warning("Lost the lease on task %s before it finished", task.task_id)
+            return
+        self._count("failed")
+        self._events.publish_task(failed)
+
+    def _heartbeat_loop(self) -> None:
+        while not self._stopping.wait(self._lease / 3.0):
+            try:
+                self._repo.renew_leases(self.owner, self._lease)
+                self._sweep()
+            except Exception:
+                logger.exception("Job heartbeat failed")
+
+    def _sweep(self) -> None:
+        tasks = self._repo.requeue_expired(self._max_attempts)
+        for task in tasks:
+            logger.warning(
+                "Lease on task %s expired after attempt %d; %s",
+                task.task_id,
+                task.attempts,
+                "re-queued" if task.status == "queued" else "failed",
+            )
+            self._events.publish_task(task)
+        if tasks:
+            self._count("requeued", sum(task.status == "queued" for task in tasks))
+            self._changed()
+            self._wake.set()
+
+
+@dataclass
+class _Watch:
+    status: str
+    on_start: TaskCallback | None
+    on_done: TaskCallback | None
+
+
+class TaskWatcher:
+    """Follows enqueued tasks in the API process until they finish.
+
+    Polls the tasks table for the watched tasks, publishes status changes that
+    were not already published here (jobs run by other processes) and runs the
+    ``on_start``/``on_done`` callbacks once each.
+
+    Coalesced followers are settled from this process's memory. They are
+    created under a lease held by ``owner``, which the watcher renews every
+    third of ``lease_seconds``; it also fails followers whose lease ran out,
+    left by any API process that exited.
+    """
+
+    def __init__(
+        self, repo: Repository, events: EventBus, poll_seconds: float, lease_seconds: float
+    ) -> None:
+        self._repo = repo
+        self._events = events
+        self._poll = poll_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lease_seconds = lease_seconds
+        self._renewed_at = 0.0
+        self._lock = threading.Lock()
+        self._watches: dict[str, _Watch] = {}
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def watch(
+        self,
+        task: TaskRecord,
+        on_start: TaskCallback | None = None,
+        on_done: TaskCallback | None = None,
+    ) -> None:
+        with self._lock:
+            self._watches[task.task_id] = _Watch(task.status, on_start, on_done)
+
+    def poke(self) -> None:
+        self._wake.set()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._loop, name="task-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self._poll + 1.0)
+
+    def _loop(self) -> None:
+        while not self._stopping.is_set():
+            self._wake.wait(self._poll)
+            self._wake.clear()
+            try:
+                self._check()
+            except Exception:
+                logger.exception("Checking watched tasks failed")
+            if time.monotonic() - self._renewed_at >= self.lease_seconds / 3.0:
+                try:
+                    self.hold_followers()
+                except Exception:
+                    logger.exception("Renewing follower leases failed")
+
+    def hold_followers(self) -> None:
+        """Renew this process's follower leases and fail those abandoned by
+        others."""
+        self._renewed_at = time.monotonic()
+        self._repo.renew_leases(self.owner, self.lease_seconds)
+        orphaned = self._repo.fail_orphaned_tasks("interrupted by a service restart")
+        if orphaned:
+            logger.warning("Failed %d tasks left unfinished by a stopped process", len(orphaned))
+        for task in orphaned:
+            self._events.publish_task(task)
+
+    def _check(self) -> None:
+        with self._lock:
+            task_ids = list(self._watches)
+        for task in self._repo.list_tasks(task_ids):
+            with self._lock:
+                watch = self._watches.get(task.task_id)
+                if watch is None or watch.status == task.status:
+                    continue
+                previous, watch.status = watch.status, task.status
+                if task.status in TERMINAL_STATUSES:
+                    del self._watches[task.task_id]
+            last = self._events.last(task.task_id)
+            if last is None or last["status"] != task.status:
+                self._events.publish_task(task, result=task_result(self._repo, task))
+            if previous == "queued" and watch.on_start is not None:
+                watch.on_start(task)
+            if task.status in TERMINAL_STATUSES and watch.on_done is not None:
+                watch.on_done(task)
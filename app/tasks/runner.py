@@ -1,12 +1,18 @@
 from __future__ import annotations
 
-import asyncio
 import threading
+import time
 from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
+from typing import Any
 
+from app.core import metrics
 from app.core.config import settings
 
+from .scheduler import PRIORITY_BATCH, DeviceScheduler, StartCallback
+
+_EXECUTOR_QUEUE = "executor"
+
 
 @dataclass(frozen=True)
 class TaskHandle:
@@ -15,30 +21,66 @@ class TaskHandle:
 
 
 class TaskRunner:
-    def __init__(self, max_workers: int = 4) -> None:
+    def __init__(
+        self,
+        max_workers: int = 4,
+        device_slots: int | None = None,
+        device_queue_size: int | None = None,
+    ) -> None:
         self._executor = ThreadPoolExecutor(max_workers=max_workers)
-        self._gpu_semaphore = asyncio.Semaphore(settings.max_gpu_tasks)
-        self._loop = None
+        self._device_slots = device_slots if device_slots is not None else settings.max_gpu_tasks
+        self._device_queue_size = (
+            device_queue_size if device_queue_size is not None else settings.device_queue_size
+        )
+        self._schedulers: dict[str, DeviceScheduler] = {}
         self._lock = threading.Lock()
 
-    def set_loop(self, loop: asyncio.AbstractEventLoop) -> None:
-        with self._lock:
-            self._loop = loop
-
-    def submit(self, task_id: str, fn, *args, gpu: bool = False, **kwargs) -> TaskHandle:
-        if gpu:
-            future = self._executor.submit(self._run_gpu, fn, *args, **kwargs)
+    def submit(
+        self,
+        task_id: str,
+        fn,
+        *args,
+        device: str | None = None,
+        priority: int = PRIORITY_BATCH,
+        on_start: StartCallback | None = None,
+        **kwargs,
+    ) -> TaskHandle:
+        if device is not None:
+            future = self.scheduler(device).submit(
+                task_id, fn, *args, priority=priority, on_start=on_start, **kwargs
+            )
         else:
-            future = self._executor.submit(fn, *args, **kwargs)
+            metrics.QUEUE_DEPTH.labels(_EXECUTOR_QUEUE).inc()
+            future = self._executor.submit(
+                self._run_cpu, time.monotonic(), on_start, fn, *args, **kwargs
+            )
         return TaskHandle(task_id=task_id, future=future)
 
-    def _run_gpu(self, fn, *args, **kwargs):
-        if self._loop is None:
-            raise RuntimeError("TaskRunner loop not set")
-        return asyncio.run_coroutine_threadsafe(
-            self._with_gpu(fn, *args, **kwargs), self._loop
-        ).result()
+    def scheduler(self, device: str) -> DeviceScheduler:
+        with self._lock:
+            scheduler = self._schedulers.get(device)
+            if scheduler is None:
+                scheduler = DeviceScheduler(device, self._device_slots, self._device_queue_size)
+                self._schedulers[device] = scheduler
+            return scheduler
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            schedulers = list(self._schedulers.values())
+        return {"devices": [scheduler.stats() for scheduler in schedulers]}
+
+    def shutdown(self) -> None:
+        with self._lock:
+            schedulers = list(self._schedulers.values())
+        for scheduler in schedulers:
+            scheduler.shutdown()
+        self._executor.shutdown(wait=False, cancel_futures=True)
 
-    async def _with_gpu(self, fn, *args, **kwargs):
-        async with self._gpu_semaphore:
-            return fn(*args, **kwargs)
+    @staticmethod
+    def _run_cpu(enqueued_at: float, on_start: StartCallback | None, fn, *args, **kwargs):
+        wait = time.monotonic() - enqueued_at
+        metrics.QUEUE_DEPTH.labels(_EXECUTOR_QUEUE).dec()
+        metrics.QUEUE_WAIT_SECONDS.labels(_EXECUTOR_QUEUE).observe(wait)
+        if on_start is not None:
+            on_start(wait)
+        return fn(*args, **kwargs)
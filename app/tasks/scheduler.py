@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from app.core import metrics
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+# Ahead of any job, so workers stop without running what is still queued.
+_PRIORITY_STOP = -1
+
+StartCallback = Callable[[float], None]
+
+
+class QueueFullError(RuntimeError):
+    pass
+
+
+@dataclass(order=True)
+class _Job:
+    priority: int
+    seq: int
+    task_id: str = field(compare=False)
+    fn: Callable[..., Any] | None = field(compare=False)
+    args: tuple = field(compare=False, default=())
+    kwargs: dict = field(compare=False, default_factory=dict)
+    future: Future = field(compare=False, default_factory=Future)
+    on_start: StartCallback | None = field(compare=False, default=None)
+    enqueued_at: float = field(compare=False, default_factory=time.monotonic)
+
+
+class DeviceScheduler:
+    """Runs device-bound jobs on dedicated worker threads, one per device slot.
+
+    Jobs wait in a bounded priority queue; lower priority values run first and
+    equal priorities run in submission order. ``shutdown`` cancels the jobs
+    still queued and waits only for those running.
+    """
+
+    def __init__(self, device: str, slots: int, max_queue: int) -> None:
+        self.device = device
+        self._slots = max(1, slots)
+        self._queue: queue.PriorityQueue[_Job] = queue.PriorityQueue(maxsize=max_queue)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._busy = 0
+        self._completed = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._queue_depth = metrics.QUEUE_DEPTH.labels(device)
+        self._queue_wait = metrics.QUEUE_WAIT_SECONDS.labels(device)
+        self._slots_busy = metrics.DEVICE_SLOTS_BUSY.labels(device)
+        self._busy_seconds = metrics.DEVICE_BUSY_SECONDS.labels(device)
+        metrics.DEVICE_SLOTS.labels(device).set(self._slots)
+        self._workers = [
+            threading.Thread(target=self._work, name=f"device-{device}-{index}", daemon=True)
+            for index in range(self._slots)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(
+        self,
+        task_id: str,
+        fn: Callable[..., Any],
+        *args,
+        priority: int = PRIORITY_BATCH,
+        on_start: StartCallback | None = None,
+        **kwargs,
+    ) -> Future:
+        if self._stopping.is_set():
+            raise RuntimeError(f"Device scheduler for {self.device} is shut down")
+        job = _Job(
+            priority=priority,
+            seq=next(self._seq),
+            task_id=task_id,
+            fn=fn,
+            args=args,
+            kwargs=kwargs,
+            on_start=on_start,
+        )
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            raise QueueFullError(f"Device queue for {self.device} is full") from None
+        self._queue_depth.inc()
+        return job.future
+
+    def call(self, fn: Callable[..., Any], *args, priority: int = PRIORITY_BATCH, **kwargs) -> Any:
+        """Run ``fn`` in a device slot and block until it returns."""
+        return self.submit("", fn, *args, priority=priority, **kwargs).result()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            completed = self._completed
+            return {
+                "device": self.device,
+                "slots": self._slots,
+                "busy": self._busy,
+                "queued": self._queue.qsize(),
+                "completed": completed,
+                "queue_wait_avg_ms": (self._wait_total / completed * 1000.0) if completed else 0.0,
+                "queue_wait_max_ms": self._wait_max * 1000.0,
+            }
+
+    def shutdown(self) -> None:
+        self._stopping.set()
+        self._cancel_queued()
+        for _ in self._workers:
+            stop = _Job(priority=_PRIORITY_STOP, seq=next(self._seq), task_id="", fn=None)
+            while True:
+                try:
+                    self._queue.put_nowait(stop)
+                    break
+                except queue.Full:
+                    # A submit that raced the flag filled the space back up.
+                    self._cancel_queued()
+        for worker in self._workers:
+            worker.join()
+
+    def _cancel_queued(self) -> None:
+        stops = []
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job.fn is None:
+                stops.append(job)
+                continue
+            self._queue_depth.dec()
+            job.future.cancel()
+        # Stop jobs already queued go back in the space they took.
+        for job in stops:
+            self._queue.put_nowait(job)
+
+    def _work(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job.fn is None:
+                return
+            self._queue_depth.dec()
+            if self._stopping.is_set():
+                job.future.cancel()
+                continue
+            if not job.future.set_running_or_notify_cancel():
+                continue
+            started = time.monotonic()
+            wait = started - job.enqueued_at
+            self._queue_wait.observe(wait)
+            self._slots_busy.inc()
+            with self._lock:
+                self._busy += 1
+                self._wait_total += wait
+                self._wait_max = max(self._wait_max, wait)
+            try:
+                if job.on_start is not None:
+                    job.on_start(wait)
+                result = job.fn(*job.args, **job.kwargs)
+            except BaseException as exc:
+                job.future.set_exception(exc)
+            else:
+                job.future.set_result(result)
+            finally:
+                self._slots_busy.dec()
+                self._busy_seconds.inc(time.monotonic() - started)
+                with self._lock:
+                    self._busy -= 1
+                    self._completed += 1
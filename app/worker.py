@@ -0,0 +1,42 @@
+"""Standalone job worker: ``python -m app.worker``.
+
+Runs queued predict/render jobs from the shared database, next to or instead
+of the worker embedded in the API process (``EMBEDDED_WORKER``). Every worker
+needs the same ``DATA_DIR`` and ``DB_PATH`` as the API.
+"""
+
+from __future__ import annotations
+
+import logging
+import signal
+import threading
+
+from app.state import AppState
+
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+    state = AppState()
+    stopping = threading.Event()
+
+    def _stop(signum: int, _frame) -> None:
+        logger.info("Received %s, stopping", signal.Signals(signum).name)
+        stopping.set()
+
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGTERM, _stop)
+    state.start_worker()
+    try:
+        while not stopping.wait(1.0):
+            pass
+    finally:
+        state.stop_worker()
+        state.repo.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Forward-pass latency and throughput of the predictor at each batch size.
+
+Usage: python -m benchmarks.batching --device cuda --max-batch 8 --repeats 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+
+os.environ.setdefault("API_KEY", "benchmark")
+
+import torch  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.services.predictor import INTERNAL_SHAPE, PredictorManager, resolve_device  # noqa: E402
+
+
+def _sync(device: torch.device) -> None:
+    if device.type == "cuda":
+        torch.cuda.synchronize(device)
+
+
+@torch.no_grad()
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--device", default=None)
+    parser.add_argument("--model-path", default=settings.model_path)
+    parser.add_argument("--max-batch", type=int, default=settings.predict_max_batch)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    device = resolve_device(args.device)
+    predictor = PredictorManager(args.model_path).get_predictor(device)
+    height, width = INTERNAL_SHAPE[1], INTERNAL_SHAPE[0]
+
+    results = []
+    for batch_size in range(1, args.max_batch + 1):
+        images = torch.rand(batch_size, 3, height, width, device=device)
+        disparity = torch.full((batch_size,), 0.8, device=device)
+        predictor(images, disparity)
+        _sync(device)
+        timings = []
+        for _ in range(args.repeats):
+            started = time.perf_counter()
+            predictor(images, disparity)
+            _sync(device)
+            timings.append(time.perf_counter() - started)
+        mean = sum(timings) / len(timings)
+        results.append(
+            {
+                "batch_size": batch_size,
+                "batch_latency_ms": mean * 1000.0,
+                "per_item_ms": mean / batch_size * 1000.0,
+                "items_per_second": batch_size / mean,
+            }
+        )
+    print(json.dumps({"device": str(device), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Predict throughput of the CPU worker pool from 1 to N workers.
+
+For each worker count the pool is started fresh, warmed up, and fed
+``--jobs`` full predict jobs (decode, forward, unproject, PLY write) at once.
+Reports images/s, speedup over the first worker count and worker memory:
+summed RSS counts shared weight pages once per worker, summed PSS splits them,
+so PSS staying flat as workers grow shows the weights are shared.
+
+Usage: python -m benchmarks.cpu_pool_scaling --image photo.jpg --workers 1,2,4,8 --jobs 32
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault("API_KEY", "benchmark")
+
+from app.services.cpu_pool import CpuInferencePool  # noqa: E402
+from app.services.inference import InferenceMode  # noqa: E402
+from app.services.predictor import predict_job  # noqa: E402
+
+
+def _memory_mb(pids: list[int]) -> dict[str, float]:
+    totals = {"rss_mb": 0.0, "pss_mb": 0.0}
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/smaps_rollup") as f:
+                for line in f:
+                    name, value = line.split(":", 1)
+                    if name in ("Rss", "Pss"):
+                        totals[f"{name.lower()}_mb"] += int(value.split()[0]) / 1024
+        except OSError:
+            pass
+    return totals
+
+
+def _run(args, workers: int, work_dir: Path) -> dict[str, float]:
+    pool = CpuInferencePool(
+        workers,
+        args.model,
+        threads_per_worker=args.threads,
+        mode=InferenceMode.from_name(args.mode),
+        warmup=True,
+    )
+    pool.start()
+    try:
+        while not pool.ready():
+            if pool.error:
+                raise RuntimeError(pool.error)
+            time.sleep(0.1)
+        started = time.perf_counter()
+        futures = [
+            pool.submit(predict_job, args.image, str(work_dir / f"{workers}-{index}.ply"))
+            for index in range(args.jobs)
+        ]
+        for future in futures:
+            future.result()
+        elapsed = time.perf_counter() - started
+        return {
+            "workers": workers,
+            "seconds": elapsed,
+            "images_per_second": args.jobs / elapsed,
+            **_memory_mb(pool.pids()),
+        }
+    finally:
+        pool.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="models/sharp_2572gikvuh.pt")
+    parser.add_argument("--image", required=True)
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--jobs", type=int, default=16)
+    parser.add_argument("--threads", type=int, default=0, help="per worker, 0 = its core count")
+    parser.add_argument("--mode", default="fp32")
+    args = parser.parse_args()
+
+    work_dir = Path(tempfile.mkdtemp(prefix="cpu-pool-"))
+    try:
+        results = [_run(args, int(count), work_dir) for count in args.workers.split(",")]
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    for result in results:
+        result["speedup"] = result["images_per_second"] / results[0]["images_per_second"]
+    print(json.dumps({"cpu_count": os.cpu_count(), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Frames per second of the CPU renderer across core counts.
+
+Renders ``--frames`` frames of a trajectory from a prediction (``--ply``) or a
+synthetic scene of ``--gaussians`` splats at ``--scale`` times its resolution.
+For each thread count the process is pinned to that many cores, so the
+speedup over the first count shows how well rendering frames concurrently
+scales.
+
+Usage: python -m benchmarks.cpu_render --ply gaussians.ply --threads 1,2,4,8 --scale 0.5
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+
+os.environ.setdefault("API_KEY", "benchmark")
+
+import torch  # noqa: E402
+from sharp.utils import camera  # noqa: E402
+from sharp.utils.gaussians import Gaussians3D, SceneMetaData, load_ply  # noqa: E402
+
+from app.services.cpu_render import CpuScene  # noqa: E402
+from app.services.renderer import iter_cpu_frames, trajectory_cameras  # noqa: E402
+
+
+def _synthetic(count: int) -> tuple[Gaussians3D, SceneMetaData]:
+    """About one gaussian per input pixel on two depth layers, like a prediction."""
+    width, height = 1536, 1152
+    generator = torch.Generator().manual_seed(0)
+    xy = torch.rand(1, count, 2, generator=generator) - 0.5
+    z = torch.where(torch.rand(1, count, 1, generator=generator) < 0.5, 2.0, 5.0)
+    z = z + torch.rand(1, count, 1, generator=generator)
+    pixel_m = z / 1400.0
+    gaussians = Gaussians3D(
+        mean_vectors=torch.cat([xy * torch.tensor([width, height]) * pixel_m, z], dim=-1),
+        singular_values=pixel_m * torch.exp(torch.randn(1, count, 3, generator=generator) * 0.3),
+        quaternions=torch.nn.functional.normalize(
+            torch.randn(1, count, 4, generator=generator), dim=-1
+        ),
+        colors=torch.rand(1, count, 3, generator=generator),
+        opacities=torch.rand(1, count, generator=generator),
+    )
+    return gaussians, SceneMetaData(1400.0, (width, height), "sRGB")
+
+
+def _cores() -> list[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ply", help="prediction to render instead of a synthetic scene")
+    parser.add_argument("--gaussians", type=int, default=2 * 768 * 768)
+    parser.add_argument("--threads", default="1,2,4")
+    parser.add_argument("--frames", type=int, default=16)
+    parser.add_argument("--scale", type=float, default=0.5)
+    parser.add_argument("--tile", type=int, default=64)
+    args = parser.parse_args()
+
+    if args.ply:
+        gaussians, metadata = load_ply(Path(args.ply))
+    else:
+        gaussians, metadata = _synthetic(args.gaussians)
+    trajectory = camera.TrajectoryParams()
+    trajectory.num_steps = args.frames
+    trajectory.num_repeats = 1
+    cameras = trajectory_cameras(
+        gaussians, metadata, trajectory, args.scale, torch.device("cpu")
+    )[: args.frames]
+    scene = CpuScene.from_gaussians(gaussians)
+
+    cores = _cores()
+    pinnable = hasattr(os, "sched_setaffinity")
+    results = []
+    try:
+        for threads in (int(value) for value in args.threads.split(",")):
+            if pinnable:
+                os.sched_setaffinity(0, cores[: min(threads, len(cores))])
+            started = time.perf_counter()
+            for _ in iter_cpu_frames(
+                scene, cameras, metadata.color_space, threads=threads, tile_size=args.tile
+            ):
+                pass
+            elapsed = time.perf_counter() - started
+            results.append(
+                {
+                    "threads": threads,
+                    "cores": min(threads, len(cores)) if pinnable else len(cores),
+                    "seconds": elapsed,
+                    "fps": len(cameras) / elapsed,
+                }
+            )
+    finally:
+        if pinnable:
+            os.sched_setaffinity(0, cores)
+    for result in results:
+        result["speedup"] = result["fps"] / results[0]["fps"]
+    print(
+        json.dumps(
+            {
+                "cpu_count": len(cores),
+                "gaussians": scene.count,
+                "resolution": [cameras[0].width, cameras[0].height],
+                "frames": len(cameras),
+                "results": results,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Task-status polling throughput while workers write task updates.
+
+Runs reader threads calling ``get_task`` in a loop alongside writer threads
+that create tasks and move them through queued/running/completed, once with
+the pooled WAL repository and once with a connection per call in rollback
+journal mode (the previous behaviour).
+
+Usage: python -m benchmarks.db_polling --readers 8 --writers 4 --seconds 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+os.environ.setdefault("API_KEY", "benchmark")
+
+from app.db.repo import Repository  # noqa: E402
+
+
+class _ConnectPerCallRepository(Repository):
+    def __init__(self, db_path: str) -> None:
+        super().__init__(db_path)
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("PRAGMA journal_mode=DELETE")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+
+def _run(repo: Repository, readers: int, writers: int, seconds: float) -> dict[str, float]:
+    file_id = uuid.uuid4().hex
+    repo.create_file(file_id=file_id, original_name="bench.jpg", original_path="/dev/null")
+    task_ids = [uuid.uuid4().hex for _ in range(64)]
+    for task_id in task_ids:
+        repo.create_task(task_id=task_id, task_type="predict", file_id=file_id)
+
+    stop = threading.Event()
+    reads = [0] * readers
+    writes = [0] * writers
+    errors = [0]
+
+    def read(index: int) -> None:
+        while not stop.is_set():
+            try:
+                repo.get_task(task_ids[reads[index] % len(task_ids)])
+                reads[index] += 1
+            except sqlite3.OperationalError:
+                errors[0] += 1
+
+    def write(index: int) -> None:
+        while not stop.is_set():
+            task_id = uuid.uuid4().hex
+            try:
+                repo.create_task(task_id=task_id, task_type="predict", file_id=file_id)
+                repo.update_task(task_id, "running", queue_wait_ms=1.0)
+                repo.complete_task(task_id, file_id, gaussians_path="/dev/null")
+                writes[index] += 3
+            except sqlite3.OperationalError:
+                errors[0] += 1
+
+    threads = [threading.Thread(target=read, args=(i,)) for i in range(readers)]
+    threads += [threading.Thread(target=write, args=(i,)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return {
+        "reads_per_second": sum(reads) / seconds,
+        "writes_per_second": sum(writes) / seconds,
+        "errors": errors[0],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, factory in (
+            ("connect_per_call", _ConnectPerCallRepository),
+            ("pooled_wal", Repository),
+        ):
+            repo = factory(str(Path(tmp) / f"{name}.db"))
+            results[name] = _run(repo, args.readers, args.writers, args.seconds)
+            repo.close()
+    print(
+        json.dumps(
+            {"readers": args.readers, "writers": args.writers, "results": results}, indent=2
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
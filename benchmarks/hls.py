@@ -0,0 +1,142 @@
+"""Size and encode time of the HLS stream across encoder settings.
+
+Feeds the frames of a trajectory through the same ffmpeg command a render
+uses, once per ``--crf`` x ``--preset`` combination, and reports the encode
+rate, the time until the first segment is listed in the playlist (when
+playback can start) and the bytes written. Frames are rendered once up front
+from a prediction (``--ply``, on the CPU at ``--scale``) or, without one, are
+a synthetic pan across a noise texture.
+
+Usage: python -m benchmarks.hls --ply gaussians.ply --crf 18,23,28 --preset ultrafast,medium
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault("API_KEY", "benchmark")
+
+import numpy as np  # noqa: E402
+import torch  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.services.encoder import FPS, HLS_PLAYLIST, HlsParams, hls_command  # noqa: E402
+
+
+def _synthetic(frames: int, width: int, height: int) -> list[np.ndarray]:
+    generator = np.random.default_rng(0)
+    texture = generator.integers(0, 256, (height, width * 2, 3), dtype=np.uint8)
+    # Blur so the texture compresses like a photo rather than like noise.
+    texture = (texture.astype(np.uint16) + np.roll(texture, 1, 1) + np.roll(texture, 1, 0)) // 3
+    texture = texture.astype(np.uint8)
+    return [
+        np.ascontiguousarray(texture[:, index * width // frames :][:, :width])
+        for index in range(frames)
+    ]
+
+
+def _rendered(ply: Path, frames: int, scale: float) -> list[np.ndarray]:
+    from sharp.utils import camera
+    from sharp.utils.gaussians import load_ply
+
+    from app.services.cpu_render import CpuScene
+    from app.services.renderer import cpu_render_threads, iter_cpu_frames, trajectory_cameras
+
+    gaussians, metadata = load_ply(ply)
+    trajectory = camera.TrajectoryParams()
+    trajectory.num_steps = frames
+    trajectory.num_repeats = 1
+    cameras = trajectory_cameras(gaussians, metadata, trajectory, scale, torch.device("cpu"))
+    return [
+        color.numpy()
+        for color, _ in iter_cpu_frames(
+            CpuScene.from_gaussians(gaussians),
+            cameras[:frames],
+            metadata.color_space,
+            threads=cpu_render_threads(),
+            tile_size=settings.cpu_render_tile,
+        )
+    ]
+
+
+def _encode(frames: list[np.ndarray], params: HlsParams) -> dict[str, float | int | None]:
+    height, width, _ = frames[0].shape
+    with tempfile.TemporaryDirectory() as tmp:
+        hls_dir = Path(tmp)
+        started = time.perf_counter()
+        first_segment = None
+        process = subprocess.Popen(
+            hls_command(hls_dir, width, height, params), stdin=subprocess.PIPE
+        )
+        playlist = hls_dir / HLS_PLAYLIST
+        for frame in frames:
+            process.stdin.write(frame.tobytes())
+            if first_segment is None and playlist.exists():
+                first_segment = time.perf_counter() - started
+        process.stdin.close()
+        # ffmpeg may still be encoding the first segment after the last write.
+        while first_segment is None and process.poll() is None:
+            if playlist.exists():
+                first_segment = time.perf_counter() - started
+            time.sleep(0.005)
+        if process.wait() != 0:
+            raise RuntimeError(f"ffmpeg exited with {process.returncode}")
+        elapsed = time.perf_counter() - started
+        size = sum(path.stat().st_size for path in hls_dir.iterdir())
+        segments = len(list(hls_dir.glob("seg_*.m4s")))
+    return {
+        "crf": params.crf,
+        "preset": params.preset,
+        "seconds": elapsed,
+        "encode_fps": len(frames) / elapsed,
+        "first_segment_seconds": first_segment,
+        "segments": segments,
+        "bytes": size,
+        "kbps": size * 8 / 1000 / (len(frames) / FPS),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ply", help="prediction to render instead of synthetic frames")
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--scale", type=float, default=0.5)
+    parser.add_argument("--width", type=int, default=768, help="synthetic frame width")
+    parser.add_argument("--height", type=int, default=576, help="synthetic frame height")
+    parser.add_argument("--crf", default="18,23,28")
+    parser.add_argument("--preset", default="ultrafast,veryfast,medium")
+    parser.add_argument("--output-height", type=int, help="scale the stream to this height")
+    parser.add_argument("--segment-seconds", type=float, default=settings.hls_segment_seconds)
+    args = parser.parse_args()
+
+    if args.ply:
+        frames = _rendered(Path(args.ply), args.frames, args.scale)
+    else:
+        frames = _synthetic(args.frames, args.width, args.height)
+    results = [
+        _encode(frames, HlsParams(int(crf), preset, args.output_height, args.segment_seconds))
+        for crf in args.crf.split(",")
+        for preset in args.preset.split(",")
+    ]
+    print(
+        json.dumps(
+            {
+                "frames": len(frames),
+                "resolution": [frames[0].shape[1], frames[0].shape[0]],
+                "output_height": args.output_height,
+                "segment_seconds": args.segment_seconds,
+                "results": results,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
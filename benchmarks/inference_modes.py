@@ -0,0 +1,109 @@
+"""Latency of each inference mode and accuracy of its gaussians against fp32.
+
+Every mode runs the full predict path (prepare, forward, unproject) on the same
+image. Accuracy is the mean absolute error of each gaussian attribute relative
+to the mean magnitude of the fp32 output; quaternions are compared by
+1 - |dot|, which ignores the sign ambiguity. The script exits non-zero when a
+mode exceeds ``--tolerance``.
+
+Usage: python -m benchmarks.inference_modes --device cpu --threads 16 \\
+    --modes fp32,fp32+channels_last,bf16,bf16+channels_last,bf16+compile
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault("API_KEY", "benchmark")
+
+import numpy as np  # noqa: E402
+import torch  # noqa: E402
+
+from app.services.inference import InferenceMode  # noqa: E402
+from app.services.predictor import PredictorManager, _synchronize, predict_image  # noqa: E402
+
+
+def _load_image(path: str | None) -> tuple[np.ndarray, float]:
+    if path is None:
+        rng = np.random.default_rng(0)
+        image = rng.integers(0, 256, size=(1024, 1536, 3), dtype=np.uint8)
+        return image, 1536.0
+    from sharp.utils import io
+
+    image, _, f_px = io.load_rgb(path)
+    return image, f_px
+
+
+def _compare(reference, candidate) -> dict[str, float]:
+    report = {}
+    for field in ("mean_vectors", "singular_values", "colors", "opacities"):
+        ref = getattr(reference, field).float()
+        out = getattr(candidate, field).float()
+        scale = ref.abs().mean().clamp_min(1e-12)
+        report[f"{field}_rel_err"] = float((out - ref).abs().mean() / scale)
+    ref_q = torch.nn.functional.normalize(reference.quaternions.float(), dim=-1)
+    out_q = torch.nn.functional.normalize(candidate.quaternions.float(), dim=-1)
+    report["quaternions_err"] = float((1.0 - (ref_q * out_q).sum(-1).abs()).clamp_min(0).mean())
+    return report
+
+
+def _run_mode(args, mode: InferenceMode, image: np.ndarray, f_px: float):
+    device = torch.device(args.device)
+    manager = PredictorManager(args.model, mode=mode)
+    load = manager.preload(device, warmup=True)
+    predictor = manager.get_predictor(device)
+    latencies = []
+    for _ in range(args.repeats):
+        started = time.perf_counter()
+        gaussians = predict_image(predictor, image, f_px, device, mode)
+        _synchronize(device)
+        latencies.append((time.perf_counter() - started) * 1000.0)
+    latencies.sort()
+    stats = {
+        "warmup_ms": load["warmup_ms"],
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        "min_ms": latencies[0],
+    }
+    return gaussians, stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="models/sharp_2572gikvuh.pt")
+    parser.add_argument("--image", default=None, help="defaults to a fixed random image")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--modes", default="fp32,fp32+channels_last,bf16,bf16+channels_last")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=0, help="intra-op threads, 0 = default")
+    parser.add_argument("--tolerance", type=float, default=0.05)
+    args = parser.parse_args()
+
+    if args.threads > 0:
+        torch.set_num_threads(args.threads)
+    image, f_px = _load_image(args.image)
+    torch.manual_seed(0)
+    reference, _ = _run_mode(args, InferenceMode(), image, f_px)
+
+    report = {"device": args.device, "threads": torch.get_num_threads(), "modes": {}}
+    failed = []
+    for name in args.modes.split(","):
+        mode = InferenceMode.from_name(name)
+        torch.manual_seed(0)
+        gaussians, stats = _run_mode(args, mode, image, f_px)
+        accuracy = _compare(reference, gaussians)
+        report["modes"][mode.name] = {**stats, **accuracy}
+        if max(accuracy.values()) > args.tolerance:
+            failed.append(mode.name)
+    report["failed"] = failed
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
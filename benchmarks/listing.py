@@ -0,0 +1,214 @@
+"""Per-page latency of task and file listings at increasing depth.
+
+Fills a database with ``--rows`` tasks and ``--files`` files, then for several
+filters fetches one page at a given depth (fraction of the matching rows
+already paged through) with the keyset query behind ``GET /v1/tasks`` and
+``GET /v1/files`` and with the equivalent OFFSET query. Keyset pages cost the
+same at any depth; OFFSET pages grow with it.
+
+Usage: python -m benchmarks.listing --rows 1000000 --depths 0,0.5,0.99
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+os.environ.setdefault("API_KEY", "benchmark")
+
+from app.db.repo import Repository, _keyset_page  # noqa: E402
+from app.db.schema import FileRecord, TaskRecord  # noqa: E402
+
+_STATUSES = (("completed", 0.90), ("failed", 0.08), ("queued", 0.01), ("running", 0.01))
+_TASK_TYPES = (("predict", 0.7), ("render", 0.3))
+_START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+_INSERT_CHUNK = 50_000
+
+
+def _choose(rng: random.Random, weighted: tuple[tuple[str, float], ...]) -> str:
+    return rng.choices([value for value, _ in weighted], [weight for _, weight in weighted])[0]
+
+
+def _timestamp(index: int, spacing_ms: float) -> str:
+    return (_START + timedelta(milliseconds=index * spacing_ms)).isoformat()
+
+
+def _populate(db_path: str, rows: int, files: int, seed: int) -> None:
+    rng = random.Random(seed)
+    file_ids = [uuid.uuid4().hex for _ in range(files)]
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.executemany(
+            """
+            INSERT INTO files (
+                file_id, original_name, original_path, gaussians_path,
+                render_path, render_depth_path, created_at, updated_at
+            ) VALUES (?, 'bench.jpg', '/dev/null', NULL, NULL, NULL, ?, ?)
+            """,
+            (
+                (file_id, _timestamp(i, 2.0), _timestamp(i, 2.0))
+                for i, file_id in enumerate(file_ids)
+            ),
+        )
+    for start in range(0, rows, _INSERT_CHUNK):
+        batch = []
+        for i in range(start, min(rows, start + _INSERT_CHUNK)):
+            created = _timestamp(i, 1.0)
+            batch.append(
+                (
+                    uuid.uuid4().hex,
+                    _choose(rng, _TASK_TYPES),
+                    _choose(rng, _STATUSES),
+                    rng.choice(file_ids),
+                    created,
+                    created,
+                )
+            )
+        with conn:
+            conn.executemany(
+                """
+                INSERT INTO tasks (
+                    task_id, task_type, status, error, file_id, created_at, updated_at
+                ) VALUES (?, ?, ?, NULL, ?, ?, ?)
+                """,
+                batch,
+            )
+    conn.close()
+
+
+def _median_ms(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000.0)
+    return statistics.median(samples)
+
+
+def _bench(
+    repo: Repository,
+    table: str,
+    id_column: str,
+    filters: dict[str, str | None],
+    created_after: str | None,
+    created_before: str | None,
+    depths: list[float],
+    page_size: int,
+    repeat: int,
+) -> dict:
+    record_type = TaskRecord if table == "tasks" else FileRecord
+    conn = repo._connect()
+    sql, params = _keyset_page(
+        table, id_column, filters, created_after, created_before, None, page_size
+    )
+    count_sql = sql.replace("SELECT *", "SELECT COUNT(*)").split(" ORDER BY")[0]
+    matching = conn.execute(count_sql, params[:-1]).fetchone()[0]
+
+    def keyset(after: tuple[str, str] | None) -> list:
+        if table == "tasks":
+            return repo.page_tasks(
+                page_size,
+                status=filters.get("status"),
+                task_type=filters.get("task_type"),
+                created_after=created_after,
+                created_before=created_before,
+                after=after,
+            )
+        return repo.page_files(
+            page_size, created_after=created_after, created_before=created_before, after=after
+        )
+
+    def offset(skip: int) -> list:
+        rows = conn.execute(sql + " OFFSET ?", [*params, skip]).fetchall()
+        return [record_type(**dict(row)) for row in rows]
+
+    results = []
+    for depth in depths:
+        skip = min(int(depth * matching), max(0, matching - page_size))
+        after = None
+        if skip:
+            # The last row of the previous page; found once, outside the timing.
+            row = conn.execute(
+                sql.replace("SELECT *", f"SELECT created_at, {id_column}") + " OFFSET ?",
+                [*params[:-1], 1, skip - 1],
+            ).fetchone()
+            after = (row[0], row[1])
+        keyset_page = keyset(after)
+        offset_page = offset(skip)
+        assert [getattr(r, id_column) for r in keyset_page] == [
+            getattr(r, id_column) for r in offset_page
+        ], "keyset and OFFSET pages differ"
+        results.append(
+            {
+                "depth": depth,
+                "rows_skipped": skip,
+                "keyset_ms": _median_ms(lambda: keyset(after), repeat),
+                "offset_ms": _median_ms(lambda: offset(skip), repeat),
+            }
+        )
+    plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+    return {"matching_rows": matching, "plan": plan, "pages": results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000, help="tasks to insert")
+    parser.add_argument("--files", type=int, default=0, help="files to insert (default rows/2)")
+    parser.add_argument("--depths", default="0,0.1,0.5,0.9,0.99")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--db", help="reuse or create this database instead of a temporary one")
+    args = parser.parse_args()
+    depths = [float(value) for value in args.depths.split(",")]
+    files = args.files or max(1, args.rows // 2)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or str(Path(tmp) / "listing.db")
+        fresh = not Path(db_path).exists()
+        repo = Repository(db_path)
+        if fresh:
+            started = time.perf_counter()
+            _populate(db_path, args.rows, files, args.seed)
+            elapsed = time.perf_counter() - started
+            print(f"inserted {args.rows} tasks and {files} files in {elapsed:.1f}s", flush=True)
+        middle = (_timestamp(args.rows // 4, 1.0), _timestamp(3 * args.rows // 4, 1.0))
+        scenarios = {
+            "tasks": ("tasks", "task_id", {}, None, None),
+            "tasks?status=completed": ("tasks", "task_id", {"status": "completed"}, None, None),
+            "tasks?status=failed": ("tasks", "task_id", {"status": "failed"}, None, None),
+            "tasks?task_type=render": ("tasks", "task_id", {"task_type": "render"}, None, None),
+            "tasks?status=failed&task_type=render": (
+                "tasks",
+                "task_id",
+                {"status": "failed", "task_type": "render"},
+                None,
+                None,
+            ),
+            "tasks?created_after&created_before": ("tasks", "task_id", {}, *middle),
+            "files": ("files", "file_id", {}, None, None),
+        }
+        results = {
+            name: _bench(repo, *scenario, depths, args.page_size, args.repeat)
+            for name, scenario in scenarios.items()
+        }
+        repo.close()
+    print(
+        json.dumps(
+            {"rows": args.rows, "files": files, "page_size": args.page_size, "results": results},
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,459 @@
+"""End-to-end load harness: boots app.main:app with stand-in services and
+replays a request mix against it over HTTP.
+
+The predictor and renderer are replaced by ``benchmarks.stubs`` so the run
+needs neither a GPU nor the sharp weights; everything else is the real
+service. Requests are sent open-loop at ``--rate`` per second (or at the
+``t`` offsets recorded in the trace), then tasks are drained. The report has
+p50/p95/p99 latency per endpoint, per task type queue wait and end-to-end
+time, task completion throughput and SQLite operations per second, and is
+written as JSON; ``--baseline`` prints the change against an earlier report.
+
+A trace is JSONL with one request per line, e.g. ``{"op": "predict"}``,
+``{"op": "render", "num_steps": 30}``, ``{"op": "task"}``, optionally with
+``"t": <seconds>``. Ops: predict, render, task, file, gaussians, splat, stats.
+``{"op": "predict", "repeat": true}`` re-uploads an earlier image (predict
+cache hit); ``{"op": "render", "cached": true}`` repeats default parameters.
+
+Service settings come from the environment as usual (TASK_WORKERS,
+PREDICT_MAX_BATCH, MAX_GPU_TASKS, ...).
+
+Usage: python -m benchmarks.load --trace benchmarks/traces/mixed.jsonl --rate 20 --duration 60
+       python -m benchmarks.load --mix predict=2,render=1,task=10,file=1 --rate 50 --out run.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import itertools
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+_OWN_DATA_DIR = "DATA_DIR" not in os.environ
+os.environ.setdefault("API_KEY", "benchmark")
+if _OWN_DATA_DIR:
+    os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="mlsharp-load-")
+os.environ.setdefault("DB_PATH", os.path.join(os.environ["DATA_DIR"], "mlsharp.db"))
+os.environ.setdefault("DEVICE_DEFAULT", "cpu")
+os.environ.setdefault("PRELOAD_MODEL", "false")
+os.environ.setdefault("CPU_WORKERS", "0")
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from app import main as app_main  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from benchmarks.stubs import StubPredictorManager, StubRenderService  # noqa: E402
+
+OPS = ("predict", "render", "task", "file", "gaussians", "splat", "stats")
+TERMINAL = {"completed", "failed"}
+
+
+def percentile(values: list[float], q: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(q / 100.0 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def summarize(values: list[float]) -> dict[str, float | int | None]:
+    return {
+        "count": len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "mean": sum(values) / len(values) if values else None,
+        "max": max(values) if values else None,
+    }
+
+
+def load_trace(path: str) -> list[dict]:
+    with open(path) as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    for entry in entries:
+        if entry.get("op") not in OPS:
+            raise SystemExit(f"unknown op in trace: {entry}")
+    return entries
+
+
+def mix_trace(mix: str, count: int, rng: random.Random) -> list[dict]:
+    weights = {}
+    for part in mix.split(","):
+        op, _, weight = part.partition("=")
+        if op not in OPS:
+            raise SystemExit(f"unknown op in mix: {op}")
+        weights[op] = float(weight or 1)
+    ops = rng.choices(list(weights), weights=list(weights.values()), k=count)
+    return [{"op": op} for op in ops]
+
+
+def _jpeg(width: int, height: int, rng: random.Random) -> bytes:
+    noise = bytes(rng.getrandbits(8) for _ in range(64 * 64 * 3))
+    image = Image.frombytes("RGB", (64, 64), noise).resize((width, height))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).resolve().parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Harness:
+    def __init__(self, args: argparse.Namespace, client: httpx.AsyncClient) -> None:
+        self.args = args
+        self.client = client
+        self.rng = random.Random(args.seed)
+        self.image = _jpeg(*args.image_size, self.rng)
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.statuses: dict[str, dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.tasks: list[str] = []
+        self.seed_tasks: list[str] = []
+        self.files: list[str] = []
+        self.uploads: list[bytes] = []
+
+    async def request(self, name: str, method: str, url: str, **kwargs) -> httpx.Response | None:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.statuses[name][-1] += 1
+            return None
+        self.latencies[name].append((time.perf_counter() - started) * 1000.0)
+        self.statuses[name][response.status_code] += 1
+        return response
+
+    async def run_op(self, entry: dict) -> None:
+        op = entry["op"]
+        if op == "predict":
+            if entry.get("repeat") and self.uploads:
+                payload = self.rng.choice(self.uploads)
+            else:
+                # Trailing bytes after the JPEG end marker make each upload unique
+                # without changing the decoded image.
+                payload = self.image + os.urandom(16)
+                self.uploads.append(payload)
+            response = await self.request(
+                "POST /v1/predict",
+                "POST",
+                "/v1/predict",
+                files={"upload": ("load.jpg", payload, "image/jpeg")},
+            )
+            if response is not None and response.status_code == 200:
+                self.tasks.append(response.json()["task_id"])
+        elif op == "render":
+            body = {"file_id": self.rng.choice(self.files)}
+            if not entry.get("cached"):
+                body["num_steps"] = entry.get("num_steps", self.rng.randint(10, 60))
+            response = await self.request("POST /v1/render", "POST", "/v1/render", json=body)
+            if response is not None and response.status_code == 200:
+                self.tasks.append(response.json()["task_id"])
+        elif op == "task":
+            task_id = self.rng.choice(self.tasks or self.seed_tasks)
+            await self.request("GET /v1/tasks/{id}", "GET", f"/v1/tasks/{task_id}")
+        elif op == "file":
+            file_id = self.rng.choice(self.files)
+            await self.request("GET /v1/files/{id}", "GET", f"/v1/files/{file_id}")
+        elif op == "gaussians":
+            file_id = self.rng.choice(self.files)
+            await self.request(
+                "GET /v1/files/{id}/gaussians", "GET", f"/v1/files/{file_id}/gaussians"
+            )
+        elif op == "splat":
+            file_id = self.rng.choice(self.files)
+            await self.request(
+                "GET /v1/files/{id}/gaussians.splat",
+                "GET",
+                f"/v1/files/{file_id}/gaussians.splat",
+            )
+        elif op == "stats":
+            await self.request("GET /v1/stats", "GET", "/v1/stats")
+
+    async def seed(self, count: int) -> None:
+        """Create files with gaussians for render and download ops; not measured."""
+        repo = app_main.state.repo
+        for _ in range(count):
+            response = await self.client.post(
+                "/v1/predict",
+                files={"upload": ("seed.jpg", self.image + os.urandom(16), "image/jpeg")},
+            )
+            response.raise_for_status()
+            body = response.json()
+            while repo.get_task(body["task_id"]).status not in TERMINAL:
+                await asyncio.sleep(0.05)
+            if repo.get_task(body["task_id"]).status != "completed":
+                raise SystemExit(f"seed predict failed: {repo.get_task(body['task_id']).error}")
+            self.files.append(body["file_id"])
+            self.seed_tasks.append(body["task_id"])
+
+    async def replay(self, trace: list[dict]) -> float:
+        """Send the trace open-loop; timed traces play once, others cycle."""
+        timed = all("t" in entry for entry in trace)
+        pending = []
+        offset = 0.0
+        started = time.perf_counter()
+        for index in itertools.count():
+            if timed and index >= len(trace):
+                break
+            entry = trace[index % len(trace)]
+            if timed:
+                offset = entry["t"] / self.args.speed
+            elif self.args.arrivals == "poisson":
+                offset += self.rng.expovariate(self.args.rate)
+            else:
+                offset = index / self.args.rate
+            if offset >= self.args.duration:
+                break
+            delay = started + offset - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            pending.append(asyncio.create_task(self.run_op(entry)))
+        await asyncio.gather(*pending)
+        return time.perf_counter() - started
+
+    async def drain(self, timeout: float) -> float:
+        repo = app_main.state.repo
+        started = time.perf_counter()
+        remaining = set(self.tasks)
+        while remaining and time.perf_counter() - started < timeout:
+            remaining = {
+                task_id for task_id in remaining if repo.get_task(task_id).status not in TERMINAL
+            }
+            if remaining:
+                await asyncio.sleep(0.1)
+        return time.perf_counter() - started
+
+
+def _task_report(task_ids: list[str], run_started: datetime) -> dict:
+    repo = app_main.state.repo
+    by_type: dict[str, dict[str, list]] = defaultdict(lambda: defaultdict(list))
+    for task_id in task_ids:
+        task = repo.get_task(task_id)
+        bucket = by_type[task.task_type]
+        bucket[task.status].append(task)
+    report = {}
+    for task_type, buckets in sorted(by_type.items()):
+        completed = buckets.get("completed", [])
+        durations = [
+            (
+                datetime.fromisoformat(task.updated_at) - datetime.fromisoformat(task.created_at)
+            ).total_seconds()
+            * 1000.0
+            for task in completed
+        ]
+        finished_at = [datetime.fromisoformat(task.updated_at) for task in completed]
+        window = (max(finished_at) - run_started).total_seconds() if finished_at else 0.0
+        report[task_type] = {
+            "submitted": sum(len(tasks) for tasks in buckets.values()),
+            "completed": len(completed),
+            "failed": len(buckets.get("failed", [])),
+            "unfinished": sum(
+                len(tasks) for status, tasks in buckets.items() if status not in TERMINAL
+            ),
+            "completed_per_second": len(completed) / window if window > 0 else None,
+            "queue_wait_ms": summarize(
+                [task.queue_wait_ms for task in completed if task.queue_wait_ms is not None]
+            ),
+            "end_to_end_ms": summarize(durations),
+        }
+    return report
+
+
+def _compare(report: dict, baseline: dict) -> list[str]:
+    lines = []
+    for name, current in report["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(name)
+        if not previous:
+            continue
+        for key in ("p50", "p95", "p99"):
+            if current[key] and previous.get(key):
+                change = (current[key] - previous[key]) / previous[key] * 100.0
+                lines.append(
+                    f"{name} {key}: {previous[key]:.1f} -> {current[key]:.1f} ms ({change:+.1f}%)"
+                )
+    for task_type, current in report["tasks"].items():
+        previous = baseline.get("tasks", {}).get(task_type, {}).get("completed_per_second")
+        if previous and current["completed_per_second"]:
+            change = (current["completed_per_second"] - previous) / previous * 100.0
+            lines.append(
+                f"{task_type} tasks/s: {previous:.2f} -> "
+                f"{current['completed_per_second']:.2f} ({change:+.1f}%)"
+            )
+    return lines
+
+
+def _serve(port: int) -> tuple[uvicorn.Server, threading.Thread]:
+    server = uvicorn.Server(
+        uvicorn.Config(app_main.app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    thread = threading.Thread(target=server.run, name="uvicorn", daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+async def _run(args: argparse.Namespace, trace: list[dict], port: int) -> dict:
+    limits = httpx.Limits(max_connections=args.connections)
+    async with httpx.AsyncClient(
+        base_url=f"http://127.0.0.1:{port}",
+        headers={"Authorization": f"Bearer {settings.api_key}"},
+        limits=limits,
+        timeout=args.timeout,
+    ) as client:
+        harness = Harness(args, client)
+        await harness.seed(args.seed_files)
+        repo = app_main.state.repo
+        ops_before = repo.stats()["operations"]
+        run_started = datetime.now(timezone.utc)
+        elapsed = await harness.replay(trace)
+        ops_during = repo.stats()["operations"] - ops_before
+        drained = await harness.drain(args.drain_timeout)
+        stats = (await client.get("/v1/stats")).json()
+
+    return {
+        "endpoints": {
+            name: {
+                **summarize(values),
+                "statuses": {str(code): n for code, n in harness.statuses[name].items()},
+                "requests_per_second": len(values) / elapsed if elapsed > 0 else None,
+            }
+            for name, values in sorted(harness.latencies.items())
+        },
+        "tasks": _task_report(harness.tasks, run_started),
+        "db": {
+            "operations": ops_during,
+            "operations_per_second": ops_during / elapsed if elapsed > 0 else None,
+        },
+        "replay_seconds": elapsed,
+        "drain_seconds": drained,
+        "service_stats": stats,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--trace", help="JSONL trace to replay")
+    source.add_argument("--mix", default="predict=1,render=1,task=8,file=1,gaussians=1")
+    parser.add_argument("--rate", type=float, default=20.0, help="requests per second")
+    parser.add_argument("--arrivals", choices=("uniform", "poisson"), default="uniform")
+    parser.add_argument("--speed", type=float, default=1.0, help="time scale for timed traces")
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--drain-timeout", type=float, default=120.0)
+    parser.add_argument("--connections", type=int, default=256)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--seed-files", type=int, default=4)
+    parser.add_argument(
+        "--image-size", type=lambda value: tuple(map(int, value.split("x"))), default=(1024, 768)
+    )
+    parser.add_argument("--predict-latency-ms", type=float, default=500.0)
+    parser.add_argument("--predict-item-ms", type=float, default=0.0)
+    parser.add_argument("--gaussians", type=int, default=100_000)
+    parser.add_argument("--render-frame-ms", type=float, default=20.0)
+    parser.add_argument("--render-bytes", type=int, default=2_000_000)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--out", default="load-results.json")
+    parser.add_argument("--baseline", help="earlier results JSON to compare against")
+    args = parser.parse_args()
+    if args.seed_files < 1:
+        parser.error("--seed-files must be at least 1")
+
+    if args.trace:
+        trace = load_trace(args.trace)
+    else:
+        count = max(1, int(args.rate * args.duration))
+        trace = mix_trace(args.mix, count, random.Random(args.seed))
+
+    # Swap the real services for stand-ins before the server starts.
+    original = app_main.state
+    app_main.bind_state(
+        app_main.AppState(
+            predictor_manager=StubPredictorManager(
+                latency_ms=args.predict_latency_ms,
+                item_ms=args.predict_item_ms,
+                gaussians=args.gaussians,
+                jitter=args.jitter,
+            ),
+            render_service=StubRenderService(
+                frame_ms=args.render_frame_ms, output_bytes=args.render_bytes, jitter=args.jitter
+            ),
+        )
+    )
+    original.runner.shutdown()
+    original.repo.close()
+
+    port = _free_port()
+    server, thread = _serve(port)
+    try:
+        results = asyncio.run(_run(args, trace, port))
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+        app_main.state.runner.shutdown()
+        app_main.state.repo.close()
+        if _OWN_DATA_DIR:
+            shutil.rmtree(settings.data_dir, ignore_errors=True)
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git_revision": _git_revision(),
+        "config": {
+            **{key: value for key, value in vars(args).items() if key not in ("out", "baseline")},
+            "task_workers": settings.task_workers,
+            "max_gpu_tasks": settings.max_gpu_tasks,
+            "device_queue_size": settings.device_queue_size,
+            "predict_max_batch": settings.predict_max_batch,
+            "predict_batch_wait_ms": settings.predict_batch_wait_ms,
+        },
+        **results,
+    }
+    Path(args.out).write_text(json.dumps(report, indent=2))
+    summary = {
+        "endpoints": {
+            name: {key: value[key] for key in ("count", "p50", "p95", "p99", "statuses")}
+            for name, value in report["endpoints"].items()
+        },
+        "tasks": report["tasks"],
+        "db": report["db"],
+    }
+    print(json.dumps(summary, indent=2))
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        print("\n".join(_compare(report, baseline)))
+    print(f"results written to {args.out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
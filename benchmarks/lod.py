@@ -0,0 +1,174 @@
+"""Size and render time of each gaussian LOD tier.
+
+Writes a prediction (``--ply``, e.g. an earlier unpruned ``gaussians.ply``, or
+a synthetic scene of ``--gaussians`` splats) with and without pruning, then
+for every tier of ``GAUSSIANS_LOD_TIERS`` reports the gaussian count and the
+bytes served as PLY and as ``.splat``, relative to the unpruned file. With
+CUDA, each tier is also rendered with gsplat from the input camera and the
+median time per frame is reported.
+
+Usage: python -m benchmarks.lod --ply gaussians.ply --frames 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault("API_KEY", "benchmark")
+
+import torch  # noqa: E402
+from sharp.utils.gaussians import Gaussians3D, load_ply  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.services.lod import (  # noqa: E402
+    PruneParams,
+    iter_ply_tier,
+    iter_splat_tier,
+    ply_vertex_count,
+    tier_counts,
+)
+from app.services.ply import write_gaussians_ply  # noqa: E402
+from app.services.splat import convert_ply_to_splat  # noqa: E402
+
+
+def _synthetic(count: int) -> tuple[Gaussians3D, float, tuple[int, int]]:
+    """A layered scene where, as in real predictions, most gaussians are small
+    and many are nearly transparent."""
+    generator = torch.Generator().manual_seed(0)
+    xy = torch.rand(1, count, 2, generator=generator) - 0.5
+    z = torch.rand(1, count, 1, generator=generator) * 10.0 + 1.0
+    log_scales = torch.randn(1, count, 3, generator=generator) * 0.8 - 6.0
+    opacities = torch.distributions.Beta(0.3, 0.6).sample((1, count)).clamp(1e-4, 1 - 1e-4)
+    gaussians = Gaussians3D(
+        mean_vectors=torch.cat([xy * z, z], dim=-1),
+        singular_values=log_scales.exp(),
+        quaternions=torch.nn.functional.normalize(
+            torch.randn(1, count, 4, generator=generator), dim=-1
+        ),
+        colors=torch.rand(1, count, 3, generator=generator),
+        opacities=opacities,
+    )
+    return gaussians, 1400.0, (1536, 2048)
+
+
+def _size(chunks) -> int:
+    return sum(len(chunk) for chunk in chunks)
+
+
+def _render_ms(path: Path, frames: int) -> float | None:
+    if not torch.cuda.is_available():
+        return None
+    from sharp.utils import gsplat
+
+    device = torch.device("cuda")
+    gaussians, metadata = load_ply(path)
+    gaussians = gaussians.to(device)
+    width, height = metadata.resolution_px
+    f_px = metadata.focal_length_px
+    intrinsics = torch.tensor(
+        [
+            [f_px, 0, (width - 1) / 2.0, 0],
+            [0, f_px, (height - 1) / 2.0, 0],
+            [0, 0, 1, 0],
+            [0, 0, 0, 1],
+        ],
+        device=device,
+    )
+    extrinsics = torch.eye(4, device=device)
+    renderer = gsplat.GSplatRenderer(color_space=metadata.color_space)
+    samples = []
+    for _ in range(frames + 1):
+        started = time.perf_counter()
+        renderer(
+            gaussians,
+            extrinsics=extrinsics[None],
+            intrinsics=intrinsics[None],
+            image_width=width,
+            image_height=height,
+        )
+        torch.cuda.synchronize(device)
+        samples.append((time.perf_counter() - started) * 1000.0)
+    return statistics.median(samples[1:])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ply", help="prediction to use instead of a synthetic scene")
+    parser.add_argument("--gaussians", type=int, default=2 * 768 * 768)
+    parser.add_argument("--frames", type=int, default=20, help="frames rendered per tier")
+    args = parser.parse_args()
+
+    if args.ply:
+        gaussians, metadata = load_ply(Path(args.ply))
+        f_px = metadata.focal_length_px
+        width, height = metadata.resolution_px
+        image_shape = (height, width)
+    else:
+        gaussians, f_px, image_shape = _synthetic(args.gaussians)
+    prune = PruneParams.from_settings(settings)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        full_path = Path(tmp) / "full.ply"
+        pruned_path = Path(tmp) / "pruned.ply"
+        started = time.perf_counter()
+        write_gaussians_ply(gaussians, f_px, image_shape, full_path)
+        write_ms = (time.perf_counter() - started) * 1000.0
+        started = time.perf_counter()
+        write_gaussians_ply(gaussians, f_px, image_shape, pruned_path, prune=prune)
+        pruned_write_ms = (time.perf_counter() - started) * 1000.0
+        splat_path = convert_ply_to_splat(pruned_path, Path(tmp) / "pruned.splat")
+        full_splat_bytes = convert_ply_to_splat(full_path, Path(tmp) / "full.splat").stat().st_size
+
+        full_bytes = full_path.stat().st_size
+        full_render_ms = _render_ms(full_path, args.frames)
+        count = gaussians.mean_vectors.shape[1]
+        kept, _ = ply_vertex_count(pruned_path)
+        tiers = []
+        for lod, tier_count in enumerate(tier_counts(kept, settings.gaussians_lod_tiers)):
+            tier_path = Path(tmp) / f"lod{lod}.ply"
+            with open(tier_path, "wb") as f:
+                for chunk in iter_ply_tier(pruned_path, tier_count):
+                    f.write(chunk)
+            ply_bytes = tier_path.stat().st_size
+            splat_bytes = _size(iter_splat_tier(splat_path, tier_count))
+            render_ms = _render_ms(tier_path, args.frames)
+            tiers.append(
+                {
+                    "lod": lod,
+                    "gaussians": tier_count,
+                    "ply_bytes": ply_bytes,
+                    "ply_vs_unpruned": ply_bytes / full_bytes,
+                    "splat_bytes": splat_bytes,
+                    "splat_vs_unpruned": splat_bytes / full_splat_bytes,
+                    "render_ms_per_frame": render_ms,
+                    "render_vs_unpruned": render_ms / full_render_ms
+                    if render_ms is not None and full_render_ms
+                    else None,
+                }
+            )
+    report = {
+        "input_gaussians": count,
+        "prune": {"min_opacity": prune.min_opacity, "min_pixels": prune.min_pixels},
+        "kept_gaussians": kept,
+        "write_ms": write_ms,
+        "prune_and_sort_write_ms": pruned_write_ms,
+        "unpruned": {
+            "ply_bytes": full_bytes,
+            "splat_bytes": full_splat_bytes,
+            "render_ms_per_frame": full_render_ms,
+        },
+        "tiers": tiers,
+    }
+    if full_render_ms is None:
+        report["note"] = "CUDA not available; render times not measured"
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
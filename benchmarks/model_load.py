@@ -0,0 +1,57 @@
+"""Predictor load time and peak RSS with and without mmap weight loading.
+
+Each mode runs in a fresh process so peak RSS is not shared between runs.
+Repeat runs read the checkpoint from the page cache; drop caches between
+runs to measure a cold start.
+
+Usage: python -m benchmarks.model_load --model models/sharp_2572gikvuh.pt --device cpu --warmup
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import time
+
+os.environ.setdefault("API_KEY", "benchmark")
+
+import torch  # noqa: E402
+
+from app.services.predictor import PredictorManager  # noqa: E402
+
+
+def _load(model: str, device: str, mmap: bool, warmup: bool, results) -> None:
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    manager = PredictorManager(model, mmap=mmap)
+    timings = manager.preload(torch.device(device), warmup=warmup)
+    timings["total_ms"] = (time.perf_counter() - started) * 1000.0
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put({**timings, "peak_rss_mb": peak_kb / 1024, "load_rss_mb": (peak_kb - baseline_kb) / 1024})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="models/sharp_2572gikvuh.pt")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--warmup", action="store_true")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    report = {}
+    for mode, mmap in (("full_read", False), ("mmap", True)):
+        results = context.Queue()
+        process = context.Process(
+            target=_load, args=(args.model, args.device, mmap, args.warmup, results)
+        )
+        process.start()
+        report[mode] = results.get()
+        process.join()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Two-pass ``save_ply`` + ``ensure_ply_has_rgb`` versus the single-pass writer.
+
+Generates random gaussians at the size of a 1536x1536 prediction, writes them
+both ways, checks the files are byte-identical and reports timings.
+
+Usage: python -m benchmarks.ply_writer --gaussians 1179648 --repeats 3
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault("API_KEY", "benchmark")
+
+import torch  # noqa: E402
+from sharp.utils.gaussians import Gaussians3D, save_ply  # noqa: E402
+
+from app.services.ply import write_gaussians_ply  # noqa: E402
+from app.services.predictor import ensure_ply_has_rgb  # noqa: E402
+
+
+def _random_gaussians(count: int) -> Gaussians3D:
+    generator = torch.Generator().manual_seed(0)
+    xy = torch.rand(1, count, 2, generator=generator) - 0.5
+    z = torch.rand(1, count, 1, generator=generator) * 10.0 + 1.0
+    return Gaussians3D(
+        mean_vectors=torch.cat([xy, z], dim=-1),
+        singular_values=torch.rand(1, count, 3, generator=generator) * 0.01 + 1e-4,
+        quaternions=torch.nn.functional.normalize(
+            torch.randn(1, count, 4, generator=generator), dim=-1
+        ),
+        colors=torch.rand(1, count, 3, generator=generator),
+        opacities=torch.rand(1, count, generator=generator) * 0.98 + 0.01,
+    )
+
+
+def _time(fn, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--gaussians", type=int, default=2 * 768 * 768)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    gaussians = _random_gaussians(args.gaussians)
+    f_px, image_shape = 1200.0, (1536, 2048)
+    with tempfile.TemporaryDirectory() as tmp:
+        two_pass_path = Path(tmp) / "two_pass.ply"
+        single_pass_path = Path(tmp) / "single_pass.ply"
+
+        def two_pass() -> None:
+            save_ply(gaussians, f_px, image_shape, two_pass_path)
+            ensure_ply_has_rgb(two_pass_path)
+
+        def single_pass() -> None:
+            write_gaussians_ply(gaussians, f_px, image_shape, single_pass_path)
+
+        two_pass_seconds = _time(two_pass, args.repeats)
+        single_pass_seconds = _time(single_pass, args.repeats)
+        identical = two_pass_path.read_bytes() == single_pass_path.read_bytes()
+        size = single_pass_path.stat().st_size
+
+    print(
+        json.dumps(
+            {
+                "gaussians": args.gaussians,
+                "file_bytes": size,
+                "byte_identical": identical,
+                "two_pass_ms": two_pass_seconds * 1000.0,
+                "single_pass_ms": single_pass_seconds * 1000.0,
+                "speedup": two_pass_seconds / single_pass_seconds,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
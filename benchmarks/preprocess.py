@@ -0,0 +1,157 @@
+"""Peak memory and latency of predict preprocessing for large photos.
+
+Writes synthetic JPEGs of several sizes (with an EXIF focal length, like
+phone photos) and turns each into the 1536x1536 model input
+twice: the previous path (``sharp.utils.io.load_rgb`` at full resolution,
+host copy, float conversion and normalization before the resize) and the
+current one (``app.services.preprocess``: draft-mode decode, uint8 transfer,
+conversion and resize on the device, normalization of the resized output).
+Each run is a fresh process so peak RSS is its own; the two model inputs are
+compared at the end.
+
+Usage: python -m benchmarks.preprocess --sizes 12,24,48 --device cpu
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault("API_KEY", "benchmark")
+
+import numpy as np  # noqa: E402
+import torch  # noqa: E402
+import torch.nn.functional as F  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from app.services import preprocess  # noqa: E402
+from app.services.predictor import INTERNAL_SHAPE, prepare_image  # noqa: E402
+
+# 4:3 sensor sizes of 12, 24 and 48 MP phone cameras.
+_SENSORS = {12: (4032, 3024), 24: (5712, 4284), 48: (8064, 6048)}
+
+
+def _write_photo(path: Path, width: int, height: int, seed: int) -> None:
+    """A smooth scene with sensor-like noise."""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    scene = np.stack(
+        [
+            128 + 100 * np.sin(x / (37.0 + 11 * c)) * np.cos(y / (53.0 + 7 * c))
+            for c in range(3)
+        ],
+        axis=-1,
+    )
+    scene += rng.normal(0.0, 4.0, scene.shape).astype(np.float32)
+    image = Image.fromarray(np.clip(scene, 0, 255).astype(np.uint8))
+    exif = image.getexif()
+    exif.get_ifd(0x8769)[0xA405] = 24  # 35 mm-equivalent focal length
+    image.save(path, quality=92, exif=exif)
+
+
+def _legacy(path: Path, device: torch.device) -> torch.Tensor:
+    from sharp.utils import io
+
+    image, _, _ = io.load_rgb(path)
+    image_pt = torch.from_numpy(image.copy()).float().to(device).permute(2, 0, 1) / 255.0
+    return F.interpolate(
+        image_pt[None],
+        size=(INTERNAL_SHAPE[1], INTERNAL_SHAPE[0]),
+        mode="bilinear",
+        align_corners=True,
+    )
+
+
+def _current(path: Path, device: torch.device) -> torch.Tensor:
+    decoded = preprocess.decode_image(path, INTERNAL_SHAPE)
+    prepared = prepare_image(
+        decoded.pixels, decoded.f_px, device, (decoded.height, decoded.width)
+    )
+    return prepared.image_resized
+
+
+_VARIANTS = {"before": _legacy, "after": _current}
+
+
+def _synchronize(device: torch.device) -> None:
+    if device.type == "cuda":
+        torch.cuda.synchronize(device)
+
+
+def _run(variant: str, path: str, device: str, repeat: int, output: str, results) -> None:
+    fn = _VARIANTS[variant]
+    target = torch.device(device)
+    torch.set_grad_enabled(False)
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if target.type == "cuda":
+        torch.cuda.reset_peak_memory_stats(target)
+    # The first run alone sets the peak; later runs only add timing samples.
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        image = fn(Path(path), target)
+        _synchronize(target)
+        samples.append((time.perf_counter() - started) * 1000.0)
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    np.save(output, image.cpu().numpy())
+    report = {
+        "median_ms": statistics.median(samples),
+        "min_ms": min(samples),
+        "peak_rss_mb": (peak_kb - baseline_kb) / 1024,
+    }
+    if target.type == "cuda":
+        report["peak_device_mb"] = torch.cuda.max_memory_allocated(target) / 2**20
+    results.put(report)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="12,24,48", help="megapixels, from 12, 24, 48")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for megapixels in (int(value) for value in args.sizes.split(",")):
+            width, height = _SENSORS[megapixels]
+            photo = Path(tmp) / f"{megapixels}mp.jpg"
+            # Written by a child too: spawned processes start from this one's
+            # peak RSS, which must stay low.
+            writer = context.Process(
+                target=_write_photo, args=(photo, width, height, megapixels)
+            )
+            writer.start()
+            writer.join()
+            entry: dict = {"size": f"{width}x{height}", "jpeg_mb": photo.stat().st_size / 2**20}
+            outputs = {}
+            for variant in _VARIANTS:
+                outputs[variant] = str(Path(tmp) / f"{megapixels}mp-{variant}.npy")
+                results = context.Queue()
+                process = context.Process(
+                    target=_run,
+                    args=(variant, str(photo), args.device, args.repeat, outputs[variant], results),
+                )
+                process.start()
+                entry[variant] = results.get()
+                process.join()
+            difference = np.abs(np.load(outputs["before"]) - np.load(outputs["after"]))
+            entry["input_diff"] = {
+                "max": float(difference.max()),
+                "mean": float(difference.mean()),
+            }
+            report[f"{megapixels}mp"] = entry
+            print(f"{megapixels}mp done", flush=True)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
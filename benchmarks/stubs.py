@@ -0,0 +1,131 @@
+"""Stand-ins for the predictor and renderer with synthetic latency and output size.
+
+They plug into ``app.main.AppState`` so the rest of the service (uploads,
+decoding, batching, scheduling, PLY writing, SQLite, caches) runs for real on
+a machine without a GPU or the sharp weights.
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import time
+from pathlib import Path
+
+import torch
+from sharp.utils.gaussians import Gaussians3D
+
+from app.core.config import settings
+from app.services.inference import FP32_EAGER, InferenceMode
+from app.services.renderer import RenderParams, RenderResult, RenderService, build_trajectory
+from app.storage import paths as storage_paths
+from app.tasks.events import NULL_PROGRESS, TaskProgress
+
+
+def _sleep_ms(mean_ms: float, jitter: float) -> None:
+    if mean_ms > 0:
+        time.sleep(max(0.0, random.gauss(mean_ms, mean_ms * jitter)) / 1000.0)
+
+
+class StubPredictorManager:
+    """Replaces ``PredictorManager``: each forward call sleeps for
+    ``latency_ms + item_ms * batch`` and returns ``gaussians`` random gaussians
+    per image."""
+
+    def __init__(
+        self,
+        latency_ms: float = 500.0,
+        item_ms: float = 0.0,
+        gaussians: int = 100_000,
+        jitter: float = 0.1,
+    ) -> None:
+        self._latency_ms = latency_ms
+        self._item_ms = item_ms
+        self._jitter = jitter
+        generator = torch.Generator().manual_seed(0)
+        count = max(1, gaussians)
+        depth = torch.rand(1, count, 1, generator=generator) * 4.0 + 1.0
+        self._template = Gaussians3D(
+            mean_vectors=torch.cat(
+                (torch.rand(1, count, 2, generator=generator) - 0.5, depth), dim=-1
+            ),
+            singular_values=torch.rand(1, count, 3, generator=generator) * 0.01 + 1e-3,
+            quaternions=torch.nn.functional.normalize(
+                torch.randn(1, count, 4, generator=generator), dim=-1
+            ),
+            colors=torch.rand(1, count, 3, generator=generator),
+            opacities=torch.rand(1, count, generator=generator) * 0.98 + 0.01,
+        )
+        self._loaded: set[str] = set()
+
+    @property
+    def model_id(self) -> str:
+        return "stub"
+
+    @property
+    def mode(self) -> InferenceMode:
+        return FP32_EAGER
+
+    def is_loaded(self, device: torch.device) -> bool:
+        return str(device) in self._loaded
+
+    def loaded_devices(self) -> list[str]:
+        return sorted(self._loaded)
+
+    def preload(self, device: torch.device, warmup: bool = False) -> dict[str, float]:
+        self._loaded.add(str(device))
+        return {}
+
+    def forward(
+        self, device: torch.device, images: torch.Tensor, disparity_factors: torch.Tensor
+    ) -> Gaussians3D:
+        self._loaded.add(str(device))
+        batch = images.shape[0]
+        _sleep_ms(self._latency_ms + self._item_ms * batch, self._jitter)
+        return Gaussians3D(
+            *(value.expand(batch, *value.shape[1:]).to(device) for value in self._template)
+        )
+
+
+class StubRenderService(RenderService):
+    """Replaces ``RenderService.run``: sleeps ``frame_ms`` per trajectory frame,
+    reporting progress like the real renderer, and writes videos of
+    ``output_bytes`` (color) and half that (depth)."""
+
+    def __init__(
+        self, frame_ms: float = 20.0, output_bytes: int = 2_000_000, jitter: float = 0.1
+    ) -> None:
+        super().__init__()
+        self._frame_ms = frame_ms
+        self._output_bytes = output_bytes
+        self._jitter = jitter
+
+    def run(
+        self, file_id: str, params: RenderParams, progress: TaskProgress = NULL_PROGRESS
+    ) -> RenderResult:
+        progress.stage("load")
+        trajectory = build_trajectory(params)
+        total = trajectory.num_steps * trajectory.num_repeats
+        for index in range(total):
+            _sleep_ms(self._frame_ms, self._jitter)
+            progress.stage("render", index + 1, total)
+
+        progress.stage("encode")
+        render_key = params.key()
+        storage_paths.ensure_dir(
+            storage_paths.render_variant_dir(settings.data_dir, file_id, render_key)
+        )
+        render_path = storage_paths.render_variant_path(settings.data_dir, file_id, render_key)
+        depth_path = storage_paths.render_variant_depth_path(
+            settings.data_dir, file_id, render_key
+        )
+        _write_random(render_path, self._output_bytes)
+        _write_random(depth_path, self._output_bytes // 2)
+        return RenderResult(
+            render_key=render_key, render_path=render_path, render_depth_path=depth_path
+        )
+
+
+def _write_random(path: Path, size: int) -> None:
+    with open(path, "wb") as f:
+        f.write(os.urandom(size))
@@ -0,0 +1,171 @@
+"""Peak Python heap while N clients upload to ``POST /v1/predict`` at once.
+
+Runs the real app in-process (``httpx.ASGITransport``) with the stub
+predictor and renderer from ``benchmarks.stubs``, so the measured path is the
+route's own: the request stream through the multipart parser into the temp
+file, hashing, SQLite rows and the job enqueue. Each client sends its own
+``--size-mb`` file as a chunked body generated on the fly, so the client side
+holds one chunk at a time and the peak is the server's. For comparison the
+same bodies go to a bare route taking Starlette's ``UploadFile``, which
+spools the whole body before the handler runs. A last request sends a body
+``--oversize`` times ``MAX_UPLOAD_MB`` and reports how much of it the route
+read before answering 400.
+
+Usage: python -m benchmarks.upload_memory --clients 16 --size-mb 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from typing import AsyncIterator
+
+_OWN_DATA_DIR = "DATA_DIR" not in os.environ
+os.environ.setdefault("API_KEY", "benchmark")
+if _OWN_DATA_DIR:
+    os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="mlsharp-upload-")
+os.environ.setdefault("DB_PATH", os.path.join(os.environ["DATA_DIR"], "mlsharp.db"))
+os.environ.setdefault("DEVICE_DEFAULT", "cpu")
+os.environ.setdefault("PRELOAD_MODEL", "false")
+
+import httpx  # noqa: E402
+from fastapi import FastAPI, File, UploadFile  # noqa: E402
+
+from app import main as app_main  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from benchmarks.stubs import StubPredictorManager, StubRenderService  # noqa: E402
+
+_CHUNK_BYTES = 64 * 1024
+
+
+class _Body:
+    """A multipart body with one ``size``-byte file, produced chunk by chunk."""
+
+    def __init__(self, size: int) -> None:
+        self.boundary = uuid.uuid4().hex
+        self.size = size
+        self.sent = 0
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        head = (
+            f"--{self.boundary}\r\n"
+            'Content-Disposition: form-data; name="upload"; filename="image.jpg"\r\n'
+            "Content-Type: image/jpeg\r\n\r\n"
+        ).encode()
+        yield self._count(head)
+        # Distinct bytes per client so no two uploads coalesce in the cache.
+        yield self._count(os.urandom(min(_CHUNK_BYTES, self.size)))
+        remaining = self.size - min(_CHUNK_BYTES, self.size)
+        block = os.urandom(_CHUNK_BYTES)
+        while remaining > 0:
+            yield self._count(block[: min(remaining, _CHUNK_BYTES)])
+            remaining -= _CHUNK_BYTES
+        yield self._count(f"\r\n--{self.boundary}--\r\n".encode())
+
+    def _count(self, chunk: bytes) -> bytes:
+        self.sent += len(chunk)
+        return chunk
+
+
+def _baseline_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/upload")
+    async def upload(upload: UploadFile = File(...)):
+        await upload.close()
+        return {}
+
+    return app
+
+
+async def _post(client: httpx.AsyncClient, path: str, body: _Body) -> httpx.Response:
+    return await client.post(
+        path,
+        content=body,
+        headers={
+            "Authorization": f"Bearer {settings.api_key}",
+            "Content-Type": body.content_type,
+        },
+    )
+
+
+async def _concurrent(app: FastAPI, path: str, clients: int, size: int) -> dict[str, object]:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        tracemalloc.start()
+        started = time.perf_counter()
+        responses = await asyncio.gather(
+            *(_post(client, path, _Body(size)) for _ in range(clients))
+        )
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {
+        "peak_mb": peak / 1024 / 1024,
+        "seconds": elapsed,
+        "mb_per_second": clients * size / 1024 / 1024 / elapsed,
+        "status": dict(Counter(response.status_code for response in responses)),
+    }
+
+
+async def _oversized(app: FastAPI, size: int) -> dict[str, object]:
+    body = _Body(size)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        response = await _post(client, "/v1/predict", body)
+    return {"body_bytes": size, "read_bytes": body.sent, "status": response.status_code}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--size-mb", type=float, default=10)
+    parser.add_argument("--oversize", type=float, default=5.0, help="x MAX_UPLOAD_MB")
+    args = parser.parse_args()
+    size = int(args.size_mb * 1024 * 1024)
+    if size > settings.max_upload_mb * 1024 * 1024:
+        parser.error(f"--size-mb is over MAX_UPLOAD_MB ({settings.max_upload_mb})")
+
+    original = app_main.state
+    app_main.bind_state(
+        app_main.AppState(
+            predictor_manager=StubPredictorManager(latency_ms=0),
+            render_service=StubRenderService(),
+        )
+    )
+    original.runner.shutdown()
+    original.repo.close()
+    try:
+        results = {
+            "predict": asyncio.run(_concurrent(app_main.app, "/v1/predict", args.clients, size)),
+            "uploadfile": asyncio.run(_concurrent(_baseline_app(), "/upload", args.clients, size)),
+            "oversized": asyncio.run(
+                _oversized(app_main.app, int(args.oversize * settings.max_upload_mb * 1024 * 1024))
+            ),
+        }
+    finally:
+        app_main.state.runner.shutdown()
+        app_main.state.repo.close()
+        if _OWN_DATA_DIR:
+            shutil.rmtree(settings.data_dir, ignore_errors=True)
+    print(
+        json.dumps(
+            {"clients": args.clients, "size_mb": args.size_mb, "results": results}, indent=2
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
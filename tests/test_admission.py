@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import os
+import time
+import types
+
+import pytest
+
+os.environ.setdefault("API_KEY", "test")
+
+from app.tasks.admission import AdmissionController, AdmissionRejected  # noqa: E402
+
+
+def _finish(controller: AdmissionController, task_type: str, count: int, seconds: float) -> None:
+    """Run ``count`` tasks side by side, as a batch would, for ``seconds``."""
+    tickets = [controller.admit(task_type, "key") for _ in range(count)]
+    started = time.monotonic()
+    for ticket in tickets:
+        ticket.start()
+    time.sleep(seconds)
+    for ticket in tickets:
+        ticket.release(time.monotonic() - started)
+
+
+def test_slo_sheds_with_retry_after_for_the_excess_wait() -> None:
+    controller = AdmissionController(slots=1, slo_seconds=0.25, max_inflight=0, max_per_key=0)
+    _finish(controller, "render", 1, 0.1)
+    for _ in range(3):
+        controller.admit("render", "key")
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.admit("render", "key")
+    assert rejected.value.reason == "slo"
+    assert rejected.value.retry_after >= 1.0
+    assert controller.stats()["shed"]["slo"] == 1
+
+
+def test_throughput_counts_batched_tasks_once() -> None:
+    controller = AdmissionController(slots=1, slo_seconds=0.0, max_inflight=0, max_per_key=0)
+    for _ in range(2):
+        _finish(controller, "predict", 8, 0.05)
+    for _ in range(8):
+        controller.admit("predict", "key")
+
+    stats = controller.stats()
+    # Eight predicts a batch complete in the time of one.
+    assert 5.0 < stats["throughput"] < 9.0
+    assert stats["estimated_wait_s"] < 0.1
+
+
+def test_idle_time_does_not_lower_the_throughput() -> None:
+    controller = AdmissionController(slots=1, slo_seconds=0.0, max_inflight=0, max_per_key=0)
+    _finish(controller, "render", 1, 0.05)
+    time.sleep(0.2)
+    _finish(controller, "render", 1, 0.05)
+
+    assert controller.stats()["throughput"] > 0.7
+
+
+def test_capacity_and_per_key_limits() -> None:
+    controller = AdmissionController(slots=1, slo_seconds=0.0, max_inflight=3, max_per_key=2)
+    first = controller.admit("predict", "a")
+    controller.admit("predict", "a")
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.admit("predict", "a")
+    assert rejected.value.reason == "key_limit"
+
+    controller.admit("predict", "b")
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.admit("predict", "c")
+    assert rejected.value.reason == "capacity"
+
+    first.release()
+    first.release()
+    controller.admit("predict", "c")
+    assert controller.stats()["inflight"] == 3
+
+
+def test_rejection_becomes_429_with_retry_after() -> None:
+    pytest.importorskip("sharp")
+    from fastapi import HTTPException
+
+    from app.api import routes
+
+    controller = AdmissionController(slots=1, slo_seconds=0.0, max_inflight=1, max_per_key=0)
+    request = types.SimpleNamespace(
+        app=types.SimpleNamespace(state=types.SimpleNamespace(admission=controller)),
+        headers={"authorization": "Bearer test"},
+    )
+    routes._admit(request, "render")
+    with pytest.raises(HTTPException) as rejected:
+        routes._admit(request, "render")
+    assert rejected.value.status_code == 429
+    assert int(rejected.value.headers["Retry-After"]) >= 1
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+
+os.environ.setdefault("API_KEY", "test")
+
+from app.services.batching import PredictBatcher  # noqa: E402
+from app.tasks.runner import TaskRunner  # noqa: E402
+
+
+class _Manager:
+    """Stands in for ``PredictorManager``: records batch sizes, doubles inputs."""
+
+    def __init__(self) -> None:
+        self.batches: list[int] = []
+        self._lock = threading.Lock()
+
+    def forward(
+        self, device: torch.device, images: torch.Tensor, disparity_factors: torch.Tensor
+    ) -> tuple[torch.Tensor, torch.Tensor]:
+        with self._lock:
+            self.batches.append(images.shape[0])
+        return images * 2, disparity_factors
+
+
+def _infer(batcher: PredictBatcher, value: float) -> tuple[torch.Tensor, torch.Tensor]:
+    image = torch.full((1, 3, 2, 2), value)
+    return batcher.infer(torch.device("cpu"), image, torch.tensor([value]))
+
+
+def test_full_batch_flushes_without_waiting_for_the_timeout() -> None:
+    manager = _Manager()
+    runner = TaskRunner(max_workers=1, device_slots=1, device_queue_size=8)
+    batcher = PredictBatcher(manager, runner, max_batch_size=4, max_wait_ms=10_000)
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda value: _infer(batcher, value), [1.0, 2.0, 3.0, 4.0]))
+    runner.shutdown()
+
+    assert time.monotonic() - started < 5.0
+    assert manager.batches == [4]
+    # Each caller gets its own slice of the batched output.
+    for value, (images, factors) in zip([1.0, 2.0, 3.0, 4.0], results):
+        assert images.shape == (1, 3, 2, 2)
+        assert torch.all(images == value * 2)
+        assert factors.tolist() == [value]
+
+
+def test_partial_batch_flushes_after_max_wait() -> None:
+    manager = _Manager()
+    runner = TaskRunner(max_workers=1, device_slots=1, device_queue_size=8)
+    batcher = PredictBatcher(manager, runner, max_batch_size=8, max_wait_ms=50)
+    started = time.monotonic()
+    images, _ = _infer(batcher, 1.0)
+    elapsed = time.monotonic() - started
+    runner.shutdown()
+
+    assert manager.batches == [1]
+    assert 0.05 <= elapsed < 5.0
+    assert torch.all(images == 2.0)
+    assert batcher.stats()["by_batch_size"]["1"]["items"] == 1
+
+
+def test_forward_error_reaches_every_caller_in_the_batch() -> None:
+    class _Failing(_Manager):
+        def forward(self, device, images, disparity_factors):
+            raise RuntimeError("out of memory")
+
+    runner = TaskRunner(max_workers=1, device_slots=1, device_queue_size=8)
+    batcher = PredictBatcher(_Failing(), runner, max_batch_size=2, max_wait_ms=10_000)
+    errors: list[str] = []
+
+    def call(value: float) -> None:
+        try:
+            _infer(batcher, value)
+        except RuntimeError as exc:
+            errors.append(str(exc))
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        list(pool.map(call, [1.0, 2.0]))
+    runner.shutdown()
+
+    assert errors == ["out of memory", "out of memory"]
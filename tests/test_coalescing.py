@@ -0,0 +1,189 @@
+"""Duplicate predicts and renders share one job, through the real routes.
+
+The app runs with the stub predictor and renderer from ``benchmarks.stubs``
+against a temporary data directory; these tests need sharp importable.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import io
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Iterator, NamedTuple
+
+import pytest
+
+os.environ.setdefault("API_KEY", "test")
+
+pytest.importorskip("sharp")
+
+from fastapi.testclient import TestClient  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from app.core import config  # noqa: E402
+
+_HEADERS = {"Authorization": "Bearer test"}
+
+
+class _App(NamedTuple):
+    client: TestClient
+    state: Any
+
+
+@pytest.fixture
+def app(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[_App]:
+    test_settings = dataclasses.replace(
+        config.settings,
+        api_key="test",
+        data_dir=str(tmp_path),
+        db_path=str(tmp_path / "mlsharp.db"),
+        device_default="cpu",
+        render_backend="cpu",
+        render_hls=False,
+        preload_model=False,
+        cpu_workers=0,
+        job_poll_ms=20.0,
+        retention_budget_mb=0,
+        retention_ttl_hours=0.0,
+    )
+    # Every module reads the settings object it imported.
+    for name, module in list(sys.modules.items()):
+        if name.split(".")[0] in ("app", "benchmarks") and isinstance(
+            getattr(module, "settings", None), config.Settings
+        ):
+            monkeypatch.setattr(module, "settings", test_settings)
+
+    from app import main
+    from benchmarks.stubs import StubPredictorManager, StubRenderService
+
+    original = main.state
+    main.bind_state(
+        main.AppState(
+            predictor_manager=StubPredictorManager(latency_ms=300, gaussians=2_000, jitter=0),
+            render_service=StubRenderService(frame_ms=5, output_bytes=1_000, jitter=0),
+        )
+    )
+    try:
+        with TestClient(main.app, raise_server_exceptions=False) as client:
+            yield _App(client, main.state)
+    finally:
+        main.state.runner.shutdown()
+        main.bind_state(original)
+
+
+def _image(seed: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (32, 24), (seed % 256, 80, 160)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _predict(client: TestClient, image: bytes) -> Any:
+    return client.post(
+        "/v1/predict", headers=_HEADERS, files={"upload": ("image.png", image, "image/png")}
+    )
+
+
+def _wait(client: TestClient, task_id: str) -> dict[str, Any]:
+    deadline = time.monotonic() + 30.0
+    while time.monotonic() < deadline:
+        task = client.get(f"/v1/tasks/{task_id}", headers=_HEADERS).json()
+        if task["status"] in ("completed", "failed"):
+            return task
+        time.sleep(0.02)
+    raise AssertionError(f"task {task_id} did not finish")
+
+
+def _predicted(client: TestClient) -> str:
+    response = _predict(client, _image(1)).json()
+    assert _wait(client, response["task_id"])["status"] == "completed"
+    return response["file_id"]
+
+
+def test_duplicate_predict_follows_the_running_one_then_hits_the_cache(app: _App) -> None:
+    client, state = app
+    image = _image(7)
+    leader = _predict(client, image).json()
+    follower = _predict(client, image).json()
+
+    assert _wait(client, leader["task_id"])["status"] == "completed"
+    assert _wait(client, follower["task_id"])["status"] == "completed"
+    assert state.predict_cache.stats()["coalesced"] == 1
+    gaussians = client.get(f"/v1/files/{follower['file_id']}/gaussians", headers=_HEADERS)
+    assert gaussians.status_code == 200 and gaussians.content.startswith(b"ply")
+
+    cached = _predict(client, image).json()
+    assert cached["cached"] is True
+
+
+def test_failed_predict_fails_its_followers_and_is_retried(
+    app: _App, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    client, state = app
+    manager = state.predictor_manager
+    forward = manager.forward
+
+    def failing(device, images, disparity_factors):
+        time.sleep(0.2)
+        raise RuntimeError("forward failed")
+
+    monkeypatch.setattr(manager, "forward", failing)
+    image = _image(9)
+    leader = _predict(client, image).json()
+    follower = _predict(client, image).json()
+
+    assert _wait(client, leader["task_id"])["status"] == "failed"
+    failed = _wait(client, follower["task_id"])
+    assert failed["status"] == "failed" and "forward failed" in failed["error"]
+
+    monkeypatch.setattr(manager, "forward", forward)
+    retried = _predict(client, image).json()
+    assert retried.get("cached") is not True
+    assert _wait(client, retried["task_id"])["status"] == "completed"
+
+
+def test_leader_that_cannot_enqueue_releases_the_inflight_entry(
+    app: _App, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    client, state = app
+    file_id = _predicted(client)
+    repo = state.repo
+    create_task = repo.create_task
+
+    def broken(*args, **kwargs):
+        if kwargs.get("payload"):
+            raise RuntimeError("database is locked")
+        return create_task(*args, **kwargs)
+
+    monkeypatch.setattr(repo, "create_task", broken)
+    image = _image(11)
+    assert _predict(client, image).status_code == 500
+    body = {"file_id": file_id, "num_steps": 4}
+    assert client.post("/v1/render", headers=_HEADERS, json=body).status_code == 500
+    assert state.predict_cache.stats()["inflight"] == 0
+    assert state.render_cache.stats()["inflight"] == 0
+    assert state.admission.stats()["inflight"] == 0
+
+    monkeypatch.setattr(repo, "create_task", create_task)
+    predict = _predict(client, image).json()
+    render = client.post("/v1/render", headers=_HEADERS, json=body).json()
+    assert _wait(client, predict["task_id"])["status"] == "completed"
+    assert _wait(client, render["task_id"])["status"] == "completed"
+
+
+def test_duplicate_render_follows_the_running_one(app: _App) -> None:
+    client, state = app
+    file_id = _predicted(client)
+    body = {"file_id": file_id, "num_steps": 30}
+
+    leader = client.post("/v1/render", headers=_HEADERS, json=body).json()
+    follower = client.post("/v1/render", headers=_HEADERS, json=body).json()
+
+    assert follower["render_key"] == leader["render_key"]
+    assert _wait(client, leader["task_id"])["status"] == "completed"
+    assert _wait(client, follower["task_id"])["status"] == "completed"
+    assert state.render_cache.stats()["coalesced"] == 1
+    cached = client.post("/v1/render", headers=_HEADERS, json=body).json()
+    assert cached["cached"] is True
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import os
+import sys
+import time
+import types
+from pathlib import Path
+
+import pytest
+
+os.environ.setdefault("API_KEY", "test")
+
+import torch  # noqa: E402
+
+from app.services.encoder import FrameEncoder, HlsParams, ffmpeg_exe  # noqa: E402
+
+
+class _VideoWriter:
+    """Stands in for sharp's ``VideoWriter``: writes both videos on close."""
+
+    instances: list[_VideoWriter] = []
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.frames = 0
+        self.closed = False
+        path.write_bytes(b"")
+        path.with_suffix(".depth.mp4").write_bytes(b"")
+        self.instances.append(self)
+
+    def add_frame(self, color: torch.Tensor, depth: torch.Tensor) -> None:
+        self.frames += 1
+
+    def close(self) -> None:
+        self.closed = True
+
+
+@pytest.fixture
+def video_writer(monkeypatch: pytest.MonkeyPatch) -> type[_VideoWriter]:
+    io = types.ModuleType("sharp.utils.io")
+    io.VideoWriter = _VideoWriter
+    utils = types.ModuleType("sharp.utils")
+    utils.io = io
+    monkeypatch.setitem(sys.modules, "sharp", types.ModuleType("sharp"))
+    monkeypatch.setitem(sys.modules, "sharp.utils", utils)
+    monkeypatch.setitem(sys.modules, "sharp.utils.io", io)
+    _VideoWriter.instances.clear()
+    return _VideoWriter
+
+
+def test_abort_mid_stream_kills_ffmpeg_and_removes_outputs(
+    tmp_path: Path, video_writer: type[_VideoWriter]
+) -> None:
+    try:
+        ffmpeg_exe()
+    except RuntimeError:
+        pytest.skip("ffmpeg not found")
+    output_path = tmp_path / "render.mp4"
+    hls_dir = tmp_path / "hls"
+    encoder = FrameEncoder(output_path, hls_dir, HlsParams(23, "ultrafast", None, 0.5))
+    color = torch.zeros(64, 96, 3, dtype=torch.uint8)
+    depth = torch.zeros(1, 64, 96)
+    for _ in range(30):
+        encoder.add_frame(color, depth)
+    deadline = time.monotonic() + 10.0
+    while encoder._process is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    process = encoder._process
+    assert process is not None and process.poll() is None
+
+    encoder.abort()
+
+    assert process.poll() is not None
+    assert video_writer.instances[0].closed
+    assert not hls_dir.exists()
+    assert not output_path.exists()
+    assert not output_path.with_suffix(".depth.mp4").exists()
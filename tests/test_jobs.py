@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import os
+import time
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+os.environ.setdefault("API_KEY", "test")
+
+from app.db.repo import Repository  # noqa: E402
+
+# ``app.tasks.jobs.JOB_TYPES``; that module needs sharp.
+JOB_TYPES = ("predict", "render")
+
+
+@pytest.fixture
+def repo(tmp_path: Path) -> Iterator[Repository]:
+    repo = Repository(str(tmp_path / "mlsharp.db"))
+    repo.create_file("file", "image.jpg", str(tmp_path / "image.jpg"))
+    yield repo
+    repo.close()
+
+
+def _enqueue(repo: Repository, task_id: str, task_type: str = "render") -> None:
+    repo.create_task(task_id, task_type, "file", payload="{}")
+
+
+def test_claim_takes_predicts_first_then_oldest_first(repo: Repository) -> None:
+    _enqueue(repo, "render-1")
+    _enqueue(repo, "predict-1", "predict")
+    _enqueue(repo, "render-2")
+    _enqueue(repo, "predict-2", "predict")
+
+    claimed = [repo.claim_task("worker", 60.0, JOB_TYPES).task_id for _ in range(4)]
+
+    assert claimed == ["predict-1", "predict-2", "render-1", "render-2"]
+    assert repo.claim_task("worker", 60.0, JOB_TYPES) is None
+
+
+def test_claim_can_be_limited_to_predicts(repo: Repository) -> None:
+    _enqueue(repo, "render-1")
+    assert repo.claim_task("worker", 60.0, ("predict",)) is None
+    _enqueue(repo, "predict-1", "predict")
+    assert repo.claim_task("worker", 60.0, ("predict",)).task_id == "predict-1"
+
+
+def test_claim_skips_tasks_settled_by_the_api(repo: Repository) -> None:
+    repo.create_task("follower", "render", "file", lease_owner="api", lease_seconds=60.0)
+    assert repo.claim_task("worker", 60.0, JOB_TYPES) is None
+
+
+def test_claimed_job_stays_queued_until_it_starts(repo: Repository) -> None:
+    _enqueue(repo, "job")
+    claimed = repo.claim_task("worker", 60.0, JOB_TYPES)
+    assert (claimed.status, claimed.started_at, claimed.attempts) == ("queued", None, 1)
+    # Another worker does not claim it again.
+    assert repo.claim_task("other", 60.0, JOB_TYPES) is None
+
+    time.sleep(0.05)
+    started = repo.mark_started("job", "worker")
+    assert started.status == "running"
+    # Timestamps are wall-clock; allow for their rounding.
+    assert started.queue_wait_ms >= 40.0
+    with pytest.raises(KeyError):
+        repo.mark_started("job", "worker")
+
+
+def test_expired_lease_requeues_and_only_the_new_owner_can_finish(repo: Repository) -> None:
+    _enqueue(repo, "job")
+    repo.claim_task("dead", 0.01, JOB_TYPES)
+    repo.mark_started("job", "dead")
+    time.sleep(0.05)
+
+    (requeued,) = repo.requeue_expired(max_attempts=3)
+    assert (requeued.status, requeued.lease_owner) == ("queued", None)
+    assert repo.claim_task("live", 60.0, JOB_TYPES).attempts == 2
+
+    with pytest.raises(KeyError):
+        repo.update_task("job", "failed", "late", owner="dead")
+    assert repo.complete_task("job", "file", owner="live").status == "completed"
+
+
+def test_expired_lease_on_a_job_waiting_for_a_device_requeues(repo: Repository) -> None:
+    _enqueue(repo, "job")
+    repo.claim_task("dead", 0.01, JOB_TYPES)
+    time.sleep(0.05)
+
+    (requeued,) = repo.requeue_expired(max_attempts=3)
+    assert requeued.status == "queued"
+    with pytest.raises(KeyError):
+        repo.mark_started("job", "dead")
+
+
+def test_renewed_leases_do_not_expire(repo: Repository) -> None:
+    _enqueue(repo, "job")
+    repo.claim_task("worker", 0.05, JOB_TYPES)
+    assert repo.renew_leases("worker", 60.0) == 1
+    time.sleep(0.1)
+    assert repo.requeue_expired(max_attempts=3) == []
+
+
+def test_job_fails_after_max_attempts(repo: Repository) -> None:
+    _enqueue(repo, "job")
+    for attempt in range(1, 3):
+        assert repo.claim_task(f"worker-{attempt}", 0.01, JOB_TYPES).attempts == attempt
+        time.sleep(0.05)
+        (task,) = repo.requeue_expired(max_attempts=2)
+
+    assert task.status == "failed"
+    assert "2 attempts" in task.error
+    assert repo.claim_task("worker", 60.0, JOB_TYPES) is None
+
+
+def test_orphaned_followers_fail_only_once_their_lease_expires(repo: Repository) -> None:
+    repo.create_task("live", "render", "file", lease_owner="api-1", lease_seconds=60.0)
+    repo.create_task("gone", "render", "file", lease_owner="api-2", lease_seconds=0.01)
+    _enqueue(repo, "job")
+    time.sleep(0.05)
+
+    failed = repo.fail_orphaned_tasks("API process exited")
+
+    assert [task.task_id for task in failed] == ["gone"]
+    assert repo.get_task("live").status == "queued"
+    assert repo.get_task("job").status == "queued"
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+os.environ.setdefault("API_KEY", "test")
+
+from app.db import repo as repo_module  # noqa: E402
+from app.db.repo import Repository  # noqa: E402
+
+
+def _at(second: int) -> str:
+    return f"2026-01-01T00:00:{second:02d}+00:00"
+
+
+@pytest.fixture
+def repo(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[Repository]:
+    now = [_at(0)]
+    monkeypatch.setattr(repo_module, "utc_now", lambda: now[0])
+    repo = Repository(str(tmp_path / "mlsharp.db"))
+    # Twelve tasks, three per second, so pages end inside ties.
+    for index in range(12):
+        now[0] = _at(index // 3)
+        repo.create_file(f"file-{index:02d}", "image.jpg", str(tmp_path / "image.jpg"))
+        task_type = "predict" if index % 2 else "render"
+        repo.create_task(f"task-{index:02d}", task_type, f"file-{index:02d}")
+    yield repo
+    repo.close()
+
+
+def _walk(repo: Repository, limit: int, **filters) -> list[list[str]]:
+    pages: list[list[str]] = []
+    after = None
+    while True:
+        tasks = repo.page_tasks(limit, after=after, **filters)
+        if not tasks:
+            return pages
+        pages.append([task.task_id for task in tasks])
+        after = (tasks[-1].created_at, tasks[-1].task_id)
+
+
+def test_pages_cover_ties_without_gaps_or_repeats(repo: Repository) -> None:
+    pages = _walk(repo, 5)
+
+    assert [len(page) for page in pages] == [5, 5, 2]
+    assert sum(pages, []) == [f"task-{index:02d}" for index in reversed(range(12))]
+
+
+def test_file_pages_use_the_same_cursor(repo: Repository) -> None:
+    first = repo.page_files(4)
+    last = first[-1]
+    second = repo.page_files(4, after=(last.created_at, last.file_id))
+
+    assert [record.file_id for record in first + second] == [
+        f"file-{index:02d}" for index in reversed(range(4, 12))
+    ]
+
+
+def test_filters_hold_across_pages(repo: Repository) -> None:
+    ids = sum(_walk(repo, 2, task_type="predict"), [])
+
+    assert ids == [f"task-{index:02d}" for index in (11, 9, 7, 5, 3, 1)]
+    assert _walk(repo, 2, status="completed") == []
+
+
+def test_created_range_is_inclusive_then_exclusive(repo: Repository) -> None:
+    ids = sum(_walk(repo, 4, created_after=_at(1), created_before=_at(3)), [])
+
+    assert ids == [f"task-{index:02d}" for index in reversed(range(3, 9))]
+
+
+def test_cursor_round_trips_and_bad_cursors_are_rejected() -> None:
+    pytest.importorskip("sharp")
+    from fastapi import HTTPException
+
+    from app.api import routes
+
+    cursor = routes._encode_cursor(_at(1), "task-05")
+    assert "=" not in cursor
+    assert routes._decode_cursor(cursor) == (_at(1), "task-05")
+    assert routes._decode_cursor(None) is None
+    for bad in ("not a cursor", routes._encode_cursor(_at(1), "x")[:-3], "WzFd"):
+        with pytest.raises(HTTPException) as rejected:
+            routes._decode_cursor(bad)
+        assert rejected.value.status_code == 400
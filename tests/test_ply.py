@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import importlib
+import os
+import sys
+import types
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+import pytest
+import torch
+from plyfile import PlyData
+
+os.environ.setdefault("API_KEY", "test")
+
+from app.services.lod import (  # noqa: E402
+    LOD_COMMENT,
+    PruneParams,
+    iter_ply_tier,
+    iter_splat_tier,
+    ply_vertex_count,
+    select_tier,
+    splat_vertex_count,
+    tier_counts,
+)
+from app.services.splat import (  # noqa: E402
+    SH_C0,
+    SPLAT_DTYPE,
+    SPLAT_HEADER,
+    SPLAT_MAGIC,
+    convert_ply_to_splat,
+)
+
+
+class _Gaussians(NamedTuple):
+    mean_vectors: torch.Tensor
+    colors: torch.Tensor
+    opacities: torch.Tensor
+    singular_values: torch.Tensor
+    quaternions: torch.Tensor
+
+
+@pytest.fixture
+def ply_module(monkeypatch: pytest.MonkeyPatch) -> types.ModuleType:
+    """``app.services.ply`` imported against stand-ins for sharp's helpers."""
+    color_space = types.ModuleType("sharp.utils.color_space")
+    color_space.linearRGB2sRGB = lambda rgb: rgb
+    color_space.encode_color_space = lambda name: 0
+    gaussians = types.ModuleType("sharp.utils.gaussians")
+    gaussians.convert_rgb_to_spherical_harmonics = lambda rgb: (rgb - 0.5) / SH_C0
+    gaussians.convert_spherical_harmonics_to_rgb = lambda sh: sh * SH_C0 + 0.5
+    utils = types.ModuleType("sharp.utils")
+    utils.color_space = color_space
+    utils.gaussians = gaussians
+    monkeypatch.setitem(sys.modules, "sharp", types.ModuleType("sharp"))
+    monkeypatch.setitem(sys.modules, "sharp.utils", utils)
+    monkeypatch.setitem(sys.modules, "sharp.utils.color_space", color_space)
+    monkeypatch.setitem(sys.modules, "sharp.utils.gaussians", gaussians)
+    monkeypatch.delitem(sys.modules, "app.services.ply", raising=False)
+    return importlib.import_module("app.services.ply")
+
+
+def _scene(count: int) -> _Gaussians:
+    generator = torch.Generator().manual_seed(0)
+    xy = torch.rand(1, count, 2, generator=generator) * 2 - 1
+    depth = torch.rand(1, count, 1, generator=generator) * 4 + 1
+    quaternions = torch.randn(1, count, 4, generator=generator)
+    return _Gaussians(
+        mean_vectors=torch.cat((xy, depth), dim=-1),
+        colors=torch.rand(1, count, 3, generator=generator),
+        opacities=torch.rand(1, count, generator=generator) * 0.98 + 0.01,
+        singular_values=torch.rand(1, count, 3, generator=generator) * 0.05 + 0.001,
+        quaternions=quaternions / quaternions.norm(dim=-1, keepdim=True),
+    )
+
+
+def _write(ply_module: types.ModuleType, path: Path, prune: PruneParams | None) -> _Gaussians:
+    gaussians = _scene(200)
+    ply_module.write_gaussians_ply(gaussians, 500.0, (48, 64), path, prune=prune)
+    return gaussians
+
+
+def _unpack_quaternions(packed: np.ndarray) -> np.ndarray:
+    packed = packed.astype(np.uint32)
+    bits = packed[:, 0] | packed[:, 1] << 8 | packed[:, 2] << 16
+    largest = bits >> 21
+    small = np.stack([(bits >> shift) & 0x7F for shift in (14, 7, 0)], axis=1)
+    small = (small / 63.5 - 1.0) / np.sqrt(2.0)
+    quaternions = np.zeros((len(packed), 4))
+    for row, index in enumerate(largest):
+        others = [axis for axis in range(4) if axis != index]
+        quaternions[row, others] = small[row]
+        quaternions[row, index] = np.sqrt(max(0.0, 1.0 - float(np.sum(small[row] ** 2))))
+    return quaternions
+
+
+def test_ply_round_trips_attributes_rgb_and_metadata(
+    ply_module: types.ModuleType, tmp_path: Path
+) -> None:
+    path = tmp_path / "gaussians.ply"
+    gaussians = _write(ply_module, path, prune=None)
+
+    ply = PlyData.read(path)
+    vertices = ply["vertex"]
+    assert len(vertices) == 200
+    np.testing.assert_allclose(
+        np.stack([vertices[axis] for axis in "xyz"], axis=1),
+        gaussians.mean_vectors[0].numpy(),
+        rtol=1e-6,
+    )
+    np.testing.assert_allclose(
+        1.0 / (1.0 + np.exp(-vertices["opacity"])), gaussians.opacities[0].numpy(), rtol=1e-4
+    )
+    rgb = np.stack([vertices[channel] for channel in ("red", "green", "blue")], axis=1)
+    assert np.abs(rgb / 255.0 - gaussians.colors[0].numpy()).max() <= 0.5 / 255.0 + 1e-6
+    assert list(ply["frame"]["frame"]) == [1, 200]
+    assert list(ply["image_size"]["image_size"]) == [64, 48]
+    assert ply_vertex_count(path) == (200, False)
+
+
+def test_pruned_ply_is_importance_sorted_and_tiers_are_prefixes(
+    ply_module: types.ModuleType, tmp_path: Path
+) -> None:
+    path = tmp_path / "gaussians.ply"
+    gaussians = _write(ply_module, path, prune=PruneParams(min_opacity=0.5, min_pixels=0.0))
+
+    full = PlyData.read(path)
+    assert LOD_COMMENT in full.comments
+    vertices = full["vertex"]
+    kept = int((gaussians.opacities[0] >= 0.5).sum())
+    assert len(vertices) == kept
+    opacity = 1.0 / (1.0 + np.exp(-vertices["opacity"]))
+    assert (opacity >= 0.5 - 1e-6).all()
+    depth = vertices["z"]
+    log_scales = np.sort(np.stack([vertices[f"scale_{i}"] for i in range(3)], axis=1), axis=1)
+    importance = opacity * np.exp(log_scales[:, 1] + log_scales[:, 2]) * (500.0 / depth) ** 2
+    assert (np.diff(importance) <= 1e-6 * importance[:-1]).all()
+
+    counts = tier_counts(kept, (0.1, 0.5, 1.0))
+    assert counts[-1] == kept and counts == sorted(counts)
+    assert select_tier(counts, 0) == counts[0]
+    assert select_tier(counts, None) == select_tier(counts, 99) == kept
+    tier_path = tmp_path / "tier.ply"
+    tier_path.write_bytes(b"".join(iter_ply_tier(path, counts[0])))
+    tier = PlyData.read(tier_path)
+    assert len(tier["vertex"]) == counts[0]
+    np.testing.assert_array_equal(tier["vertex"].data, vertices.data[: counts[0]])
+    assert list(tier["frame"]["frame"]) == [1, counts[0]]
+
+
+def test_unsorted_files_have_only_the_full_tier() -> None:
+    assert tier_counts(100, (0.1, 0.5), importance_sorted=False) == [100]
+
+
+def test_splat_round_trips_and_tiers_are_prefixes(
+    ply_module: types.ModuleType, tmp_path: Path
+) -> None:
+    ply_path = tmp_path / "gaussians.ply"
+    _write(ply_module, ply_path, prune=PruneParams(min_opacity=0.0, min_pixels=0.0))
+    splat_path = convert_ply_to_splat(ply_path, tmp_path / "gaussians.splat")
+
+    vertices = PlyData.read(ply_path)["vertex"]
+    data = splat_path.read_bytes()
+    magic, _, count, scale_min, scale_max = SPLAT_HEADER.unpack_from(data)
+    assert magic == SPLAT_MAGIC and count == len(vertices) == splat_vertex_count(splat_path)
+    splats = np.frombuffer(data, dtype=SPLAT_DTYPE, offset=SPLAT_HEADER.size)
+    assert len(splats) == count
+
+    positions = np.stack([vertices[axis] for axis in "xyz"], axis=1)
+    np.testing.assert_allclose(splats["position"].astype(np.float32), positions, atol=5e-3)
+    log_scales = np.stack([vertices[f"scale_{i}"] for i in range(3)], axis=1)
+    decoded_scales = scale_min + splats["scale"] / 255.0 * (scale_max - scale_min)
+    assert np.abs(decoded_scales - log_scales).max() <= (scale_max - scale_min) / 255.0
+    opacity = 1.0 / (1.0 + np.exp(-vertices["opacity"]))
+    assert np.abs(splats["color"][:, 3] / 255.0 - opacity).max() <= 0.5 / 255.0 + 1e-6
+    quaternions = np.stack([vertices[f"rot_{i}"] for i in range(4)], axis=1)
+    decoded = _unpack_quaternions(splats["rotation"])
+    # q and -q are the same rotation.
+    assert (np.abs(np.sum(decoded * quaternions, axis=1)) > 0.99).all()
+
+    tier = b"".join(iter_splat_tier(splat_path, 10))
+    assert SPLAT_HEADER.unpack_from(tier)[2] == 10
+    assert tier[SPLAT_HEADER.size :] == data[SPLAT_HEADER.size :][: 10 * SPLAT_DTYPE.itemsize]
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import dataclasses
+import os
+import time
+from pathlib import Path
+from typing import Iterator, NamedTuple
+
+import pytest
+
+os.environ.setdefault("API_KEY", "test")
+
+from app.core import config  # noqa: E402
+from app.db.repo import Repository  # noqa: E402
+from app.db.schema import ARTIFACT_GAUSSIANS, ARTIFACT_ORIGINAL  # noqa: E402
+from app.services import retention as retention_module  # noqa: E402
+from app.services.retention import ArtifactRetention  # noqa: E402
+from app.storage import paths as storage_paths  # noqa: E402
+
+
+class _Store(NamedTuple):
+    repo: Repository
+    data_dir: Path
+
+
+@pytest.fixture
+def store(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[_Store]:
+    test_settings = dataclasses.replace(config.settings, data_dir=str(tmp_path))
+    monkeypatch.setattr(retention_module, "settings", test_settings)
+    repo = Repository(str(tmp_path / "mlsharp.db"))
+    yield _Store(repo, tmp_path)
+    repo.close()
+
+
+def _retention(
+    store: _Store, budget_bytes: int = 0, ttl_seconds: float = 0.0
+) -> ArtifactRetention:
+    return ArtifactRetention(
+        store.repo, budget_bytes, ttl_seconds, interval_seconds=60.0, batch_size=100
+    )
+
+
+def _upload(store: _Store, retention: ArtifactRetention, file_id: str, size: int) -> Path:
+    path = storage_paths.original_path(str(store.data_dir), file_id, ".jpg")
+    storage_paths.ensure_dir(path.parent)
+    path.write_bytes(b"o" * size)
+    store.repo.create_file(file_id, "image.jpg", str(path))
+    retention.record(file_id, ARTIFACT_ORIGINAL, path)
+    return path
+
+
+def _predict(
+    store: _Store, retention: ArtifactRetention, file_id: str, size: int, link: Path | None = None
+) -> Path:
+    path = storage_paths.gaussians_path(str(store.data_dir), file_id)
+    if link is None:
+        path.write_bytes(b"g" * size)
+    else:
+        os.link(link, path)
+    store.repo.update_file_outputs(file_id, gaussians_path=str(path))
+    retention.record(file_id, ARTIFACT_GAUSSIANS, path)
+    return path
+
+
+def test_budget_evicts_derived_artifacts_least_recently_used_first(store: _Store) -> None:
+    retention = _retention(store, budget_bytes=1_300)
+    originals = [_upload(store, retention, file_id, 100) for file_id in ("a", "b")]
+    gaussians = [_predict(store, retention, file_id, 1_000) for file_id in ("a", "b")]
+    retention.touch("a", ARTIFACT_GAUSSIANS)
+
+    assert retention.run_once() is False
+    assert [path.exists() for path in gaussians] == [True, False]
+    stats = retention.stats()
+    assert (stats["bytes"], stats["evicted"]["budget"]) == (1_200, 1)
+    assert stats["reclaimed_bytes"]["budget"] == 1_000
+
+    _retention(store, budget_bytes=150).run_once()
+    assert not gaussians[0].exists()
+    # Originals go last, oldest first.
+    assert [path.exists() for path in originals] == [False, True]
+    assert store.repo.artifact_usage() == {"artifacts": 1, "bytes": 100}
+
+
+def test_ttl_evicts_idle_artifacts_but_not_those_of_pending_tasks(store: _Store) -> None:
+    retention = _retention(store, ttl_seconds=0.05)
+    idle = _upload(store, retention, "idle", 100)
+    busy = _upload(store, retention, "busy", 100)
+    store.repo.create_task("job", "predict", "busy", payload="{}")
+    time.sleep(0.1)
+    fresh = _upload(store, retention, "fresh", 100)
+
+    retention.run_once()
+
+    assert (idle.exists(), busy.exists(), fresh.exists()) == (False, True, True)
+    # The emptied file directory goes too.
+    assert not storage_paths.file_root(str(store.data_dir), "idle").exists()
+    assert retention.stats()["evicted"] == {"ttl": 1, "budget": 0}
+
+
+def test_evicting_gaussians_drops_the_file_and_predict_cache_references(store: _Store) -> None:
+    retention = _retention(store, budget_bytes=1)
+    _upload(store, retention, "a", 100)
+    path = _predict(store, retention, "a", 1_000)
+    store.repo.put_predict_cache("hash", "model", "a", str(path))
+
+    (record, *_) = store.repo.list_eviction_candidates(1)
+    assert record.name == ARTIFACT_GAUSSIANS
+    assert retention._evict(record, "budget") == 1_000
+
+    assert store.repo.get_file("a").gaussians_path is None
+    assert store.repo.get_predict_cache("hash") is None
+
+
+def test_shared_gaussians_free_bytes_only_with_the_last_link(store: _Store) -> None:
+    retention = _retention(store, budget_bytes=1)
+    for file_id in ("a", "b"):
+        _upload(store, retention, file_id, 100)
+    first = _predict(store, retention, "a", 1_000)
+    _predict(store, retention, "b", 1_000, link=first)
+
+    reclaimed = []
+    for _ in range(2):
+        (record, *_) = store.repo.list_eviction_candidates(1)
+        reclaimed.append(retention._evict(record, "budget"))
+
+    assert reclaimed == [0, 1_000]
+
+
+def test_access_after_listing_keeps_the_artifact(store: _Store) -> None:
+    retention = _retention(store, budget_bytes=1)
+    path = _upload(store, retention, "a", 100)
+    (record,) = store.repo.list_eviction_candidates(1)
+    retention.touch("a", ARTIFACT_ORIGINAL)
+    retention._flush_accesses()
+
+    assert retention._evict(record, "budget") is None
+    assert path.exists()
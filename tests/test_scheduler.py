@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+
+import pytest
+
+os.environ.setdefault("API_KEY", "test")
+
+from app.tasks.scheduler import (  # noqa: E402
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    DeviceScheduler,
+    QueueFullError,
+)
+
+
+def _blocked(scheduler: DeviceScheduler) -> threading.Event:
+    """Occupy the scheduler's only slot until the returned event is set."""
+    gate = threading.Event()
+    started = threading.Event()
+
+    def hold() -> None:
+        started.set()
+        gate.wait(10.0)
+
+    scheduler.submit("hold", hold)
+    assert started.wait(5.0)
+    return gate
+
+
+def test_lower_priority_values_run_first_then_in_submission_order() -> None:
+    scheduler = DeviceScheduler("test-order", slots=1, max_queue=8)
+    gate = _blocked(scheduler)
+    order: list[str] = []
+    futures = [
+        scheduler.submit("render-1", order.append, "render-1", priority=PRIORITY_BATCH),
+        scheduler.submit("predict-1", order.append, "predict-1", priority=PRIORITY_INTERACTIVE),
+        scheduler.submit("render-2", order.append, "render-2", priority=PRIORITY_BATCH),
+        scheduler.submit("predict-2", order.append, "predict-2", priority=PRIORITY_INTERACTIVE),
+    ]
+    gate.set()
+    for future in futures:
+        future.result(timeout=5.0)
+    scheduler.shutdown()
+
+    assert order == ["predict-1", "predict-2", "render-1", "render-2"]
+
+
+def test_on_start_receives_the_queue_wait() -> None:
+    scheduler = DeviceScheduler("test-wait", slots=1, max_queue=4)
+    gate = _blocked(scheduler)
+    waits: list[float] = []
+    future = scheduler.submit("job", lambda: None, on_start=waits.append)
+    time.sleep(0.05)
+    gate.set()
+    future.result(timeout=5.0)
+    scheduler.shutdown()
+
+    assert len(waits) == 1 and waits[0] >= 0.05
+
+
+def test_full_queue_rejects_submits() -> None:
+    scheduler = DeviceScheduler("test-full", slots=1, max_queue=1)
+    gate = _blocked(scheduler)
+    scheduler.submit("queued", lambda: None)
+    with pytest.raises(QueueFullError):
+        scheduler.submit("rejected", lambda: None)
+    gate.set()
+    scheduler.shutdown()
+
+
+def test_shutdown_with_a_full_queue_cancels_queued_jobs_and_waits_for_running() -> None:
+    scheduler = DeviceScheduler("test-shutdown", slots=1, max_queue=2)
+    gate = _blocked(scheduler)
+    queued = [scheduler.submit(f"queued-{index}", lambda: None) for index in range(2)]
+    stopper = threading.Thread(target=scheduler.shutdown)
+    stopper.start()
+    time.sleep(0.1)
+
+    # Queued jobs are cancelled at once; the running one is waited for.
+    assert all(future.cancelled() for future in queued)
+    assert stopper.is_alive()
+    gate.set()
+    stopper.join(5.0)
+    assert not stopper.is_alive()
+    with pytest.raises(RuntimeError):
+        scheduler.submit("late", lambda: None)